@@ -0,0 +1,592 @@
+# analysis_engine.py
+# UI-free analysis engine shared by the Streamlit app and headless tools
+#
+# run_analysis() makes the Gemini call(s) and returns the result dictionary
+# the app displays and downloads. It never imports Streamlit; progress and
+# messages go to an optional on_event callback, which receives dicts:
+#
+#     {"type": "notice", "level": "info" | "success" | "warning", "message": ...}
+#     {"type": "stage", "state": "start" | "end", "name": ...}
+#     {"type": "chunk", "model": ..., "stream": ..., "candidate": ..., "text": ..., "received_chars": ...}
+#     {"type": "failed", "message": ..., "error": ..., "tips": [...]}
+#
+# Notices, stages and failures are emitted on the calling thread. Chunks come
+# from the thread streaming the response; with hedging, both attempts stream.
+# Every request sent (hedges, retries, fallbacks and extra samples) gets its
+# own stream number. A request asking for several samples streams them as
+# candidates 0, 1, ... of one stream; received_chars counts the text of that
+# stream and candidate only.
+
+import itertools
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backends import get_backend
+from metrics import JSON_REPAIRS, MODEL_ERRORS, observe_analysis
+from model_router import THINKING_PROFILES, thinking_budget
+from preflight import output_token_budget, raised_output_budget
+from reliability import reliability_report
+from resilience import (
+    DEFAULT_DEADLINE_S,
+    MIN_CALL_TIMEOUT_S,
+    Deadline,
+    FallbackExhausted,
+    RequestCancelled,
+    cascade_for,
+    classify_error,
+    faster_model,
+    hedge_delay_s,
+    rejected_option,
+    run_hedged,
+    run_with_fallback,
+    stream_request
+)
+from run_history import record_run
+from schema_utils import (
+    COMPACT_OUTPUT_INSTRUCTION,
+    expand_compact_keys,
+    get_compact_schema,
+    get_compiled_schema,
+    get_schema_profile,
+    validate_analysis
+)
+from timings import Timings
+from traffic_capture import capture_request
+from usage_ledger import record_usage
+
+# Sampling settings used when the caller passes no generation config
+DEFAULT_GENERATION_CONFIG = {
+    "temperature": 0.8,
+    "top_p": 0.8,
+    "top_k": 10
+}
+
+# Retries with a doubled output budget after a truncated response
+MAX_TRUNCATION_RETRIES = 2
+
+# =============================================================================
+# ANALYSIS
+# =============================================================================
+
+def run_analysis(text, framework_prompt, analysis_schema=None, model_name="gemini-2.5-flash", generation_config=None, compact_output=False, schema_profile="Full", on_event=None, framework_name=None, hedge=False, hedge_percentile=0.9, hedge_faster_model=False, fallback_models=None, deadline_s=DEFAULT_DEADLINE_S, thinking_profile="default", samples=1, timings=None, usage_context=None):
+    """
+    Run one framework analysis with robust JSON error handling
+    
+    Args:
+        text: Text to analyze
+        framework_prompt: The theoretical framework prompt
+        analysis_schema: Optional JSON schema for structured output
+        model_name: Gemini model to use
+        generation_config: Model generation parameters; without max_output_tokens
+            the output budget is learned from similar past runs
+        compact_output: Send a short-key variant of the schema and expand
+            the keys locally (structured output only)
+        schema_profile: "Full" or "Lite" (required fields only, capped lists)
+        on_event: Callback receiving event dicts (see the module header);
+            None runs silently
+        framework_name: Framework label recorded in the run history
+        hedge: Send a duplicate request if no first token arrives within the
+            hedge_percentile of recent first-token times
+        hedge_percentile: Percentile that triggers the hedge, e.g. 0.9
+        hedge_faster_model: Send the hedge to the next faster model
+        fallback_models: Models to fall back to, in order, on overload,
+            timeout or quota errors (None disables the cascade)
+        deadline_s: Total time budget for the job; each Gemini call gets the
+            remaining budget as its timeout (None: unbounded)
+        thinking_profile: Key of THINKING_PROFILES; the budget is fitted to
+            each model, and dropped if the model rejects it
+        samples: Number of analyses to draw; asked for as candidates of one
+            request, with parallel requests for any the model doesn't return
+        timings: Timings to record stage spans in; by default a new one that
+            reports stage events. Spans end up in
+            result["metadata"]["timings"]["spans"]
+        usage_context: key_hash, session_id and class_label to charge the
+            run's tokens to in the usage ledger (None: not recorded)
+        
+    Returns:
+        dict: Analysis results with metadata, or None if the analysis failed
+    """
+    
+    def emit(event_type, **fields):
+        if on_event:
+            on_event({"type": event_type, **fields})
+    
+    # Numbers the streamed requests in chunk events
+    stream_numbers = itertools.count(1)
+    
+    # Default generation config if none provided
+    if generation_config is None:
+        generation_config = dict(DEFAULT_GENERATION_CONFIG)
+    
+    # Settings a load-test replay needs to re-issue this run
+    capture_config = {
+        "requested_model": model_name,
+        "generation_config": generation_config,
+        "has_schema": bool(analysis_schema),
+        "schema_profile": schema_profile,
+        "compact_output": compact_output,
+        "thinking_profile": thinking_profile,
+        "samples": samples,
+        "hedge": hedge,
+        "hedge_percentile": hedge_percentile,
+        "hedge_faster_model": hedge_faster_model,
+        "fallback_models": fallback_models,
+        "deadline_s": deadline_s
+    }
+    
+    # Output budget learned from similar past runs, unless the caller set one
+    budget_info = None
+    if "max_output_tokens" not in generation_config:
+        max_output_tokens, budget_info = output_token_budget(framework_name, model_name, len(text), schema_profile)
+        budget_info["raised_to"] = []
+        generation_config = {**generation_config, "max_output_tokens": max_output_tokens}
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    # Lite profile trims the schema; compact mode then swaps in short keys,
+    # which are expanded again after parsing
+    profile_schema, profile_instruction = get_schema_profile(analysis_schema, schema_profile)
+    wire_schema = profile_schema
+    key_expansion = None
+    system_instruction = framework_prompt + profile_instruction
+    if profile_schema and compact_output:
+        wire_schema, key_expansion = get_compact_schema(profile_schema)
+        system_instruction += COMPACT_OUTPUT_INSTRUCTION
+    
+    # Characters sent, recorded to calibrate the local token estimator
+    if analysis_schema:
+        prompt_chars = len(system_instruction) + len(text) + len(json.dumps(wire_schema))
+    else:
+        prompt_chars = len(framework_prompt) + len(text)
+    
+    # Thinking budget; "applied" is cleared if the model rejects it
+    thinking = {"profile": thinking_profile, "applied": THINKING_PROFILES.get(thinking_profile) is not None}
+    
+    # Multiple samples; "candidate_count" is cleared once the model won't return them
+    sampling = {"requested": samples, "candidate_count": samples > 1, "errors": []}
+    
+    def build_model(name):
+        """Configure the model based on whether we have a schema"""
+        config = dict(generation_config)
+        budget = thinking_budget(name, thinking_profile)
+        if thinking["applied"] and budget is not None:
+            config["thinking_config"] = {"thinking_budget": budget}
+        if sampling["candidate_count"]:
+            config["candidate_count"] = samples
+        
+        if analysis_schema:
+            return get_backend().create_model(
+                model_name=name,
+                generation_config={
+                    **config,
+                    "response_mime_type": "application/json",
+                    "response_schema": wire_schema
+                },
+                system_instruction=system_instruction
+            )
+        return get_backend().create_model(
+            model_name=name,
+            generation_config=config,
+            system_instruction=framework_prompt
+        )
+    
+    # Total time budget; every call below gets what is left as its timeout
+    deadline = Deadline(deadline_s)
+    if timings is None:
+        timings = Timings(on_span=lambda state, name: emit("stage", state=state, name=name))
+    
+    def request(name, cancel_event, first_token_event):
+        """One streamed attempt (a hedge may run a second one in parallel)"""
+        timeout_s = deadline.call_timeout(f"calling {name}")
+        call_started = time.perf_counter()
+        outcome = "error"
+        
+        def send():
+            with timings.span("model_construction", model=name):
+                model = build_model(name)
+            stream = next(stream_numbers)
+            received = {}
+            
+            def on_chunk(chunk_text, candidate):
+                received[candidate] = received.get(candidate, 0) + len(chunk_text)
+                emit("chunk", model=name, stream=stream, candidate=candidate, text=chunk_text,
+                     received_chars=received[candidate])
+            
+            return stream_request(
+                model, text, cancel_event, first_token_event, timings=timings,
+                on_chunk=on_chunk if on_event else None,
+                request_options={"timeout": timeout_s} if timeout_s is not None else None
+            )
+        
+        try:
+            try:
+                response = send()
+            except RequestCancelled:
+                raise
+            except Exception as error:
+                # Some models reject a thinking budget or allow only one
+                # candidate (400 INVALID_ARGUMENT); retry without the option
+                if thinking["applied"] and rejected_option(error, "thinking"):
+                    thinking["applied"] = False
+                    thinking["error"] = str(error)[:200]
+                elif sampling["candidate_count"] and rejected_option(error, "candidate"):
+                    sampling["candidate_count"] = False
+                else:
+                    raise
+                response = send()
+            outcome = "ok"
+            return response
+        except RequestCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            deadline.record_call(name, timeout_s, call_started, outcome)
+    
+    def parse(analysis_text, report):
+        """Parse one response; returns (analysis_data, use_json)"""
+        use_json = bool(analysis_schema)
+        
+        if use_json:
+            try:
+                # Clean and parse JSON with enhanced error handling
+                cleaned_text = analysis_text.strip()
+                with timings.span("json_parse"):
+                    analysis_data = json.loads(cleaned_text)
+                if report:
+                    emit("notice", level="success", message="✅ JSON parsing successful!")
+            except json.JSONDecodeError as e:
+                if report:
+                    emit("notice", level="warning", message=f"⚠️ JSON parsing failed: {e}")
+                    emit("notice", level="info", message="🔧 Attempting to fix JSON formatting...")
+                
+                # Try to fix common JSON issues
+                try:
+                    with timings.span("json_repair"):
+                        fixed_text = fix_json_string(cleaned_text)
+                        analysis_data = json.loads(fixed_text)
+                    JSON_REPAIRS.inc(framework=framework_name or "custom", outcome="repaired")
+                    if report:
+                        emit("notice", level="success", message="✅ JSON automatically repaired!")
+                except:
+                    JSON_REPAIRS.inc(framework=framework_name or "custom", outcome="failed")
+                    if report:
+                        emit("notice", level="warning", message="🔄 Using text format instead of structured output")
+                    analysis_data = analysis_text
+                    use_json = False
+            
+            if use_json and key_expansion:
+                analysis_data = expand_compact_keys(analysis_data, key_expansion)
+        else:
+            analysis_data = analysis_text
+        
+        return analysis_data, use_json
+    
+    try:
+        def attempt(name):
+            """Generate the content on one model, hedging slow starts if enabled"""
+            hedge_after_s = hedge_delay_s(name, hedge_percentile) if hedge else None
+            hedge_target = faster_model(name) if hedge_faster_model else name
+            return run_hedged(
+                request, name, hedge_after_s=hedge_after_s, hedge_model=hedge_target, deadline=deadline
+            )
+        
+        # Walk down the fallback cascade on overload, timeout or quota errors
+        models = cascade_for(model_name, fallback_models) if fallback_models else [model_name]
+        
+        request_started = time.perf_counter()
+        with timings.span("model_call", model=model_name):
+            ((response, ttft_s), model_name, hedge_info), _, fallback_info = run_with_fallback(
+                attempt, models, deadline=deadline
+            )
+        
+        # Retry a truncated answer with a larger budget while time allows;
+        # if the retry fails, the truncated answer is kept
+        while budget_info and response_truncated(response):
+            raised = raised_output_budget(model_name, generation_config["max_output_tokens"])
+            remaining = deadline.remaining()
+            out_of_time = remaining is not None and remaining < MIN_CALL_TIMEOUT_S
+            if raised is None or out_of_time or len(budget_info["raised_to"]) >= MAX_TRUNCATION_RETRIES:
+                break
+            emit("notice", level="info",
+                 message=f"✂️ Response hit the {generation_config['max_output_tokens']:,}-token limit, "
+                         f"retrying with {raised:,} tokens...")
+            previous_config = generation_config
+            generation_config = {**generation_config, "max_output_tokens": raised}
+            budget_info["raised_to"].append(raised)
+            try:
+                with timings.span("model_call", model=model_name, max_output_tokens=raised):
+                    ((response, ttft_s), model_name, hedge_info), _, _ = run_with_fallback(
+                        attempt, [model_name], deadline=deadline
+                    )
+            except Exception:
+                generation_config = previous_config
+                break
+        
+        # Samples the model didn't return as candidates run as parallel requests
+        responses = [response]
+        if samples > 1:
+            sample_texts = candidate_texts(response)[:samples]
+            sampling["candidates"] = len(sample_texts)
+            missing = samples - len(sample_texts)
+            if missing > 0:
+                sampling["candidate_count"] = False
+                with ThreadPoolExecutor(max_workers=missing) as pool:
+                    futures = [
+                        pool.submit(request, model_name, threading.Event(), threading.Event())
+                        for _ in range(missing)
+                    ]
+                    for future in futures:
+                        try:
+                            extra_response, _ = future.result()
+                        except Exception as error:
+                            sampling["errors"].append(str(error)[:200])
+                            continue
+                        responses.append(extra_response)
+                        sample_texts.append(extra_response.text)
+        else:
+            sample_texts = [response.text]
+        latency_s = time.perf_counter() - request_started
+        
+        # Extract and process the responses (status messages for the first only)
+        parsed = [
+            parse(sample_text, index == 0)
+            for index, sample_text in enumerate(sample_texts)
+        ]
+        analysis_data, use_json = parsed[0]
+        analysis_text = sample_texts[0]
+        
+        # Create the result object
+        result = {
+            "timestamp": timestamp,
+            "model": model_name,
+            "generation_config": generation_config,
+            "framework_preview": framework_prompt[:200] + "..." if len(framework_prompt) > 200 else framework_prompt,
+            "text_preview": text[:200] + "..." if len(text) > 200 else text,
+            "text_length": len(text),
+            "use_json": use_json,
+            "analysis": analysis_data,
+            "raw_response": analysis_text,
+            "metadata": {}
+        }
+        
+        # Safely extract usage metadata (summed over every request made)
+        try:
+            result["metadata"] = usage_counts(responses)
+        except Exception as metadata_error:
+            emit("notice", level="warning", message=f"⚠️ Could not extract usage metadata: {metadata_error}")
+            result["metadata"] = {
+                "prompt_tokens": None,
+                "response_tokens": None,
+                "total_tokens": None
+            }
+        
+        # Check structured output against the precompiled schema tables
+        with timings.span("validation"):
+            validations = [
+                validate_analysis(sample_data, get_compiled_schema(profile_schema))
+                if sample_json and profile_schema else None
+                for sample_data, sample_json in parsed
+            ]
+        if validations[0]:
+            result["metadata"]["validation"] = validations[0]
+        
+        if samples > 1:
+            result["samples"] = [
+                {
+                    "analysis": sample_data,
+                    "use_json": sample_json,
+                    "raw_response": sample_text,
+                    "validation": validation
+                }
+                for (sample_data, sample_json), sample_text, validation in zip(parsed, sample_texts, validations)
+            ]
+            candidates = sampling.get("candidates", 1)
+            result["metadata"]["sampling"] = {
+                "requested": samples,
+                "received": len(parsed),
+                "method": "candidate_count" if candidates >= samples else ("parallel" if candidates <= 1 else "mixed"),
+                "requests": len(responses),
+                "errors": sampling["errors"],
+            }
+            # Agreement figures are extra; a failure here must not lose the samples
+            try:
+                reliability = reliability_report([sample_data for sample_data, _ in parsed])
+            except Exception as e:
+                reliability = None
+                emit("notice", level="warning", message=f"⚠️ Could not compute sample agreement: {e}")
+            if reliability:
+                result["metadata"]["reliability"] = reliability
+            if len(parsed) < samples:
+                emit("notice", level="warning", message=f"⚠️ Only {len(parsed)} of {samples} samples came back")
+        
+        if key_expansion:
+            result["metadata"]["wire_format"] = "compact"
+        
+        if profile_schema is not analysis_schema:
+            result["metadata"]["schema_profile"] = schema_profile
+        
+        result["metadata"]["latency_s"] = round(latency_s, 2)
+        result["metadata"]["ttft_s"] = round(ttft_s, 2) if ttft_s is not None else None
+        
+        if hedge:
+            result["metadata"]["hedging"] = hedge_info
+        
+        if fallback_models:
+            result["metadata"]["fallback"] = fallback_info
+        
+        result["metadata"]["thinking"] = {
+            "profile": thinking_profile,
+            "budget": thinking_budget(model_name, thinking_profile) if thinking["applied"] else None,
+            "applied": thinking["applied"],
+            "thoughts_tokens": result["metadata"].get("thoughts_tokens"),
+        }
+        if "error" in thinking:
+            emit("notice", level="info",
+                 message="ℹ️ The thinking budget isn't supported here, so the model used its default thinking.")
+        
+        if budget_info:
+            budget_info["max_output_tokens"] = generation_config["max_output_tokens"]
+            budget_info["truncated"] = response_truncated(response)
+            result["metadata"]["output_budget"] = budget_info
+        
+        result["metadata"]["timings"] = {"deadline": deadline.summary(), "spans": timings.to_list()}
+        
+        # Feed the latency history used by automatic model routing; it learns
+        # per-request sizes, so only the first request counts, per candidate
+        primary_usage = usage_counts([response])
+        if primary_usage["response_tokens"] is not None:
+            primary_usage["response_tokens"] //= max(1, len(candidate_texts(response)))
+        record_run({
+            "timestamp": timestamp,
+            "model": model_name,
+            "framework": framework_name,
+            "schema_profile": schema_profile if profile_schema else None,
+            "text_length": len(text),
+            "prompt_chars": prompt_chars,
+            "prompt_tokens": primary_usage["prompt_tokens"],
+            "response_tokens": primary_usage["response_tokens"],
+            "thoughts_tokens": primary_usage["thoughts_tokens"],
+            "thinking_profile": thinking_profile if thinking["applied"] else "default",
+            "max_output_tokens": generation_config.get("max_output_tokens"),
+            "truncated": response_truncated(response),
+            "latency_s": result["metadata"]["latency_s"],
+            "ttft_s": result["metadata"]["ttft_s"]
+        })
+        observe_analysis(model_name, framework_name, "ok", latency_s, result["metadata"])
+        capture_request(text, framework_name, model_name, "ok", capture_config, metadata=result["metadata"])
+        if usage_context:
+            record_usage(framework=framework_name, model=result["model"], metadata=result["metadata"], **usage_context)
+        
+        return result
+        
+    except Exception as e:
+        if isinstance(e, FallbackExhausted):
+            for failed in e.attempts:
+                MODEL_ERRORS.inc(model=failed["model"], reason=failed["reason"])
+        else:
+            MODEL_ERRORS.inc(model=model_name, reason=classify_error(e) or "other")
+        observe_analysis(model_name, framework_name, "error", deadline.elapsed())
+        capture_request(
+            text, framework_name, model_name, "error", capture_config,
+            metadata={"latency_s": round(deadline.elapsed(), 2), "timings": {"spans": timings.to_list()}},
+            error_reason=str(e)[:200]
+        )
+        
+        emit(
+            "failed",
+            message=f"❌ Analysis failed: {str(e)}",
+            error=str(e),
+            tips=[
+                "Check your API key configuration",
+                f"Verify model '{model_name}' is available",
+                "Try with shorter text (under 25,000 characters)",
+                "Verify your framework prompt is properly formatted"
+            ]
+        )
+        return None
+
+
+# =============================================================================
+# RESPONSE HELPERS
+# =============================================================================
+
+def candidate_texts(response):
+    """Text of each candidate in a response"""
+    texts = []
+    for candidate in getattr(response, 'candidates', None) or []:
+        parts = getattr(getattr(candidate, 'content', None), 'parts', None) or []
+        texts.append("".join(getattr(part, 'text', '') for part in parts))
+    return texts
+
+
+def usage_counts(responses):
+    """Token counts from usage metadata, summed over one or more responses"""
+    fields = {
+        "prompt_tokens": "prompt_token_count",
+        "response_tokens": "candidates_token_count",
+        "thoughts_tokens": "thoughts_token_count",
+        "total_tokens": "total_token_count"
+    }
+    counts = dict.fromkeys(fields)
+    for response in responses:
+        usage = getattr(response, 'usage_metadata', None)
+        for key, attribute in fields.items():
+            value = getattr(usage, attribute, None)
+            if value is not None:
+                counts[key] = (counts[key] or 0) + value
+    return counts
+
+
+def response_truncated(response):
+    """True when the model stopped because it ran out of output tokens"""
+    try:
+        finish_reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError):
+        return False
+    return getattr(finish_reason, "name", finish_reason) in ("MAX_TOKENS", 2)
+
+
+def fix_json_string(json_str):
+    """
+    Attempt to fix common JSON formatting issues
+    
+    Args:
+        json_str: The malformed JSON string
+        
+    Returns:
+        str: Potentially fixed JSON string
+    """
+    
+    # Remove any non-printable characters
+    json_str = ''.join(char for char in json_str if ord(char) >= 32 or char in '\n\r\t')
+    
+    # Fix common quote issues
+    # Replace smart quotes with regular quotes
+    json_str = json_str.replace('"', '"').replace('"', '"')
+    json_str = json_str.replace(''', "'").replace(''', "'")
+    
+    # Fix newlines within strings
+    json_str = re.sub(r'(?<!\\)\n(?![}\]])', '\\n', json_str)
+    
+    # Fix unescaped quotes within strings
+    # This is a simple approach - more sophisticated fixing could be added
+    json_str = re.sub(r'(?<!\\)"(?=.*[^"]*"[^"]*$)', '\\"', json_str)
+    
+    # Remove trailing commas
+    json_str = re.sub(r',\s*}', '}', json_str)
+    json_str = re.sub(r',\s*]', ']', json_str)
+    
+    # Try to find and complete incomplete JSON
+    # Count braces and brackets
+    open_braces = json_str.count('{') - json_str.count('}')
+    open_brackets = json_str.count('[') - json_str.count(']')
+    
+    # Add missing closing braces/brackets
+    json_str += '}' * open_braces
+    json_str += ']' * open_brackets
+    
+    return json_str
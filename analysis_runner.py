@@ -1,141 +1,93 @@
 # analysis_runner.py
 # Handles the AI analysis execution
+#
+# Streamlit front end for a single run of the shared engine in
+# analysis_engine.py: a progress bar driven by the engine's stages and the
+# streamed text, and its messages shown in the page.
+
+import threading
 
 import streamlit as st
-import google.generativeai as genai
-import json
-from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from analysis_engine import run_analysis
+from model_router import CHARS_PER_TOKEN, expected_output_tokens
+from timings import Timings
+
+# Progress bar position and status when an engine stage starts
+STAGE_PROGRESS = {
+    "model_construction": (15, "🤖 Configuring the model..."),
+    "model_call": (25, "📤 Sending analysis request..."),
+    "json_parse": (80, "🔍 Processing response..."),
+    "json_repair": (85, "🔧 Repairing the JSON..."),
+    "validation": (90, "✅ Checking the schema..."),
+}
 
 def run_ai_analysis(text, framework_prompt, analysis_schema=None, model_name="gemini-2.5-flash", generation_config=None):
     """
     Run AI analysis using the provided framework and schema
-    
+
     Args:
         text: Text to analyze
         framework_prompt: The theoretical framework prompt
         analysis_schema: Optional JSON schema for structured output
         model_name: Gemini model to use
         generation_config: Model generation parameters
-        
+
     Returns:
         dict: Analysis results with metadata
     """
-    
+
     # Default generation config if none provided
     if generation_config is None:
         generation_config = {
             "temperature": 0.8,
             "top_p": 0.8,
-            "top_k": 10,
-            "max_output_tokens": 8192
+            "top_k": 10
         }
+
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    status_text.text(f"🤖 Configuring {model_name}...")
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    try:
-        # Show progress
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        status_text.text(f"🤖 Configuring {model_name}...")
-        progress_bar.progress(10)
-        
-        # Configure the model based on whether we have a schema
-        if analysis_schema:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config={
-                    **generation_config,
-                    "response_mime_type": "application/json",
-                    "response_schema": analysis_schema
-                },
-                system_instruction=framework_prompt
-            )
-            use_json = True
-        else:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=generation_config,
-                system_instruction=framework_prompt
-            )
-            use_json = False
-        
-        progress_bar.progress(25)
-        status_text.text("📤 Sending analysis request...")
-        
-        # Generate the content
-        response = model.generate_content(text)
-        
-        progress_bar.progress(75)
-        status_text.text("🔍 Processing response...")
-        
-        # Extract and process the response
-        analysis_text = response.text
-        
-        if use_json:
-            try:
-                # Clean and parse JSON
-                cleaned_text = analysis_text.strip()
-                analysis_data = json.loads(cleaned_text)
-                status_text.text("✅ JSON parsing successful!")
-            except json.JSONDecodeError as e:
-                st.warning(f"⚠️ JSON parsing failed: {e}")
-                st.info("📄 Using text format instead")
-                analysis_data = analysis_text
-                use_json = False
-        else:
-            analysis_data = analysis_text
-        
-        progress_bar.progress(90)
-        status_text.text("💾 Saving results...")
-        
-      # Create the result object
-        result = {
-            "timestamp": timestamp,
-            "model": model_name,
-            "generation_config": generation_config,
-            "framework_preview": framework_prompt[:200] + "..." if len(framework_prompt) > 200 else framework_prompt,
-            "text_preview": text[:200] + "..." if len(text) > 200 else text,
-            "text_length": len(text),
-            "use_json": use_json,
-            "analysis": analysis_data,
-            "raw_response": analysis_text,
-            "metadata": {}
-        }
-        
-        # Safely extract usage metadata
-        try:
-            if hasattr(response, 'usage_metadata'):
-                usage = response.usage_metadata
-                result["metadata"] = {
-                    "prompt_tokens": getattr(usage, 'prompt_token_count', None),
-                    "response_tokens": getattr(usage, 'candidates_token_count', None),
-                    "total_tokens": getattr(usage, 'total_token_count', None)
-                }
-            else:
-                result["metadata"] = {
-                    "prompt_tokens": None,
-                    "response_tokens": None,
-                    "total_tokens": None
-                }
-        except Exception as metadata_error:
-            st.warning(f"⚠️ Could not extract usage metadata: {metadata_error}")
-            result["metadata"] = {
-                "prompt_tokens": None,
-                "response_tokens": None,
-                "total_tokens": None
-            }
-        
+    # While the model streams, the bar moves from 25 to 75 by received text
+    # against the expected output size
+    expected_chars = expected_output_tokens(analysis_schema) * CHARS_PER_TOKEN
+    script_context = get_script_run_ctx()
+
+    def on_span(state, name):
+        if state == "start" and name in STAGE_PROGRESS:
+            progress, message = STAGE_PROGRESS[name]
+            progress_bar.progress(progress)
+            status_text.text(message)
+
+    def on_event(event):
+        if event["type"] == "chunk":
+            # Chunks arrive on the engine's streaming thread
+            if script_context is None:
+                return
+            if get_script_run_ctx() is None:
+                add_script_run_ctx(threading.current_thread(), script_context)
+            progress_bar.progress(25 + int(50 * min(1.0, event["received_chars"] / expected_chars)))
+        elif event["type"] == "notice":
+            getattr(st, event["level"])(event["message"])
+        elif event["type"] == "failed":
+            st.error(event["message"])
+            st.info("💡 Troubleshooting tips:")
+            for tip in event["tips"]:
+                st.info(f"• {tip}")
+
+    result = run_analysis(
+        text,
+        framework_prompt,
+        analysis_schema=analysis_schema,
+        model_name=model_name,
+        generation_config=generation_config,
+        on_event=on_event,
+        timings=Timings(on_span=on_span)
+    )
+
+    if result:
         progress_bar.progress(100)
         status_text.text("🎉 Analysis complete!")
-        
-        return result
-        
-    except Exception as e:
-        st.error(f"❌ Analysis failed: {str(e)}")
-        st.info("💡 Troubleshooting tips:")
-        st.info("• Check your API key configuration")
-        st.info(f"• Verify model '{model_name}' is available")
-        st.info("• Try with shorter text (under 25,000 characters)")
-        st.info("• Verify your framework prompt is properly formatted")
-        return None
\ No newline at end of file
+    return result
@@ -0,0 +1,643 @@
+# analysis_service.py
+# HTTP service running framework analyses for other tools (LMS plugins, notebooks)
+#
+# Jobs are queued and run by a fixed pool of worker threads around
+# analysis_engine.run_analysis. The queue is bounded: when it is full, new
+# submissions get 503 with Retry-After instead of piling up behind a slow
+# model. Finished jobs are kept for JOB_TTL_S.
+#
+#     POST /jobs                  {"text": ..., "framework": <FRAMEWORK_EXAMPLES key>}
+#                                 or {"text": ..., "prompt": ..., "schema": {...}}
+#                                 optional: model, schema_profile, thinking_profile,
+#                                 samples, fallback, class_label  -> 202 {"id": ...}
+#     GET  /jobs/<id>             status, stage, streamed characters and items so far
+#     GET  /jobs/<id>/events      server-sent events: status, stage, notice, progress,
+#                                 item (each finished item of a top-level array or of
+#                                 an array one object down), done, failed
+#     GET  /jobs/<id>/result      the result, in the shape of the app's JSON download
+#     GET  /jobs/<id>/report      the markdown report
+#     GET  /frameworks, /health, /metrics
+#
+#     GOOGLE_API_KEY=... python analysis_service.py --port 8600 --workers 4
+#     python analysis_service.py --backend fake --time-scale 0.1
+#
+# All jobs use the service's API key. Set AFA_SERVICE_TOKEN to require
+# "Authorization: Bearer <token>" on every endpoint except /health.
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from analysis_engine import run_analysis
+from backends import FakeGeminiBackend, get_backend, set_backend
+from framework_data import FRAMEWORK_EXAMPLES
+from metrics import counter, gauge, render_metrics
+from model_router import MODEL_PROFILES, THINKING_PROFILES
+from report_utils import create_markdown_report
+from resilience import FALLBACK_CASCADE
+from schema_utils import SCHEMA_PROFILES
+from usage_ledger import hash_api_key
+
+SERVICE_HOST = os.environ.get("AFA_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("AFA_SERVICE_PORT", "8600"))
+SERVICE_WORKERS = int(os.environ.get("AFA_SERVICE_WORKERS", "4"))
+SERVICE_TOKEN = os.environ.get("AFA_SERVICE_TOKEN", "")
+
+# Jobs waiting for a worker before submissions are refused
+QUEUE_CAPACITY = int(os.environ.get("AFA_SERVICE_QUEUE", "32"))
+
+# Seconds a refused client is asked to wait before retrying
+RETRY_AFTER_S = 10
+
+# Finished jobs are forgotten after this long
+JOB_TTL_S = 3600
+
+# Largest accepted request body (text, prompt and schema)
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+# Same limit as the app's "Samples to compare"
+MAX_SAMPLES = 5
+
+# Seconds between keep-alive comments on an idle event stream
+KEEPALIVE_S = 15
+
+FINISHED_STATES = ("done", "failed")
+
+SERVICE_JOBS = gauge(
+    "afa_service_jobs", "Service jobs waiting for or holding a worker", ("state",)
+)
+SERVICE_SUBMISSIONS = counter(
+    "afa_service_submissions_total", "Service job submissions by outcome (accepted, rejected, invalid)", ("outcome",)
+)
+
+# =============================================================================
+# PARTIAL RESULTS
+# =============================================================================
+
+class PartialItems:
+    """
+    Finds finished items in a JSON response while it streams
+
+    An item is an object directly inside an array at the top of the
+    response, e.g. one entry of "frames", or inside an array one object
+    down, e.g. one entry of "ethos_analysis.examples". The section names the
+    array by its keys. The text is scanned once, chunk by chunk, so long
+    responses cost no more than parsing them.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        # Open containers: [bracket, key in the parent object, start offset]
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = 0
+        self.last_string = None
+        self.key = None
+        self.counts = {}
+
+    def feed(self, chunk):
+        """
+        Add streamed text
+
+        Returns:
+            list: (section, index, item) for each item finished in this chunk
+        """
+        self.text += chunk
+        items = []
+        text = self.text
+        for position in range(self.position, len(text)):
+            char = text[position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start:position + 1]
+            elif char == '"':
+                self.in_string = True
+                self.string_start = position
+            elif char == ":" and self.stack and self.stack[-1][0] == "{":
+                try:
+                    self.key = json.loads(self.last_string) if self.last_string else None
+                except json.JSONDecodeError:
+                    self.key = None
+            elif char in "{[":
+                key = self.key if self.stack and self.stack[-1][0] == "{" else None
+                self.stack.append([char, key, position])
+                self.key = None
+            elif char in "}]" and self.stack:
+                bracket, _key, start = self.stack.pop()
+                if bracket == "{" and self._in_item_array():
+                    section = ".".join(key for _bracket, key, _start in self.stack if key) or None
+                    try:
+                        item = json.loads(text[start:position + 1])
+                    except json.JSONDecodeError:
+                        continue
+                    index = self.counts.get(section, 0)
+                    self.counts[section] = index + 1
+                    items.append((section, index, item))
+            elif char == ",":
+                self.key = None
+        self.position = len(text)
+        return items
+
+    def _in_item_array(self):
+        """
+        True if the innermost open container is an array holding items
+
+        That is the response itself, an array in the top-level object or an
+        array in an object one level down; arrays inside an item belong to it.
+        """
+        if not self.stack or self.stack[-1][0] != "[" or len(self.stack) > 3:
+            return False
+        return all(bracket == "{" for bracket, _key, _start in self.stack[:-1])
+
+# =============================================================================
+# JOBS AND WORKERS
+# =============================================================================
+
+class QueueFull(Exception):
+    """The job queue is at capacity"""
+
+
+def parse_job_request(body):
+    """
+    Validate a submitted job
+
+    Args:
+        body: Decoded JSON request body
+
+    Returns:
+        dict: Job settings (text, prompt, schema, framework, model, ...)
+
+    Raises:
+        ValueError: With a message for the client
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    text = body.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("'text' must be a non-empty string")
+
+    framework = body.get("framework")
+    prompt = body.get("prompt")
+    if bool(framework) == bool(prompt):
+        raise ValueError("Give either 'framework' (a built-in framework) or 'prompt' (a custom framework)")
+    if framework:
+        if framework not in FRAMEWORK_EXAMPLES:
+            raise ValueError(f"Unknown framework {framework!r}; see GET /frameworks")
+        example = FRAMEWORK_EXAMPLES[framework]
+        prompt, schema = example["prompt"], example["schema"]
+        thinking_default = example.get("thinking_profile", "default")
+    else:
+        if not isinstance(prompt, str):
+            raise ValueError("'prompt' must be a string")
+        schema = body.get("schema")
+        if schema is not None and not isinstance(schema, dict):
+            raise ValueError("'schema' must be a JSON schema object")
+        thinking_default = "default"
+
+    settings = {
+        "text": text,
+        "prompt": prompt,
+        "schema": schema,
+        "framework": framework,
+        "model": body.get("model", "gemini-2.5-flash"),
+        "schema_profile": body.get("schema_profile", "Full"),
+        "thinking_profile": body.get("thinking_profile", thinking_default),
+        "samples": body.get("samples", 1),
+        "fallback": bool(body.get("fallback", False)),
+        "class_label": str(body.get("class_label", "")),
+    }
+    if settings["model"] not in MODEL_PROFILES:
+        raise ValueError(f"Unknown model {settings['model']!r}; choose one of: {', '.join(MODEL_PROFILES)}")
+    if settings["schema_profile"] not in SCHEMA_PROFILES:
+        raise ValueError(f"'schema_profile' must be one of: {', '.join(SCHEMA_PROFILES)}")
+    if settings["thinking_profile"] not in THINKING_PROFILES:
+        raise ValueError(f"'thinking_profile' must be one of: {', '.join(THINKING_PROFILES)}")
+    # bool is an int subclass; "samples": true is not a count
+    samples = settings["samples"]
+    if not isinstance(samples, int) or isinstance(samples, bool) or not 1 <= samples <= MAX_SAMPLES:
+        raise ValueError(f"'samples' must be an integer from 1 to {MAX_SAMPLES}")
+    return settings
+
+
+class AnalysisService:
+    """
+    Bounded job queue served by a pool of worker threads
+
+    Every change to a job is appended to its event list and wakes the
+    threads streaming its events.
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, capacity=QUEUE_CAPACITY, key_hash=None):
+        self.queue = queue.Queue(maxsize=capacity)
+        self.jobs = {}
+        self.changed = threading.Condition()
+        self.key_hash = key_hash
+        self.workers = [
+            threading.Thread(target=self._work, daemon=True, name=f"analysis-worker-{number}")
+            for number in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, settings):
+        """
+        Queue a job
+
+        Returns:
+            dict: The new job
+
+        Raises:
+            QueueFull: When QUEUE_CAPACITY jobs are already waiting
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "framework": settings["framework"],
+            "model": settings["model"],
+            "text_length": len(settings["text"]),
+            "stage": None,
+            "received_chars": 0,
+            "items": 0,
+            "error": None,
+            "result": None,
+            "settings": settings,
+            "events": [],
+        }
+        with self.changed:
+            self._expire()
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull() from None
+            self.jobs[job["id"]] = job
+            self._emit(job, "status", status="queued")
+        self._update_gauges()
+        return job
+
+    def get(self, job_id):
+        """A job by id (None if unknown or expired)"""
+        with self.changed:
+            return self.jobs.get(job_id)
+
+    def status(self, job):
+        """Public view of a job, without its settings, result or events"""
+        with self.changed:
+            view = {
+                key: job[key] for key in (
+                    "id", "status", "created", "started", "finished", "framework", "model",
+                    "text_length", "stage", "received_chars", "items", "error"
+                )
+            }
+            if job["status"] == "queued":
+                view["queue_position"] = sum(
+                    1 for other in self.jobs.values()
+                    if other["status"] == "queued" and other["created"] <= job["created"]
+                )
+        return view
+
+    def events_after(self, job, after, timeout=KEEPALIVE_S):
+        """
+        Events of a job past index after, waiting up to timeout for new ones
+
+        Returns:
+            list: (index, event) pairs, empty if nothing happened in time
+        """
+        with self.changed:
+            if len(job["events"]) <= after + 1 and job["status"] not in FINISHED_STATES:
+                self.changed.wait(timeout)
+            return list(enumerate(job["events"]))[after + 1:]
+
+    def health(self):
+        """Queue and worker counts"""
+        with self.changed:
+            states = [job["status"] for job in self.jobs.values()]
+        return {
+            "status": "ok",
+            "workers": len(self.workers),
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+            "capacity": self.queue.maxsize,
+        }
+
+    def _emit(self, job, event_type, **fields):
+        """Append an event to a job and wake its listeners (caller holds self.changed)"""
+        job["events"].append({"type": event_type, **fields})
+        self.changed.notify_all()
+
+    def _expire(self):
+        """Forget jobs finished more than JOB_TTL_S ago (caller holds self.changed)"""
+        cutoff = time.time() - JOB_TTL_S
+        for job_id in [key for key, job in self.jobs.items() if job["finished"] and job["finished"] < cutoff]:
+            del self.jobs[job_id]
+
+    def _update_gauges(self):
+        health = self.health()
+        SERVICE_JOBS.set(health["queued"], state="queued")
+        SERVICE_JOBS.set(health["running"], state="running")
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._run(job)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job):
+        """Run one job, recording its engine events"""
+        settings = job["settings"]
+        # One parser and character count per streamed request and candidate;
+        # samples stream in parallel, as candidates of one request or as requests
+        partial = {}
+        received = {}
+        failure = {}
+
+        def on_event(event):
+            with self.changed:
+                if event["type"] == "stage":
+                    if event["state"] == "start":
+                        job["stage"] = event["name"]
+                        self._emit(job, "stage", name=event["name"])
+                elif event["type"] == "notice":
+                    self._emit(job, "notice", level=event["level"], message=event["message"])
+                elif event["type"] == "chunk":
+                    stream, candidate = event["stream"], event["candidate"]
+                    parser = partial.setdefault((stream, candidate), PartialItems())
+                    received[(stream, candidate)] = event["received_chars"]
+                    job["received_chars"] = sum(received.values())
+                    self._emit(
+                        job, "progress", model=event["model"], stream=stream, candidate=candidate,
+                        received_chars=event["received_chars"]
+                    )
+                    for section, index, item in parser.feed(event["text"]):
+                        job["items"] += 1
+                        self._emit(
+                            job, "item", stream=stream, candidate=candidate, section=section, index=index, item=item
+                        )
+                elif event["type"] == "failed":
+                    failure["error"] = event["error"]
+
+        with self.changed:
+            job["status"] = "running"
+            job["started"] = time.time()
+            self._emit(job, "status", status="running")
+        self._update_gauges()
+
+        usage_context = None
+        if self.key_hash:
+            usage_context = {"key_hash": self.key_hash, "session_id": None, "class_label": settings["class_label"]}
+        try:
+            result = run_analysis(
+                settings["text"],
+                settings["prompt"],
+                analysis_schema=settings["schema"],
+                model_name=settings["model"],
+                schema_profile=settings["schema_profile"],
+                on_event=on_event,
+                framework_name=settings["framework"],
+                fallback_models=FALLBACK_CASCADE if settings["fallback"] else None,
+                thinking_profile=settings["thinking_profile"],
+                samples=settings["samples"],
+                usage_context=usage_context
+            )
+        except Exception as e:
+            result = None
+            failure["error"] = str(e)
+
+        with self.changed:
+            job["finished"] = time.time()
+            job["stage"] = None
+            if result:
+                job["status"] = "done"
+                job["result"] = result
+                metadata = result.get("metadata", {})
+                self._emit(
+                    job, "done", model=result["model"], latency_s=metadata.get("latency_s"),
+                    total_tokens=metadata.get("total_tokens"), items=job["items"]
+                )
+            else:
+                job["status"] = "failed"
+                job["error"] = failure.get("error", "Analysis failed")
+                self._emit(job, "failed", error=job["error"])
+            # The text is no longer needed once the job has finished
+            job["settings"] = None
+        self._update_gauges()
+
+# =============================================================================
+# HTTP ENDPOINTS
+# =============================================================================
+
+JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/events|/result|/report)?$")
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the AnalysisService in self.server.service"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, self.server.service.health())
+            return
+        if not self._authorized():
+            return
+        if url.path == "/frameworks":
+            self._send_json(200, [
+                {
+                    "id": name,
+                    "description": example["description"],
+                    "discipline": example["discipline"],
+                    "has_schema": example["schema"] is not None,
+                }
+                for name, example in FRAMEWORK_EXAMPLES.items()
+            ])
+            return
+        if url.path == "/metrics":
+            self._send_body(200, render_metrics().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+            return
+
+        match = JOB_PATH.match(url.path)
+        job = self.server.service.get(match.group(1)) if match else None
+        if not job:
+            self._send_json(404, {"error": "Unknown or expired job"})
+            return
+
+        view = match.group(2)
+        if view is None:
+            self._send_json(200, self.server.service.status(job))
+        elif view == "/events":
+            after = self.headers.get("Last-Event-ID") or parse_qs(url.query).get("after", ["-1"])[0]
+            self._stream_events(job, int(after) if after.lstrip("-").isdigit() else -1)
+        elif job["status"] != "done":
+            self._send_json(409, {"error": f"The job is {job['status']}", "status": job["status"]})
+        elif view == "/result":
+            self._send_json(200, job["result"])
+        else:
+            report = create_markdown_report(job["result"])
+            self._send_body(200, report.encode("utf-8"), "text/markdown; charset=utf-8")
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if urlparse(self.path).path != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        length = self.headers.get("Content-Length", "0")
+        length = int(length) if length.isdigit() else 0
+        if length > MAX_BODY_BYTES:
+            SERVICE_SUBMISSIONS.inc(outcome="invalid")
+            self._send_json(413, {"error": f"The request body is larger than {MAX_BODY_BYTES:,} bytes"})
+            return
+        try:
+            settings = parse_job_request(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, UnicodeDecodeError) as e:
+            SERVICE_SUBMISSIONS.inc(outcome="invalid")
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            job = self.server.service.submit(settings)
+        except QueueFull:
+            SERVICE_SUBMISSIONS.inc(outcome="rejected")
+            self._send_json(
+                503, {"error": "The analysis queue is full; retry later"}, {"Retry-After": str(RETRY_AFTER_S)}
+            )
+            return
+        SERVICE_SUBMISSIONS.inc(outcome="accepted")
+        self._send_json(202, {
+            "id": job["id"],
+            "status": job["status"],
+            "status_url": f"/jobs/{job['id']}",
+            "events_url": f"/jobs/{job['id']}/events",
+            "result_url": f"/jobs/{job['id']}/result",
+            "report_url": f"/jobs/{job['id']}/report",
+        }, {"Location": f"/jobs/{job['id']}"})
+
+    def _authorized(self):
+        """Check the bearer token when AFA_SERVICE_TOKEN is set (sends 401 otherwise)"""
+        token = self.server.token
+        # Constant-time comparison (as bytes: compare_digest rejects non-ASCII str)
+        supplied = self.headers.get("Authorization", "").encode("utf-8")
+        if not token or hmac.compare_digest(supplied, f"Bearer {token}".encode("utf-8")):
+            return True
+        self._send_json(401, {"error": "Missing or wrong bearer token"}, {"WWW-Authenticate": "Bearer"})
+        return False
+
+    def _stream_events(self, job, after):
+        """Send a job's events as server-sent events until it finishes"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                events = self.server.service.events_after(job, after)
+                if not events:
+                    if job["status"] in FINISHED_STATES:
+                        return
+                    self.wfile.write(b": keepalive\n\n")
+                for index, event in events:
+                    data = json.dumps({key: value for key, value in event.items() if key != "type"}, ensure_ascii=False)
+                    self.wfile.write(f"id: {index}\nevent: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+                    after = index
+                self.wfile.flush()
+                if events and events[-1][1]["type"] in FINISHED_STATES:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            return
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self._send_body(status, body, "application/json; charset=utf-8", headers)
+
+    def _send_body(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Status polls and event streams would flood the console
+        pass
+
+
+def start_service(host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS, capacity=QUEUE_CAPACITY,
+                  key_hash=None, token=SERVICE_TOKEN):
+    """
+    Start the worker pool and serve the HTTP endpoints from a daemon thread
+
+    Args:
+        host: Interface to bind; local only by default
+        port: TCP port (0 picks a free one; see server.server_address)
+        workers: Analyses run at once
+        capacity: Jobs allowed to wait for a worker
+        key_hash: hash_api_key() charged in the usage ledger (None: not recorded)
+        token: Bearer token required on requests ("" for none)
+
+    Returns:
+        ThreadingHTTPServer: The running server, with .service
+    """
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.daemon_threads = True
+    server.service = AnalysisService(workers=workers, capacity=capacity, key_hash=key_hash)
+    server.token = token
+    threading.Thread(target=server.serve_forever, daemon=True, name="analysis-http").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve framework analyses over HTTP")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="Analyses run at once")
+    parser.add_argument("--queue", type=int, default=QUEUE_CAPACITY, help="Jobs allowed to wait for a worker")
+    parser.add_argument("--backend", choices=["gemini", "fake"], default=os.environ.get("AFA_BACKEND", "gemini"))
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Fake backend only: multiplier on simulated model latency")
+    args = parser.parse_args()
+
+    key_hash = None
+    if args.backend == "fake":
+        # Simulated runs cost nothing and stay out of the ledger
+        set_backend(FakeGeminiBackend(time_scale=args.time_scale))
+    else:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            parser.error("Set GOOGLE_API_KEY (or use --backend fake)")
+        get_backend().configure(api_key)
+        key_hash = hash_api_key(api_key)
+
+    server = start_service(args.host, args.port, args.workers, args.queue, key_hash)
+    host, port = server.server_address[:2]
+    print(f"🚀 Serving analyses on http://{host}:{port} with {args.workers} worker(s), queue of {args.queue}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
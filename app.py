@@ -1,8 +1,10 @@
 import streamlit as st
-import google.generativeai as genai
 import json
-import re
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # Import custom modules
 from framework_data import (
@@ -15,13 +17,46 @@ from display_utils import (
     display_metaphor_results, 
     display_framing_results,
     display_rhetorical_results,
+    display_model_comparison,
     create_markdown_report
 )
+from analysis_engine import run_analysis
+from backends import get_backend
+from memory_stats import (
+    memory_summary,
+    record_session,
+    rss_history,
+    sample_rss,
+    session_summaries,
+    start_rss_sampler,
+    start_tracing,
+    top_allocations
+)
+from metrics import start_metrics_server
+from model_router import ROUTABLE_MODELS, THINKING_PROFILES, estimate_tokens, route_model
+from preflight import output_token_budget, plan_analysis
+from rerun_profiler import PROFILE_RERUNS, add_profile, profile_call
+from resilience import DEFAULT_DEADLINE_S, FALLBACK_CASCADE, HEDGE_PERCENTILES
+from timings import Timings
+from usage_ledger import (
+    GROUPINGS,
+    hash_api_key,
+    ledger_enabled,
+    quota_projection,
+    usage_summary
+)
+from schema_utils import SCHEMA_PROFILES, get_compact_schema, get_schema_profile
 
 # =============================================================================
 # PAGE SETUP
 # =============================================================================
 
+# Start of this rerun, for the developer-mode rerun profiler
+SCRIPT_STARTED = time.perf_counter()
+
+# Admin page with process-wide memory figures (AFA_ADMIN_VIEW=1)
+ADMIN_VIEW = os.environ.get("AFA_ADMIN_VIEW", "").lower() in ("1", "true", "yes")
+
 st.set_page_config(
     page_title="AI Framework Analysis Tool - W&M Libraries",
     page_icon="🔬",
@@ -157,7 +192,28 @@ def init_simple_state():
         'text_to_analyze': '',
         'analysis_results': None,
         'model_name': 'gemini-2.5-flash',
-        'show_workshop_page': False
+        'auto_route': False,
+        'latency_target_s': 45,
+        'compact_output': False,
+        'schema_profile': 'Full',
+        'tiered_analysis': False,
+        'deep_analysis_job': None,
+        'deep_analysis_failed': False,
+        'analysis_run': 0,
+        'hedge_requests': False,
+        'hedge_percentile': 0.9,
+        'hedge_faster_model': False,
+        'use_fallback': False,
+        'fallback_models': FALLBACK_CASCADE[1:],
+        'deadline_s': DEFAULT_DEADLINE_S,
+        'thinking_profile': 'framework default',
+        'samples': 1,
+        'compare_models': False,
+        'comparison_models': ['gemini-2.5-flash', 'gemini-2.5-flash-lite'],
+        'comparison_results': None,
+        'show_workshop_page': False,
+        'show_admin_page': False,
+        'class_label': ''
     }
     
     for key, value in defaults.items():
@@ -448,6 +504,126 @@ Generated by AI Framework Analysis Tool - Workshop Edition
     
     return resources
 
+# =============================================================================
+# ADMIN PAGE
+# =============================================================================
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+def show_admin_page():
+    """Process-wide view for whoever runs the deployment (AFA_ADMIN_VIEW=1)"""
+    st.markdown('<div class="big-header">🛠️ Admin</div>', unsafe_allow_html=True)
+    st.caption("Figures cover every session served by this process, not just yours.")
+    show_memory_admin()
+    if ledger_enabled():
+        show_usage_admin()
+
+def show_usage_admin():
+    """Token use and cost across keys, classes, frameworks and models"""
+    st.markdown("### 💰 Usage & Cost")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        group_by = st.selectbox("Group by:", list(GROUPINGS), format_func=GROUPINGS.get, key="usage_group_by")
+    with col2:
+        days = st.selectbox("Period:", [1, 7, 30, 90, 365], index=2, format_func=lambda value: f"Last {value} day(s)", key="usage_days")
+    with col3:
+        key_rows = usage_summary("key_hash", days=days)
+        key_options = [None] + [row['key_hash'] for row in key_rows]
+        key_hash = st.selectbox(
+            "API key:",
+            key_options,
+            format_func=lambda value: "All keys" if value is None else value,
+            key="usage_key"
+        )
+    
+    rows = usage_summary(group_by, days=days, key_hash=key_hash)
+    if not rows:
+        st.write("No usage recorded in this period.")
+        return
+    
+    total_cost = sum(row['cost_usd'] for row in rows)
+    total_tokens = sum(row['total_tokens'] for row in rows)
+    st.write(f"**{sum(row['requests'] for row in rows):,} runs** · {total_tokens:,} tokens · ${total_cost:.2f}")
+    show_usage_table(rows, group_by)
+    label = GROUPINGS[group_by]
+    st.bar_chart([{label: str(row[group_by]), "Cost (USD)": row['cost_usd']} for row in rows], x=label, y="Cost (USD)")
+    
+    if key_hash:
+        st.markdown(f"**Quota projection for key {key_hash}**")
+        show_quota_projection(quota_projection(key_hash))
+
+def show_memory_admin():
+    """Session state sizes, cached results, RSS over time and traced allocations"""
+    st.markdown("### 🧠 Memory")
+    sample_rss()
+    summary = memory_summary()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Process RSS", format_bytes(summary['rss_bytes']) if summary['rss_bytes'] is not None else "n/a")
+    with col2:
+        st.metric("Sessions", summary['sessions'])
+    with col3:
+        st.metric("Session State", format_bytes(summary['state_bytes']))
+    with col4:
+        st.metric("Cached Results", format_bytes(summary['results_bytes']))
+    
+    if summary['projected_rss_bytes'] is not None:
+        st.info(
+            f"📐 At {summary['projected_sessions']} sessions of the current 95th-percentile size "
+            f"({format_bytes(summary['p95_session_bytes'])}), this process would need about "
+            f"**{format_bytes(summary['projected_rss_bytes'])}**. Raw response text accounts for "
+            f"{format_bytes(summary['raw_response_bytes'])} of the cached results."
+        )
+    
+    history = rss_history()
+    if len(history) > 1:
+        st.markdown("**RSS over time (MB)**")
+        st.line_chart({
+            "RSS (MB)": [round(rss / 1024 ** 2, 1) for _, rss in history]
+        })
+        st.caption(f"One sample every 15 s; {len(history)} samples since {datetime.fromtimestamp(history[0][0]).strftime('%H:%M:%S')}.")
+    
+    sessions = session_summaries()
+    if sessions:
+        st.markdown("**Sessions (largest first)**")
+        now = time.time()
+        st.dataframe(
+            [
+                {
+                    "Session": entry['session_id'][:8],
+                    "State": format_bytes(entry['state_bytes']),
+                    "Results": format_bytes(entry['results_bytes']),
+                    "Raw Responses": format_bytes(entry['raw_response_bytes']),
+                    "Largest Keys": ", ".join(f"{key} ({format_bytes(size)})" for key, size in entry['largest_keys'][:3]),
+                    "Last Seen": f"{now - entry['seen']:.0f} s ago"
+                }
+                for entry in sessions
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    if summary['traced']:
+        current, peak = summary['traced']
+        st.markdown(f"**Traced Python heap:** {format_bytes(current)} (peak {format_bytes(peak)})")
+        st.dataframe(
+            [
+                {"Location": row['location'], "Size": format_bytes(row['size_bytes']), "Blocks": row['blocks']}
+                for row in top_allocations()
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.caption("Set AFA_TRACEMALLOC=1 before starting the app to trace allocations by source line.")
+
 # =============================================================================
 # MAIN APP LOGIC
 # =============================================================================
@@ -455,6 +631,19 @@ Generated by AI Framework Analysis Tool - Workshop Edition
 def main():
     """Main application with W&M Libraries attribution and workshop page integration"""
     init_simple_state()
+    get_metrics_server()
+    get_memory_sampler()
+    record_session_memory()
+    
+    # Admin page (only with AFA_ADMIN_VIEW)
+    if ADMIN_VIEW and st.session_state.get('show_admin_page', False):
+        show_admin_page()
+        
+        st.markdown("---")
+        if st.button("← Back to Analysis Tool", type="secondary", key="admin_back"):
+            st.session_state.show_admin_page = False
+            st.rerun()
+        return
     
     # Check if workshop page should be shown
     if st.session_state.get('show_workshop_page', False):
@@ -519,6 +708,11 @@ def main():
             use_container_width=True
         )
         
+        if ADMIN_VIEW:
+            if st.button("🛠️ Admin", use_container_width=True):
+                st.session_state.show_admin_page = True
+                st.rerun()
+        
         st.markdown("### 🔄 Reset")
         if st.button("Start Over", type="secondary", use_container_width=True):
             # Clear everything except workshop page preference
@@ -635,11 +829,14 @@ def step_1_api_setup():
             if st.button("🔗 Test Connection", type="primary"):
                 with st.spinner("Testing API key..."):
                     try:
-                        genai.configure(api_key=api_key)
-                        test_model = genai.GenerativeModel("gemini-2.5-flash")
+                        get_backend().configure(api_key)
+                        test_model = get_backend().create_model("gemini-2.5-flash")
                         
                         # Try a simple test query
-                        test_response = test_model.generate_content("Say 'API test successful'")
+                        test_response = test_model.generate_content(
+                            "Say 'API test successful'",
+                            request_options={"timeout": 30}
+                        )
                         
                         st.session_state.api_configured = True
                         st.success("✅ API key works perfectly! Ready for next step.")
@@ -667,13 +864,47 @@ def step_1_api_setup():
             [
                 "gemini-2.5-flash (Recommended - Fast & Smart)",
                 "gemini-2.5-pro (Slower but Most Capable)",
-                "gemini-2.5-flash-lite (Fastest)"
+                "gemini-2.5-flash-lite (Fastest)",
+                "auto (Pick per text size and latency target)"
             ]
         )
-        st.session_state.model_name = model_choice.split(" ")[0]
+        st.session_state.auto_route = model_choice.startswith("auto")
         
-        # Show current status
-        st.success(f"✅ Ready with {st.session_state.model_name}")
+        if st.session_state.auto_route:
+            st.session_state.latency_target_s = st.slider(
+                "Results in under (seconds):",
+                min_value=15,
+                max_value=180,
+                value=st.session_state.latency_target_s,
+                step=5,
+                help="The most capable model expected to finish within this time is picked for each run, "
+                     "based on text length, the framework's output size and recent response times."
+            )
+            st.success(f"✅ Ready with automatic model routing (target: {st.session_state.latency_target_s} s)")
+        else:
+            st.session_state.model_name = model_choice.split(" ")[0]
+            
+            # Show current status
+            st.success(f"✅ Ready with {st.session_state.model_name}")
+        
+        thinking_options = ["framework default"] + list(THINKING_PROFILES)
+        st.session_state.thinking_profile = st.selectbox(
+            "Thinking budget:",
+            thinking_options,
+            index=thinking_options.index(st.session_state.thinking_profile),
+            help="Gemini 2.5 models think before answering. Less thinking is faster; more can help "
+                 "with subtle texts. 'framework default' uses the setting each example framework was tuned with."
+        )
+        
+        st.session_state.class_label = st.text_input(
+            "Class or section (optional):",
+            value=st.session_state.class_label,
+            placeholder="e.g. ENGL 210-02",
+            help="Runs are logged under this label so instructors sharing one API key can see which class used the budget."
+        )
+        
+        if ledger_enabled():
+            show_key_usage()
     
     # Debug info if there are issues
     if api_key and not st.session_state.api_configured:
@@ -683,6 +914,59 @@ def step_1_api_setup():
             st.write(f"Key preview: {api_key[:10]}...")
             st.write("If this looks wrong, try copying the key again from Google AI Studio.")
 
+def show_usage_table(rows, group_by):
+    """Ledger rows aggregated by one column, as a table"""
+    st.dataframe(
+        [
+            {
+                GROUPINGS[group_by]: row[group_by] or "—",
+                "Runs": row['requests'],
+                "Prompt Tokens": row['prompt_tokens'],
+                "Response Tokens": row['response_tokens'],
+                "Thinking Tokens": row['thoughts_tokens'],
+                "Total Tokens": row['total_tokens'],
+                "Cost (USD)": f"${row['cost_usd']:.4f}"
+            }
+            for row in rows
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
+
+def show_quota_projection(projection):
+    """Today's tokens and this month's cost for a key, with projections"""
+    if projection is None:
+        st.caption("⚠️ The usage ledger can't be read right now.")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Tokens Today", f"{projection['tokens_today']:,}")
+        st.caption(f"At this pace: {projection['projected_tokens_today']:,} by midnight")
+        if projection['tokens_remaining_today'] is not None:
+            st.caption(f"Left of the {projection['daily_token_quota']:,}-token daily quota: {projection['tokens_remaining_today']:,}")
+            if projection['projected_tokens_today'] > projection['daily_token_quota']:
+                st.warning("⚠️ At this pace the daily token quota runs out before midnight.")
+    with col2:
+        st.metric("Cost This Month", f"${projection['cost_this_month']:.2f}")
+        st.caption(f"At this pace: ${projection['projected_cost_this_month']:.2f} by month end")
+        if projection['budget_remaining_usd'] is not None:
+            st.caption(f"Left of the ${projection['monthly_budget_usd']:.2f} monthly budget: ${projection['budget_remaining_usd']:.2f}")
+            if projection['budget_exhausted_on']:
+                st.warning(f"⚠️ At this pace the monthly budget runs out on {projection['budget_exhausted_on']}.")
+
+def show_key_usage():
+    """Usage of the current API key by class over the last 30 days"""
+    with st.expander("📒 Usage on this API key"):
+        key_hash = hash_api_key(st.session_state.api_key)
+        show_quota_projection(quota_projection(key_hash))
+        rows = usage_summary("class_label", days=30, key_hash=key_hash)
+        if rows:
+            st.markdown("**Last 30 days by class**")
+            show_usage_table(rows, "class_label")
+        else:
+            st.write("No analyses have been run with this key yet.")
+        st.caption("Prices are list prices per million tokens; thinking tokens are billed as output.")
+
 # =============================================================================
 # STEP 2: CHOOSE FRAMEWORK (WITH COMPLETE DISPLAY FIX)
 # =============================================================================
@@ -937,18 +1221,28 @@ def show_simple_text_stats():
     with col2:
         st.metric("Words", f"{word_count:,}")
     with col3:
-        if text_length < 1000:
-            status = "Short"
-        elif text_length > 25000:
-            status = "Long"
-        else:
-            status = "Good"
-        st.metric("Length", status)
+        # Calibrated against the token counts Gemini reported for past runs
+        st.metric("Est. tokens", f"{estimate_tokens(st.session_state.text_to_analyze):,}")
 
 # =============================================================================
 # STEP 4: RUN ANALYSIS (WITH ENHANCED JSON ERROR HANDLING)
 # =============================================================================
 
+# Fast model used for the preliminary tier of a tiered analysis
+QUICK_PASS_MODEL = "gemini-2.5-flash-lite"
+
+# Most samples a single run can draw
+MAX_SAMPLES = 5
+
+# Progress bar position and status shown when an engine stage starts or ends
+ANALYSIS_STAGES = {
+    ("start", "model_call"): (25, "🤖 Waiting for the model..."),
+    ("end", "model_call"): (80, "📥 Response received..."),
+    ("start", "json_parse"): (85, "🔍 Parsing the response..."),
+    ("start", "json_repair"): (88, "🔧 Repairing the JSON..."),
+    ("start", "validation"): (95, "✅ Checking the schema..."),
+}
+
 def step_4_run_analysis():
     """Step 4: Run the analysis with enhanced JSON error handling"""
     st.markdown('<div class="step-box current-step">', unsafe_allow_html=True)
@@ -963,23 +1257,200 @@ def step_4_run_analysis():
         st.markdown("**📋 Analysis Setup:**")
         st.write(f"• **Framework:** {st.session_state.selected_framework}")
         st.write(f"• **Text length:** {len(st.session_state.text_to_analyze):,} characters")
-        st.write(f"• **Model:** {st.session_state.model_name}")
+        routing = get_routing_decision()
+        if routing:
+            st.write(f"• **Model:** {routing['model']} (auto, {routing['reason']})")
+        else:
+            st.write(f"• **Model:** {st.session_state.model_name}")
+        st.write(f"• **Thinking:** {get_thinking_profile()}")
+    
+    selected_model = routing['model'] if routing else st.session_state.model_name
+    plan = get_preflight_plan(selected_model)
+    forecast = next((entry for entry in plan['models'] if entry['model'] == selected_model), None)
     
     with col2:
-        st.markdown("**⏱️ Expected time:**")
-        text_length = len(st.session_state.text_to_analyze)
-        if text_length < 5000:
-            est_time = "30-60 seconds"
-        elif text_length < 15000:
-            est_time = "1-2 minutes"
+        st.markdown("**⏱️ Preflight estimate:**")
+        st.write(f"• **Tokens:** ~{plan['input_tokens']:,} in, ~{plan['output_tokens']:,} out")
+        if forecast:
+            st.write(f"• **Time:** about {forecast['predicted_latency_s']:.0f} seconds")
+            st.write(f"• **Cost:** about ${forecast['cost_usd']:.4f}")
         else:
-            est_time = "2-3 minutes"
-        st.write(f"• **Estimated:** {est_time}")
+            st.write("• **Time:** no profile for this model yet")
+        st.write(f"• **Output budget:** {plan['max_output_tokens']:,} tokens")
+    
+    for warning in plan['warnings']:
+        st.warning(f"⚠️ {warning}")
+    
+    with st.expander("📊 Compare models before running"):
+        st.dataframe(
+            [
+                {
+                    "Model": entry['model'],
+                    "Est. time (s)": entry['predicted_latency_s'],
+                    "Est. cost (USD)": round(entry['cost_usd'], 4),
+                }
+                for entry in plan['models']
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+        calibration = plan['calibration']
+        if calibration['calibration_runs']:
+            st.caption(
+                f"Token estimate calibrated on {calibration['calibration_runs']} past runs "
+                f"({calibration['chars_per_token']} characters per token). "
+                f"Output size learned from {calibration['output_samples']} runs of this framework."
+            )
+        else:
+            st.caption("No past runs yet: using default estimates until the first analyses complete.")
+    
+    # Speed options
+    with st.expander("⚡ Speed Options"):
+        st.session_state.tiered_analysis = st.checkbox(
+            f"Quick pass first ({QUICK_PASS_MODEL}), full analysis in the background",
+            value=st.session_state.tiered_analysis,
+            help="A fast preliminary result appears within seconds so you can start annotating. "
+                 "The full analysis with your selected model replaces it when it is done."
+        )
+        
+        st.session_state.hedge_requests = st.checkbox(
+            "Hedge slow requests",
+            value=st.session_state.hedge_requests,
+            help="If the model hasn't started answering after the usual wait, a duplicate request is sent "
+                 "and whichever finishes first is used. Hedges are capped at about 1 in 10 requests."
+        )
+        if st.session_state.hedge_requests:
+            col_a, col_b = st.columns(2)
+            with col_a:
+                st.session_state.hedge_percentile = st.select_slider(
+                    "Hedge after this percentile of recent first-token times:",
+                    options=HEDGE_PERCENTILES,
+                    value=st.session_state.hedge_percentile,
+                    format_func=lambda value: f"p{int(value * 100)}"
+                )
+            with col_b:
+                st.session_state.hedge_faster_model = st.checkbox(
+                    "Send the hedge to a faster model",
+                    value=st.session_state.hedge_faster_model
+                )
+        
+        st.session_state.use_fallback = st.checkbox(
+            "Fall back to other models on overload, timeout or quota errors",
+            value=st.session_state.use_fallback,
+            help="A degraded answer in 40 seconds beats a failure after two minutes."
+        )
+        if st.session_state.use_fallback:
+            st.session_state.fallback_models = st.multiselect(
+                "Fallback order:",
+                FALLBACK_CASCADE,
+                default=st.session_state.fallback_models
+            )
+        
+        st.session_state.deadline_s = st.number_input(
+            "Time budget (seconds):",
+            min_value=15,
+            max_value=600,
+            value=st.session_state.deadline_s,
+            step=15,
+            help="The whole analysis, including hedges and fallbacks, stops after this long."
+        )
+        
+        # Schema options apply to structured frameworks only
+        if st.session_state.framework_schema:
+            st.session_state.schema_profile = st.radio(
+                "Analysis depth:",
+                SCHEMA_PROFILES,
+                index=SCHEMA_PROFILES.index(st.session_state.schema_profile),
+                horizontal=True,
+                help="Lite keeps only the required fields and at most a few examples per list. "
+                     "Good for quick formative passes in class."
+            )
+            st.session_state.compact_output = st.checkbox(
+                "Compact output (short JSON keys)",
+                value=st.session_state.compact_output,
+                help="The model answers with abbreviated keys, which are expanded back before display. "
+                     "Fewer output tokens means a faster response; results look the same."
+            )
+    
+    st.session_state.samples = st.number_input(
+        "Samples to compare:",
+        min_value=1,
+        max_value=MAX_SAMPLES,
+        value=st.session_state.samples,
+        help="Draw several readings of the same text in one run to discuss how stable they are. "
+             "The prompt is sent once where the model allows it."
+    )
+    
+    st.session_state.compare_models = st.checkbox(
+        "🔀 Compare models (run the same analysis on several models at once)",
+        value=st.session_state.compare_models,
+        help="Shows time, token use and results side by side, to find the cheapest model "
+             "that is good enough for this framework. Fallbacks are off in this mode."
+    )
+    if st.session_state.compare_models:
+        st.session_state.comparison_models = st.multiselect(
+            "Models to compare:",
+            ROUTABLE_MODELS,
+            default=st.session_state.comparison_models
+        )
+        if len(st.session_state.comparison_models) < 2:
+            st.warning("⚠️ Pick at least two models to compare")
     
     # Run analysis button
     if st.button("🚀 Start Analysis", type="primary", use_container_width=True):
         run_the_analysis()
 
+def get_preflight_plan(model_name):
+    """Token, latency and cost forecast for the current setup"""
+    schema, _ = get_schema_profile(st.session_state.framework_schema, st.session_state.schema_profile)
+    if schema and st.session_state.compact_output:
+        schema, _ = get_compact_schema(schema)
+    max_output_tokens, _ = output_token_budget(
+        st.session_state.selected_framework,
+        model_name,
+        len(st.session_state.text_to_analyze),
+        st.session_state.schema_profile
+    )
+    return plan_analysis(
+        text=st.session_state.text_to_analyze,
+        framework_prompt=st.session_state.framework_prompt,
+        schema=schema,
+        framework=st.session_state.selected_framework,
+        schema_profile=st.session_state.schema_profile,
+        max_output_tokens=max_output_tokens
+    )
+
+def get_thinking_profile():
+    """Thinking profile for the run: the Step 1 choice, or the framework's own"""
+    if st.session_state.thinking_profile != "framework default":
+        return st.session_state.thinking_profile
+    framework = FRAMEWORK_EXAMPLES.get(st.session_state.selected_framework, {})
+    return framework.get("thinking_profile", "default")
+
+def get_usage_context():
+    """Who a run is charged to in the usage ledger (API key hash, session, class)"""
+    context = get_script_run_ctx()
+    return {
+        'key_hash': hash_api_key(st.session_state.api_key),
+        'session_id': context.session_id if context else None,
+        'class_label': st.session_state.class_label
+    }
+
+def get_routing_decision():
+    """Routing decision for the current text when automatic routing is on"""
+    if not st.session_state.auto_route:
+        return None
+    
+    schema, _ = get_schema_profile(st.session_state.framework_schema, st.session_state.schema_profile)
+    return route_model(
+        text=st.session_state.text_to_analyze,
+        framework_prompt=st.session_state.framework_prompt,
+        schema=schema,
+        latency_target_s=st.session_state.latency_target_s,
+        framework=st.session_state.selected_framework,
+        schema_profile=st.session_state.schema_profile
+    )
+
 def run_the_analysis():
     """Run analysis with enhanced JSON error handling"""
     try:
@@ -988,49 +1459,129 @@ def run_the_analysis():
             st.error("❌ No API key found. Please go back to Step 1.")
             return
         
-        # Configure API
-        genai.configure(api_key=st.session_state.api_key)
-        
-        # Show progress
+        # Show progress; engine stages move the bar as they actually happen
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        def show_stage(event, name):
+            stage = ANALYSIS_STAGES.get((event, name))
+            if stage:
+                progress, message = stage
+                progress_bar.progress(progress)
+                status_text.text(message)
+        
+        timings = Timings(on_span=show_stage)
+        setup_started = time.perf_counter()
+        
+        # Configure API
         status_text.text("🤖 Configuring API...")
+        get_backend().configure(st.session_state.api_key)
         progress_bar.progress(10)
         
+        # Resolve the model (automatic routing decides per run)
+        routing = get_routing_decision()
+        model_name = routing['model'] if routing else st.session_state.model_name
+        
         # Test API key again before analysis
         try:
-            test_model = genai.GenerativeModel(st.session_state.model_name)
+            test_model = get_backend().create_model(model_name)
             status_text.text("🔑 API key verified...")
-            progress_bar.progress(25)
+            progress_bar.progress(20)
         except Exception as api_error:
             st.error(f"❌ API key validation failed: {str(api_error)}")
             st.error("Please go back to Step 1 and check your API key.")
             return
+        timings.record("client_setup", setup_started)
         
-        status_text.text("🤖 Starting analysis...")
-        progress_bar.progress(50)
-        
-        # Run analysis using ENHANCED function with better error handling
-        result = run_ai_analysis_enhanced(
-            text=st.session_state.text_to_analyze,
-            framework_prompt=st.session_state.framework_prompt,
-            analysis_schema=st.session_state.framework_schema,
-            model_name=st.session_state.model_name,
-            generation_config={
+        analysis_args = {
+            'text': st.session_state.text_to_analyze,
+            'framework_prompt': st.session_state.framework_prompt,
+            'analysis_schema': st.session_state.framework_schema,
+            'framework_name': st.session_state.selected_framework,
+            'hedge': st.session_state.hedge_requests,
+            'hedge_percentile': st.session_state.hedge_percentile,
+            'hedge_faster_model': st.session_state.hedge_faster_model,
+            'fallback_models': st.session_state.fallback_models if st.session_state.use_fallback else None,
+            'deadline_s': st.session_state.deadline_s,
+            'thinking_profile': get_thinking_profile(),
+            'usage_context': get_usage_context(),
+            # max_output_tokens is learned per framework, model and text size
+            'generation_config': {
                 'temperature': 0.8,
                 'top_p': 0.8,
-                'top_k': 10,
-                'max_output_tokens': 8192
+                'top_k': 10
             }
-        )
+        }
+        deep_args = {
+            **analysis_args,
+            'model_name': model_name,
+            'compact_output': st.session_state.compact_output,
+            'schema_profile': st.session_state.schema_profile,
+            'samples': st.session_state.samples
+        }
+        
+        # A new run replaces any full analysis still pending from the last one.
+        # One that already started cannot be stopped, but bumping the run
+        # number marks its result stale so it never replaces this run's.
+        previous_job = st.session_state.deep_analysis_job
+        if previous_job:
+            previous_job['future'].cancel()
+        st.session_state.analysis_run += 1
+        st.session_state.deep_analysis_job = None
+        st.session_state.deep_analysis_failed = False
+        st.session_state.comparison_results = None
+        result = None
+        comparing = st.session_state.compare_models and len(st.session_state.comparison_models) > 1
+        
+        if comparing:
+            models = st.session_state.comparison_models
+            status_text.text(f"🔀 Running on {len(models)} models at once...")
+            comparison = run_model_comparison(deep_args, models)
+            result = next((model_result for model_result in comparison.values() if model_result), None)
+            if result:
+                st.session_state.comparison_results = comparison
+            failed = [model for model, model_result in comparison.items() if not model_result]
+            if failed and result:
+                st.warning(f"⚠️ No result from: {', '.join(failed)}")
+        
+        elif st.session_state.tiered_analysis:
+            # Start the full analysis first so it runs alongside the quick pass
+            deep_future = get_background_executor().submit(run_deep_analysis, deep_args, routing)
+            status_text.text(f"⚡ Quick pass with {QUICK_PASS_MODEL}...")
+            result = run_ai_analysis_enhanced(
+                **analysis_args,
+                model_name=QUICK_PASS_MODEL,
+                compact_output=True,
+                schema_profile="Lite",
+                timings=timings
+            )
+            
+            if result:
+                result["metadata"]["tier"] = "quick"
+                st.session_state.deep_analysis_job = {
+                    'future': deep_future,
+                    'model': model_name,
+                    'run': st.session_state.analysis_run
+                }
+            else:
+                st.info(f"🔄 Quick pass failed, waiting for the full analysis with {model_name}...")
+                result = deep_future.result()
+        
+        if result is None and not comparing and not st.session_state.tiered_analysis:
+            # Run analysis using ENHANCED function with better error handling
+            result = run_ai_analysis_enhanced(**deep_args, timings=timings)
+            if result and routing:
+                result["metadata"]["routing"] = routing
         
         progress_bar.progress(100)
         status_text.text("✅ Analysis complete!")
         
         if result:
             st.session_state.analysis_results = result
-            st.success("🎉 Analysis finished! Ready to view results.")
+            if st.session_state.deep_analysis_job:
+                st.success("⚡ Quick pass ready! The full analysis continues in the background.")
+            else:
+                st.success("🎉 Analysis finished! Ready to view results.")
             st.balloons()
         else:
             st.error("❌ Analysis failed. Please try again.")
@@ -1047,169 +1598,90 @@ def run_the_analysis():
             if st.session_state.api_key:
                 st.write(f"Key starts with: {st.session_state.api_key[:10]}...")
 
-def run_ai_analysis_enhanced(text, framework_prompt, analysis_schema=None, model_name="gemini-2.5-flash", generation_config=None):
+def run_model_comparison(analysis_args, models):
     """
-    Enhanced AI analysis with robust JSON error handling
+    Run the same analysis on several models at once
     
     Args:
-        text: Text to analyze
-        framework_prompt: The theoretical framework prompt
-        analysis_schema: Optional JSON schema for structured output
-        model_name: Gemini model to use
-        generation_config: Model generation parameters
+        analysis_args: Keyword arguments for run_ai_analysis_enhanced
+        models: Model names to compare
         
     Returns:
-        dict: Analysis results with metadata
+        dict: Model name -> result (None where the run failed), in the given order
     """
-    
-    # Default generation config if none provided
-    if generation_config is None:
-        generation_config = {
-            "temperature": 0.8,
-            "top_p": 0.8,
-            "top_k": 10,
-            "max_output_tokens": 8192
+    # Fallbacks would blur which model produced what
+    args = {**analysis_args, 'fallback_models': None, 'notify': False}
+    with ThreadPoolExecutor(max_workers=len(models)) as pool:
+        futures = {
+            model: pool.submit(run_ai_analysis_enhanced, **{**args, 'model_name': model})
+            for model in models
         }
+        return {model: future.result() for model, future in futures.items()}
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus endpoint shared by all sessions (None if disabled or the port is taken)"""
+    return start_metrics_server()
+
+@st.cache_resource
+def get_memory_sampler():
+    """RSS sampling thread shared by all sessions (also starts tracemalloc if enabled)"""
+    start_tracing()
+    return start_rss_sampler()
+
+def record_session_memory():
+    """Report this session's state size to the memory statistics"""
+    context = get_script_run_ctx()
+    if context is None:
+        return
+    record_session(context.session_id, {key: st.session_state[key] for key in st.session_state.keys()})
+
+@st.cache_resource
+def get_background_executor():
+    """Shared worker pool for full analyses running behind a quick pass"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="deep-analysis")
+
+def run_deep_analysis(analysis_args, routing=None):
+    """
+    Run the full analysis of a tiered run (executes in a worker thread)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    try:
-        # Configure the model based on whether we have a schema
-        if analysis_schema:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config={
-                    **generation_config,
-                    "response_mime_type": "application/json",
-                    "response_schema": analysis_schema
-                },
-                system_instruction=framework_prompt
-            )
-            use_json = True
-        else:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config=generation_config,
-                system_instruction=framework_prompt
-            )
-            use_json = False
-        
-        # Generate the content
-        response = model.generate_content(text)
-        
-        # Extract and process the response
-        analysis_text = response.text
-        
-        if use_json:
-            try:
-                # Clean and parse JSON with enhanced error handling
-                cleaned_text = analysis_text.strip()
-                analysis_data = json.loads(cleaned_text)
-                st.success("✅ JSON parsing successful!")
-            except json.JSONDecodeError as e:
-                st.warning(f"⚠️ JSON parsing failed: {e}")
-                st.info("🔧 Attempting to fix JSON formatting...")
-                
-                # Try to fix common JSON issues
-                try:
-                    fixed_text = fix_json_string(cleaned_text)
-                    analysis_data = json.loads(fixed_text)
-                    st.success("✅ JSON automatically repaired!")
-                except:
-                    st.warning("🔄 Using text format instead of structured output")
-                    analysis_data = analysis_text
-                    use_json = False
-        else:
-            analysis_data = analysis_text
-        
-        # Create the result object
-        result = {
-            "timestamp": timestamp,
-            "model": model_name,
-            "generation_config": generation_config,
-            "framework_preview": framework_prompt[:200] + "..." if len(framework_prompt) > 200 else framework_prompt,
-            "text_preview": text[:200] + "..." if len(text) > 200 else text,
-            "text_length": len(text),
-            "use_json": use_json,
-            "analysis": analysis_data,
-            "raw_response": analysis_text,
-            "metadata": {}
-        }
-        
-        # Safely extract usage metadata
-        try:
-            if hasattr(response, 'usage_metadata'):
-                usage = response.usage_metadata
-                result["metadata"] = {
-                    "prompt_tokens": getattr(usage, 'prompt_token_count', None),
-                    "response_tokens": getattr(usage, 'candidates_token_count', None),
-                    "total_tokens": getattr(usage, 'total_token_count', None)
-                }
-            else:
-                result["metadata"] = {
-                    "prompt_tokens": None,
-                    "response_tokens": None,
-                    "total_tokens": None
-                }
-        except Exception as metadata_error:
-            st.warning(f"⚠️ Could not extract usage metadata: {metadata_error}")
-            result["metadata"] = {
-                "prompt_tokens": None,
-                "response_tokens": None,
-                "total_tokens": None
-            }
-        
-        return result
+    Args:
+        analysis_args: Keyword arguments for run_ai_analysis_enhanced
+        routing: Routing decision that picked the model, if any
         
-    except Exception as e:
-        st.error(f"❌ Analysis failed: {str(e)}")
-        st.info("💡 Troubleshooting tips:")
-        st.info("• Check your API key configuration")
-        st.info(f"• Verify model '{model_name}' is available")
-        st.info("• Try with shorter text (under 25,000 characters)")
-        st.info("• Verify your framework prompt is properly formatted")
-        return None
+    Returns:
+        dict: Analysis results tagged as the deep tier, or None on failure
+    """
+    result = run_ai_analysis_enhanced(**analysis_args, notify=False)
+    if result:
+        result["metadata"]["tier"] = "deep"
+        if routing:
+            result["metadata"]["routing"] = routing
+    return result
 
-def fix_json_string(json_str):
+def run_ai_analysis_enhanced(*args, notify=True, **kwargs):
     """
-    Attempt to fix common JSON formatting issues
+    Run the analysis engine, showing its messages in the page
     
     Args:
-        json_str: The malformed JSON string
+        *args, **kwargs: Arguments of analysis_engine.run_analysis
+        notify: Show status messages in the page; disable when running
+            outside the script thread (e.g. background analyses)
         
     Returns:
-        str: Potentially fixed JSON string
+        dict: Analysis results with metadata, or None if the analysis failed
     """
-    
-    # Remove any non-printable characters
-    json_str = ''.join(char for char in json_str if ord(char) >= 32 or char in '\n\r\t')
-    
-    # Fix common quote issues
-    # Replace smart quotes with regular quotes
-    json_str = json_str.replace('"', '"').replace('"', '"')
-    json_str = json_str.replace(''', "'").replace(''', "'")
-    
-    # Fix newlines within strings
-    json_str = re.sub(r'(?<!\\)\n(?![}\]])', '\\n', json_str)
-    
-    # Fix unescaped quotes within strings
-    # This is a simple approach - more sophisticated fixing could be added
-    json_str = re.sub(r'(?<!\\)"(?=.*[^"]*"[^"]*$)', '\\"', json_str)
-    
-    # Remove trailing commas
-    json_str = re.sub(r',\s*}', '}', json_str)
-    json_str = re.sub(r',\s*]', ']', json_str)
-    
-    # Try to find and complete incomplete JSON
-    # Count braces and brackets
-    open_braces = json_str.count('{') - json_str.count('}')
-    open_brackets = json_str.count('[') - json_str.count(']')
-    
-    # Add missing closing braces/brackets
-    json_str += '}' * open_braces
-    json_str += ']' * open_brackets
-    
-    return json_str
+    return run_analysis(*args, on_event=show_engine_event if notify else None, **kwargs)
+
+def show_engine_event(event):
+    """Render a notice or failure from the analysis engine"""
+    if event['type'] == 'notice':
+        getattr(st, event['level'])(event['message'])
+    elif event['type'] == 'failed':
+        st.error(event['message'])
+        st.info("💡 Troubleshooting tips:")
+        for tip in event['tips']:
+            st.info(f"• {tip}")
 
 # =============================================================================
 # STEP 5: VIEW RESULTS
@@ -1228,19 +1700,82 @@ def step_5_view_results():
     
     result = st.session_state.analysis_results
     
+    # Comparison runs: overview first, then the details of one chosen model
+    comparison = st.session_state.comparison_results
+    if comparison:
+        display_model_comparison(comparison)
+        finished = [model for model, model_result in comparison.items() if model_result]
+        if finished:
+            detail_model = st.radio("Show details for:", finished, horizontal=True)
+            result = comparison[detail_model]
+        else:
+            st.warning("⚠️ None of the compared models returned a result; showing your previous analysis.")
+        st.markdown("---")
+    
+    # Tier/fallback labels and background swap for tiered runs
+    show_analysis_tier(result)
+    poll_deep_analysis()
+    
     # Quick stats
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Framework", st.session_state.selected_framework)
     with col2:
-        st.metric("Analysis Type", "Structured" if result.get('use_json') else "Freeform")
+        analysis_type = "Structured" if result.get('use_json') else "Freeform"
+        if result.get('metadata', {}).get('schema_profile') == "Lite":
+            analysis_type += " (Lite)"
+        st.metric("Analysis Type", analysis_type)
     with col3:
         timestamp = datetime.strptime(result['timestamp'], '%Y%m%d_%H%M%S').strftime('%H:%M')
         st.metric("Completed", timestamp)
     
+    # Latency next to thinking, to show the trade-off
+    metadata = result.get('metadata', {})
+    if metadata.get('latency_s') is not None:
+        caption = f"⏱️ {metadata['latency_s']:.1f} s with {result['model']}"
+        thinking = metadata.get('thinking')
+        if thinking:
+            caption += f" · thinking: {thinking['profile']}"
+            if thinking.get('thoughts_tokens'):
+                caption += f" ({thinking['thoughts_tokens']:,} thinking tokens)"
+        st.caption(caption)
+    
+    show_reliability(result.get('metadata', {}).get('reliability'))
+    
+    # With several samples, everything below shows the chosen one
+    samples = result.get('samples')
+    if samples and len(samples) > 1:
+        sample_index = st.radio(
+            "Sample to view:",
+            range(len(samples)),
+            format_func=lambda index: f"Sample {index + 1}",
+            horizontal=True
+        )
+        sample = samples[sample_index]
+        result = {
+            **result,
+            'analysis': sample['analysis'],
+            'use_json': sample['use_json'],
+            'raw_response': sample['raw_response'],
+            'metadata': {
+                **result.get('metadata', {}),
+                'validation': sample['validation'],
+                'sample': f"{sample_index + 1} of {len(samples)}"
+            }
+        }
+    
+    # Schema check summary (structured runs only)
+    validation = result.get('metadata', {}).get('validation')
+    if validation and not validation.get('valid'):
+        with st.expander(f"⚠️ Schema check: {validation['error_count']} issue(s) in the response"):
+            st.caption("Fields below were missing or had an unexpected type, so they may show as 'N/A'.")
+            for issue in validation.get('errors', []):
+                st.write(f"• `{issue['path']}`: {issue['error']}")
+    
     st.markdown("---")
     
     # Display results using specialized functions
+    render_started = time.perf_counter()
     analysis = result['analysis']
     
     if isinstance(analysis, dict):
@@ -1258,6 +1793,15 @@ def step_5_view_results():
         st.markdown("### 🔍 Analysis Results")
         st.write(analysis)
     
+    # Rendering is timed on every rerun; the latest time replaces the last one
+    timing_data = result.setdefault('metadata', {}).setdefault('timings', {})
+    timing_data['spans'] = [span for span in timing_data.get('spans', []) if span['name'] != 'rendering'] + [{
+        "name": "rendering",
+        "start_s": None,
+        "duration_s": round(time.perf_counter() - render_started, 3)
+    }]
+    show_performance(timing_data)
+    
     # Download options
     st.markdown("---")
     st.markdown("### 💾 Download Your Results")
@@ -1293,6 +1837,105 @@ def step_5_view_results():
         st.session_state.text_to_analyze = ""
         st.rerun()
 
+def show_performance(timing_data):
+    """Stage timings of the analysis on screen"""
+    with st.expander("⏱️ Performance"):
+        deadline = timing_data.get('deadline')
+        if deadline and deadline['budget_s'] is not None:
+            st.write(f"• **Total:** {deadline['spent_s']:.1f} s of a {deadline['budget_s']} s budget")
+        elif deadline:
+            st.write(f"• **Total:** {deadline['spent_s']:.1f} s")
+        
+        spans = timing_data.get('spans', [])
+        if spans:
+            st.dataframe(
+                [
+                    {
+                        "Stage": span['name'].replace('_', ' '),
+                        "Model": span.get('model') or "",
+                        "Start (s)": span['start_s'],
+                        "Duration (s)": span['duration_s']
+                    }
+                    for span in spans
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption("Start times are seconds since the run began; rendering is timed in this browser session.")
+        else:
+            st.write("No stage timings were recorded for this result.")
+
+def show_reliability(reliability):
+    """Agreement between the samples of a multi-sample run"""
+    if not reliability:
+        return
+    
+    with st.expander(f"📏 Run-to-run reliability across {reliability['samples']} samples", expanded=True):
+        overlap = reliability['quote_overlap']
+        if overlap['mean_jaccard'] is not None:
+            st.metric(
+                "Quote overlap (mean Jaccard)",
+                f"{overlap['mean_jaccard']:.2f}",
+                help=f"Share of quoted passages two samples have in common (1 = identical choices). "
+                     f"Lowest pair: {overlap['min_jaccard']:.2f}; {overlap['distinct_quotes']} distinct quotes overall."
+            )
+        for label in reliability['labels'].values():
+            alpha = f"{label['alpha']:.2f}" if label['alpha'] is not None else "n/a"
+            st.write(f"• **{label['name']}:** α = {alpha} ({label['reading']}, "
+                     f"{label['units']} quotes labelled by 2+ samples)")
+        st.caption("Krippendorff's α: 0.80 or above is reliable, 0.67-0.80 tentative. "
+                   "Labels are compared on quotes that several samples chose.")
+
+def show_analysis_tier(result):
+    """Label where the result on screen came from (tier and any model fallback)"""
+    tier = result.get('metadata', {}).get('tier')
+    
+    if tier == "quick":
+        st.warning(
+            f"⚡ **Quick pass** from {result['model']} (Lite profile). "
+            "This is a preliminary reading to start annotating; the full analysis will replace it."
+        )
+    elif tier == "deep":
+        st.success(f"🔬 **Full analysis** from {result['model']}. This replaced the quick pass.")
+    
+    fallback = result.get('metadata', {}).get('fallback')
+    if fallback and fallback.get('fell_back'):
+        reasons = ", ".join(f"{attempt['model']} ({attempt['reason']})" for attempt in fallback['attempts'])
+        st.warning(f"↪️ Fell back to {result['model']} after: {reasons}.")
+    
+    if st.session_state.deep_analysis_failed:
+        st.error("❌ The full analysis failed, so the quick pass is still shown. Try running it again from Step 4.")
+
+def poll_deep_analysis():
+    """Swap in the full analysis once its background job has finished"""
+    job = st.session_state.deep_analysis_job
+    if not job:
+        return
+    if job['run'] != st.session_state.analysis_run:
+        # Left over from a run that has since been replaced
+        st.session_state.deep_analysis_job = None
+        return
+    
+    future = job['future']
+    if not future.done():
+        st.info(f"🔬 Full analysis with {job['model']} is running in the background...")
+        if not hasattr(st, "fragment"):
+            # Older Streamlit versions cannot poll on their own
+            st.button("🔄 Check for full analysis")
+        return
+    
+    st.session_state.deep_analysis_job = None
+    deep_result = future.result() if future.exception() is None else None
+    if deep_result:
+        st.session_state.analysis_results = deep_result
+    else:
+        st.session_state.deep_analysis_failed = True
+    st.rerun()
+
+if hasattr(st, "fragment"):
+    # Re-check every few seconds without rerunning the whole page
+    poll_deep_analysis = st.fragment(run_every=3)(poll_deep_analysis)
+
 def display_generic_results(analysis):
     """Display generic structured results"""
     st.markdown("### 📄 Structured Results")
@@ -1320,9 +1963,71 @@ def display_generic_results(analysis):
             else:
                 st.write(content)
 
+# =============================================================================
+# DEVELOPER MODE
+# =============================================================================
+
+def run_profiled():
+    """Run main() under cProfile and show the rerun profiler (AFA_PROFILE_RERUNS=1)"""
+    profile = profile_call(main, label=f"Step {st.session_state.get('step', 1)}")
+    # Includes the page setup and CSS above main()
+    profile['script_s'] = round(time.perf_counter() - SCRIPT_STARTED, 4)
+    history = st.session_state.setdefault('rerun_profiles', [])
+    add_profile(history, profile)
+    
+    # st.rerun() and st.stop() end a rerun by raising; let Streamlit see them
+    if profile['error'] is not None:
+        raise profile['error']
+    show_rerun_profiler(history)
+
+def show_rerun_profiler(history):
+    """Sidebar panel with rerun wall times and the hottest functions of the last rerun"""
+    latest = history[-1]
+    previous = history[-2] if len(history) > 1 else None
+    
+    with st.sidebar:
+        with st.expander("⏱️ Rerun Profiler", expanded=True):
+            delta = None
+            if previous:
+                delta = f"{(latest['script_s'] - previous['script_s']) * 1000:+.0f} ms"
+            st.metric("Last rerun", f"{latest['script_s'] * 1000:.0f} ms", delta=delta, delta_color="inverse")
+            st.caption(f"{latest['label']} · main() {latest['wall_s'] * 1000:.0f} ms · {len(history)} rerun(s) profiled")
+            
+            if len(history) > 1:
+                st.line_chart({"Rerun (ms)": [round(profile['script_s'] * 1000) for profile in history]})
+            
+            app_only = st.checkbox("Only app code", value=True, key="profiler_app_only")
+            functions = latest['app_functions'] if app_only else latest['functions']
+            st.dataframe(
+                [
+                    {
+                        "Function": row['function'],
+                        "Calls": row['calls'],
+                        "Own (s)": row['own_s'],
+                        "Cumulative (s)": row['cumulative_s']
+                    }
+                    for row in functions
+                ],
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            if latest.get('raw'):
+                st.download_button(
+                    label="💾 Download Profile (.prof)",
+                    data=latest['raw'],
+                    file_name=f"rerun_{datetime.fromtimestamp(latest['started']).strftime('%Y%m%d_%H%M%S')}.prof",
+                    mime="application/octet-stream",
+                    use_container_width=True
+                )
+            st.caption("Only reruns of this session are shown. Open downloaded profiles with snakeviz or pstats.")
+
 # =============================================================================
 # RUN THE APP
 # =============================================================================
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if PROFILE_RERUNS:
+        run_profiled()
+    else:
+        main()
\ No newline at end of file
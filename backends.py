@@ -0,0 +1,559 @@
+# backends.py
+# Pluggable model backends: the live Gemini API or a local fake
+#
+# The engine only needs configure() and create_model(); models expose the
+# generate_content() surface of google.generativeai. Set AFA_BACKEND=fake to
+# run the app, benchmarks or replays fully offline against FakeGeminiBackend.
+
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from model_router import MODEL_PROFILES
+
+# Backend used when nothing else is set: "gemini" or "fake"
+DEFAULT_BACKEND = os.environ.get("AFA_BACKEND", "gemini")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# =============================================================================
+# LIVE BACKEND
+# =============================================================================
+
+# Generation config fields google-generativeai 0.8 rejects when the request is
+# built. Models configured with them call the Gemini REST API directly.
+REST_ONLY_FIELDS = {"thinking_config"}
+
+# REST API root used for those requests
+GEMINI_API_BASE = os.environ.get("AFA_GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+
+
+class GeminiBackend:
+    """The google.generativeai service, with a REST path for newer options"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.api_key = None
+
+    def configure(self, api_key):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.api_key = api_key
+
+    def create_model(self, model_name, generation_config=None, system_instruction=None):
+        if REST_ONLY_FIELDS.intersection(generation_config or {}):
+            return GeminiRestModel(self.api_key, model_name, generation_config, system_instruction)
+
+        import google.generativeai as genai
+        return genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=generation_config,
+            system_instruction=system_instruction
+        )
+
+
+class GeminiRestModel:
+    """
+    generate_content() over the Gemini REST API
+
+    Used for generation options the pinned SDK cannot send (thinking
+    budgets). Responses have the same text, candidates, usage_metadata and
+    streaming surface the engine reads from SDK responses, and HTTP errors
+    are raised as the google.api_core exceptions the SDK would raise.
+    """
+
+    def __init__(self, api_key, model_name, generation_config=None, system_instruction=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.generation_config = dict(generation_config or {})
+        self.system_instruction = system_instruction or ""
+
+    def generate_content(self, contents, stream=False, request_options=None, **kwargs):
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": str(contents)}]}],
+            "generationConfig": _rest_generation_config(self.generation_config),
+        }
+        if self.system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+
+        method = "streamGenerateContent?alt=sse" if stream else "generateContent"
+        request = urllib.request.Request(
+            f"{GEMINI_API_BASE}/models/{self.model_name}:{method}",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json", "x-goog-api-key": self.api_key or ""}
+        )
+        timeout_s = (request_options or {}).get("timeout")
+        try:
+            reply = urllib.request.urlopen(request, timeout=timeout_s)
+        except urllib.error.HTTPError as e:
+            raise _rest_error(e) from None
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, TimeoutError):
+                raise TimeoutError(f"Request to {self.model_name} timed out") from None
+            raise
+
+        response = RestResponse(reply if stream else None)
+        if not stream:
+            with reply:
+                response.add(json.load(reply))
+        return response
+
+
+class RestResponse:
+    """
+    Response of a GeminiRestModel request
+
+    Iterating reads the server-sent events of a streaming call and yields
+    one chunk per event; afterwards text, candidates and usage_metadata
+    hold the whole response.
+    """
+
+    def __init__(self, stream=None):
+        self._stream = stream
+        self._texts = {}
+        self._finish_reasons = {}
+        self.usage_metadata = _Object(
+            prompt_token_count=0, candidates_token_count=0, thoughts_token_count=0, total_token_count=0
+        )
+
+    def add(self, payload):
+        """Merge one response payload (a whole response or a streamed event); returns its chunk"""
+        pieces = {}
+        for candidate in payload.get("candidates", []):
+            index = candidate.get("index", 0)
+            parts = candidate.get("content", {}).get("parts", [])
+            # Thought summaries are not part of the answer
+            pieces[index] = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+            self._texts.setdefault(index, []).append(pieces[index])
+            if candidate.get("finishReason"):
+                self._finish_reasons[index] = candidate["finishReason"]
+
+        usage = payload.get("usageMetadata")
+        if usage:
+            self.usage_metadata = _Object(
+                prompt_token_count=usage.get("promptTokenCount", 0),
+                candidates_token_count=usage.get("candidatesTokenCount", 0),
+                thoughts_token_count=usage.get("thoughtsTokenCount", 0),
+                total_token_count=usage.get("totalTokenCount", 0),
+            )
+        return StreamChunk(pieces)
+
+    def __iter__(self):
+        if self._stream is None:
+            return
+        with self._stream as reply:
+            for line in reply:
+                line = line.decode("utf-8").strip()
+                if line.startswith("data:"):
+                    yield self.add(json.loads(line[len("data:"):]))
+        self._stream = None
+
+    @property
+    def candidates(self):
+        return [
+            _Object(
+                index=index,
+                content=_Object(parts=[_Object(text="".join(self._texts[index]))]),
+                finish_reason=FinishReason(self._finish_reasons.get(index, "FINISH_REASON_UNSPECIFIED"))
+            )
+            for index in sorted(self._texts)
+        ]
+
+    @property
+    def text(self):
+        if len(self._texts) != 1:
+            raise ValueError("The `response.text` quick accessor only works for a single candidate.")
+        return "".join(next(iter(self._texts.values())))
+
+
+def _camel_case(name):
+    first, *rest = name.split("_")
+    return first + "".join(word.title() for word in rest)
+
+
+def _rest_schema(schema):
+    """A response schema with the upper-case type names of the REST API"""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type" and isinstance(value, str):
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: _rest_schema(child) for name, child in value.items()}
+        elif key == "items":
+            converted[key] = _rest_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+def _rest_generation_config(config):
+    """SDK-style generation config as the REST API's generationConfig"""
+    converted = {}
+    for key, value in config.items():
+        if key == "response_schema":
+            value = _rest_schema(value)
+        elif isinstance(value, dict):
+            value = {_camel_case(name): setting for name, setting in value.items()}
+        converted[_camel_case(key)] = value
+    return converted
+
+
+def _rest_error(http_error):
+    """The google.api_core exception for an HTTP error from the REST API"""
+    from google.api_core import exceptions as google_exceptions
+
+    try:
+        message = json.loads(http_error.read())["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        message = http_error.reason
+    return google_exceptions.from_http_status(http_error.code, message)
+
+# =============================================================================
+# FAKE BACKEND
+# =============================================================================
+
+# Characters per token used for the fake usage metadata
+FAKE_CHARS_PER_TOKEN = 4
+
+# Characters per streamed chunk
+FAKE_CHUNK_CHARS = 400
+
+# Generation config fields google-generativeai 0.8 accepts. Others are
+# rejected as by the real SDK, except REST_ONLY_FIELDS, which GeminiBackend
+# sends over REST.
+GENERATION_CONFIG_FIELDS = {
+    "candidate_count", "enable_enhanced_civic_answers", "frequency_penalty", "logprobs",
+    "max_output_tokens", "presence_penalty", "response_logprobs", "response_mime_type",
+    "response_modalities", "response_schema", "speech_config", "stop_sequences",
+    "temperature", "top_k", "top_p",
+}
+
+# Entries in lists of plain strings (keywords, quotes, errors)
+FAKE_STRING_LIST_ITEMS = 3
+
+# Category labels handed out for label-like string fields
+FAKE_LABELS = {
+    "brownType": ["Genetic", "Functional", "Empirical Generalization", "Theoretical",
+                  "Intentional", "Dispositional", "Reason-Based"],
+    "acknowledgment": ["Acknowledged", "Unacknowledged"],
+    "intensity_level": ["Low", "Moderate", "High"],
+}
+
+_FILLER_WORDS = (
+    "the text frames this passage as evidence that the speaker relies on shared "
+    "values while the argument shifts agency toward the system and away from its "
+    "designers which invites readers to accept the claim without examining it"
+).split()
+
+
+class FakeServiceError(Exception):
+    """Simulated service error, used when google.api_core isn't installed"""
+
+
+class FinishReason:
+    """Stand-in for the SDK's finish reason enum (compared by name)"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class _Object:
+    """Plain attribute bag used to mimic SDK response objects"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class StreamChunk:
+    """
+    One streamed chunk, shaped like an SDK response chunk
+
+    Args:
+        pieces: {candidate index: new text of that candidate}
+    """
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.candidates = [
+            _Object(index=index, content=_Object(parts=[_Object(text=piece)]))
+            for index, piece in sorted(pieces.items())
+        ]
+
+    @property
+    def text(self):
+        if len(self.pieces) != 1:
+            raise ValueError("The `chunk.text` quick accessor only works for a single candidate.")
+        return next(iter(self.pieces.values()))
+
+
+def _simulated_error(status):
+    """Typed google.api_core error when available, else a message-classified one"""
+    try:
+        from google.api_core import exceptions as google_exceptions
+    except ImportError:
+        google_exceptions = None
+
+    if status == 429:
+        message = "429 Resource has been exhausted (e.g. check quota)."
+        if google_exceptions:
+            return google_exceptions.ResourceExhausted(message)
+    elif status == 503:
+        message = "503 The model is overloaded. Please try again later."
+        if google_exceptions:
+            return google_exceptions.ServiceUnavailable(message)
+    else:
+        message = "504 Deadline Exceeded (request timed out)"
+        if google_exceptions:
+            return google_exceptions.DeadlineExceeded(message)
+    return FakeServiceError(message)
+
+
+class FakeResponse:
+    """
+    Streaming response of the fake backend
+
+    Iterating yields chunks at the simulated pace; afterwards (or straight
+    away for non-streaming calls) text, candidates and usage_metadata are
+    available like on a google.generativeai response.
+    """
+
+    def __init__(self, texts, finish_reason, usage, pace):
+        self._texts = texts
+        self._pace = pace
+        self.candidates = [
+            _Object(
+                index=index,
+                content=_Object(parts=[_Object(text=text)]),
+                finish_reason=FinishReason(finish_reason)
+            )
+            for index, text in enumerate(texts)
+        ]
+        self.usage_metadata = _Object(**usage)
+
+    @property
+    def text(self):
+        if len(self._texts) != 1:
+            raise ValueError("The `response.text` quick accessor only works for a single candidate.")
+        return self._texts[0]
+
+    def __iter__(self):
+        ttft_s, seconds_per_char = self._pace
+        time.sleep(ttft_s)
+        longest = max(len(text) for text in self._texts)
+        for start in range(0, longest, FAKE_CHUNK_CHARS):
+            yield StreamChunk({
+                index: text[start:start + FAKE_CHUNK_CHARS] for index, text in enumerate(self._texts)
+            })
+            time.sleep(FAKE_CHUNK_CHARS * seconds_per_char)
+
+
+class FakeGenerativeModel:
+    """Fake counterpart of genai.GenerativeModel"""
+
+    def __init__(self, backend, model_name, generation_config=None, system_instruction=None):
+        self.backend = backend
+        self.model_name = model_name
+        self.generation_config = dict(generation_config or {})
+        self.system_instruction = system_instruction or ""
+
+    def generate_content(self, contents, stream=False, request_options=None, **kwargs):
+        backend = self.backend
+        rng = backend.request_rng()
+        config = self.generation_config
+        settings = backend.model_settings(self.model_name)
+        timeout_s = (request_options or {}).get("timeout")
+
+        for field in config:
+            if field not in GENERATION_CONFIG_FIELDS and field not in REST_ONLY_FIELDS:
+                raise ValueError(f"Unknown field for GenerationConfig: {field}")
+
+        # Errors arrive after a short connection delay
+        roll = rng.random()
+        if roll < backend.error_rate_429 + backend.error_rate_503:
+            time.sleep(settings["ttft_s"] * 0.2 * backend.time_scale)
+            raise _simulated_error(429 if roll < backend.error_rate_429 else 503)
+
+        schema = config.get("response_schema")
+        candidate_count = config.get("candidate_count", 1)
+        thoughts = backend.thinking_tokens(config)
+        max_chars = None
+        if config.get("max_output_tokens"):
+            max_chars = max(0, config["max_output_tokens"] - thoughts) * FAKE_CHARS_PER_TOKEN
+
+        texts = []
+        finish_reason = "STOP"
+        for _ in range(candidate_count):
+            text = backend.fake_output(schema, str(contents), rng)
+            if schema and rng.random() < backend.malformed_rate:
+                text = _malform_json(text, rng)
+            if max_chars is not None and len(text) > max_chars:
+                text = text[:max_chars]
+                finish_reason = "MAX_TOKENS"
+            texts.append(text)
+
+        ttft_s = settings["ttft_s"] * rng.uniform(1 - backend.jitter, 1 + backend.jitter) * backend.time_scale
+        seconds_per_char = backend.time_scale / (settings["output_tokens_per_s"] * FAKE_CHARS_PER_TOKEN)
+        total_s = ttft_s + max(len(text) for text in texts) * seconds_per_char
+        if timeout_s is not None and total_s > timeout_s:
+            time.sleep(timeout_s)
+            raise _simulated_error(504)
+
+        prompt_chars = len(self.system_instruction) + len(str(contents)) + len(json.dumps(schema) if schema else "")
+        output_tokens = sum(len(text) for text in texts) // FAKE_CHARS_PER_TOKEN
+        usage = {
+            "prompt_token_count": prompt_chars // FAKE_CHARS_PER_TOKEN,
+            "candidates_token_count": output_tokens,
+            "thoughts_token_count": thoughts,
+            "total_token_count": prompt_chars // FAKE_CHARS_PER_TOKEN + output_tokens + thoughts,
+        }
+
+        response = FakeResponse(texts, finish_reason, usage, (ttft_s, seconds_per_char))
+        if not stream:
+            time.sleep(total_s)
+        return response
+
+
+def _malform_json(text, rng):
+    """Break JSON the way models do: trailing commas or a cut-off ending"""
+    if rng.random() < 0.5:
+        return re.sub(r'"\s*}', '",}', text, count=3)
+    return text[:int(len(text) * rng.uniform(0.6, 0.95))]
+
+
+class FakeGeminiBackend:
+    """
+    Local stand-in for Gemini with configurable timing and failures
+
+    Output follows the response_schema it is given (including compact and
+    Lite schemas), quoting sentences of the input text for quote fields.
+    Timing defaults come from MODEL_PROFILES; time_scale=0 removes all
+    waiting for pure-CPU benchmarks.
+
+    Args:
+        seed: Seed for reproducible outputs, timings and failures
+        time_scale: Multiplier on every simulated delay
+        jitter: Relative random spread of time-to-first-token
+        items_per_array: Items generated per list of objects (capped by
+            max_items); lists of strings get FAKE_STRING_LIST_ITEMS
+        error_rate_429: Share of requests failing with quota exhaustion
+        error_rate_503: Share of requests failing with overload
+        malformed_rate: Share of structured responses with broken JSON
+        thinking_tokens: Thinking tokens reported when no budget is set
+        model_overrides: {model: {"ttft_s": ..., "output_tokens_per_s": ...}}
+    """
+
+    name = "fake"
+
+    def __init__(self, seed=0, time_scale=1.0, jitter=0.2, items_per_array=4, error_rate_429=0.0,
+                 error_rate_503=0.0, malformed_rate=0.0, thinking_tokens=0, model_overrides=None):
+        self.seed = seed
+        self.time_scale = time_scale
+        self.jitter = jitter
+        self.items_per_array = items_per_array
+        self.error_rate_429 = error_rate_429
+        self.error_rate_503 = error_rate_503
+        self.malformed_rate = malformed_rate
+        self.default_thinking_tokens = thinking_tokens
+        self.model_overrides = model_overrides or {}
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def configure(self, api_key):
+        """Any key is accepted"""
+
+    def create_model(self, model_name, generation_config=None, system_instruction=None):
+        return FakeGenerativeModel(self, model_name, generation_config, system_instruction)
+
+    def request_rng(self):
+        """Random generator for the next request (reproducible in request order)"""
+        with self._lock:
+            self._requests += 1
+            return random.Random(f"{self.seed}:{self._requests}")
+
+    def model_settings(self, model_name):
+        """Time to first token and output speed for a model"""
+        profile = MODEL_PROFILES.get(model_name, MODEL_PROFILES["gemini-2.5-flash"])
+        settings = {"ttft_s": profile["base_latency_s"], "output_tokens_per_s": profile["output_tokens_per_s"]}
+        settings.update(self.model_overrides.get(model_name, {}))
+        return settings
+
+    def thinking_tokens(self, config):
+        """Thinking tokens for a request: half the budget when one is set"""
+        budget = (config.get("thinking_config") or {}).get("thinking_budget")
+        if budget is None:
+            return self.default_thinking_tokens
+        return budget // 2
+
+    def fake_output(self, schema, text, rng):
+        """Response text: JSON following the schema, or markdown without one"""
+        sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text) if len(sentence.strip()) > 20]
+        if not sentences:
+            sentences = [text.strip()[:200] or "No text"]
+        if schema:
+            return json.dumps(self._fake_value(schema, "", sentences, rng), ensure_ascii=False)
+
+        lines = ["## Simulated Analysis", ""]
+        for sentence in rng.sample(sentences, min(len(sentences), self.items_per_array)):
+            lines.append(f'- "{sentence}" — {self._filler(rng, 18)}')
+        return "\n".join(lines)
+
+    def _filler(self, rng, words):
+        return " ".join(rng.choice(_FILLER_WORDS) for _ in range(words)).capitalize() + "."
+
+    def _fake_value(self, schema, field, sentences, rng):
+        """Schema-conforming value for one field"""
+        schema_type = schema.get("type")
+        # Compact schemas describe each short key with its canonical name
+        name = schema.get("description") or field
+
+        if schema_type == "object":
+            return {
+                key: self._fake_value(value, key, sentences, rng)
+                for key, value in schema.get("properties", {}).items()
+            }
+        if schema_type == "array":
+            items = schema.get("items", {})
+            count = self.items_per_array if items.get("type") == "object" else FAKE_STRING_LIST_ITEMS
+            count = min(count, schema.get("max_items", count))
+            return [self._fake_value(items, name, sentences, rng) for _ in range(count)]
+        if schema_type in ("number", "integer"):
+            return rng.randint(1, 5)
+        if schema_type == "boolean":
+            return rng.random() < 0.5
+
+        if "quote" in name.lower():
+            return rng.choice(sentences)
+        if name in FAKE_LABELS:
+            return rng.choice(FAKE_LABELS[name])
+        if name.endswith(("_label", "_type", "Type")) or name in ("title", "frame"):
+            return " ".join(rng.choice(_FILLER_WORDS) for _ in range(3)).title()
+        return self._filler(rng, rng.randint(12, 30))
+
+# =============================================================================
+# SELECTION
+# =============================================================================
+
+def get_backend():
+    """The process-wide backend (AFA_BACKEND picks it on first use)"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeGeminiBackend() if DEFAULT_BACKEND == "fake" else GeminiBackend()
+        return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide backend (benchmarks, replays, tests)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
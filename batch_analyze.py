@@ -0,0 +1,324 @@
+# batch_analyze.py
+# Command-line batch analysis of a corpus of texts, without a browser
+#
+# Runs one framework over every text in a directory or glob with N concurrent
+# workers and streams one JSON line per text, in the shape of the app's JSON
+# download plus a "source" key with the file path. Texts that fail produce a
+# line with "source" and "error" instead. Optionally writes the app's markdown
+# report for each text.
+#
+#     GOOGLE_API_KEY=... python batch_analyze.py "Political Framing Analysis" corpus/ -o results.jsonl
+#     python batch_analyze.py --prompt-file my_prompt.txt --schema-file my_schema.json "essays/*.txt" \
+#         --workers 8 --reports reports/ -o results.jsonl
+#     python batch_analyze.py "Aristotelian Rhetorical Analysis" corpus/ --backend fake -o /dev/null
+#
+# With --resume, texts that already have a result in the output file are
+# skipped and new lines are appended, so an interrupted overnight job can be
+# restarted.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from analysis_engine import run_analysis
+from backends import FakeGeminiBackend, get_backend, set_backend
+from framework_data import FRAMEWORK_EXAMPLES
+from model_router import THINKING_PROFILES
+from report_utils import create_markdown_report
+from resilience import DEFAULT_DEADLINE_S, FALLBACK_CASCADE
+from schema_utils import SCHEMA_PROFILES
+from usage_ledger import hash_api_key
+
+# Files picked up when an input is a directory
+TEXT_EXTENSIONS = (".txt", ".md")
+
+BACKENDS = ["gemini", "fake"]
+
+# =============================================================================
+# INPUTS
+# =============================================================================
+
+def find_texts(inputs):
+    """
+    Text files named by directories, glob patterns or plain paths
+
+    Directories are searched recursively for TEXT_EXTENSIONS files.
+
+    Args:
+        inputs: List of directories, globs or file paths
+
+    Returns:
+        list: Sorted file paths, without duplicates
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for root, _dirs, files in os.walk(entry):
+                paths.update(
+                    os.path.join(root, name) for name in files if name.lower().endswith(TEXT_EXTENSIONS)
+                )
+        elif os.path.isfile(entry):
+            paths.add(entry)
+        else:
+            paths.update(path for path in glob.glob(entry, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def load_framework(name=None, prompt_file=None, schema_file=None):
+    """
+    Framework prompt, schema and name from a built-in key or from files
+
+    Args:
+        name: A FRAMEWORK_EXAMPLES key
+        prompt_file: Path of a custom framework prompt (used when name is None)
+        schema_file: Optional JSON schema file; overrides a built-in schema
+
+    Returns:
+        dict: prompt, schema, name (None for custom frameworks) and thinking_profile
+    """
+    if name:
+        if name not in FRAMEWORK_EXAMPLES:
+            raise ValueError(f"Unknown framework {name!r}; choose one of: {', '.join(FRAMEWORK_EXAMPLES)}")
+        example = FRAMEWORK_EXAMPLES[name]
+        framework = {
+            "prompt": example["prompt"],
+            "schema": example["schema"],
+            "name": name,
+            "thinking_profile": example.get("thinking_profile", "default"),
+        }
+    else:
+        with open(prompt_file, encoding="utf-8") as handle:
+            framework = {"prompt": handle.read(), "schema": None, "name": None, "thinking_profile": "default"}
+    if schema_file:
+        with open(schema_file, encoding="utf-8") as handle:
+            framework["schema"] = json.load(handle)
+    return framework
+
+
+def completed_sources(output_path):
+    """Sources that already have a successful result in a JSONL output file"""
+    done = set()
+    if not output_path or output_path == "-" or not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short when the previous job was killed
+                continue
+            if record.get("source") and "error" not in record:
+                done.add(record["source"])
+    return done
+
+
+def report_path(reports_dir, source):
+    """Markdown report path for a source file, mirroring its relative path"""
+    relative = os.path.splitext(os.path.relpath(source))[0].replace(os.sep, "__").lstrip("._")
+    return os.path.join(reports_dir, f"report_{relative}.md")
+
+# =============================================================================
+# BATCH RUN
+# =============================================================================
+
+def analyze_file(source, framework, analysis_args, log):
+    """
+    Analyze one text file
+
+    Args:
+        source: Path of the text
+        framework: Result of load_framework
+        analysis_args: Extra keyword arguments for run_analysis
+        log: Callable printing a progress line
+
+    Returns:
+        dict: The result with its "source", or {"source", "error"} on failure
+    """
+    try:
+        with open(source, encoding="utf-8") as handle:
+            text = handle.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {"source": source, "error": f"Could not read the text: {e}"}
+    if not text.strip():
+        return {"source": source, "error": "The text is empty"}
+
+    failure = {}
+
+    def on_event(event):
+        if event["type"] == "notice" and event["level"] == "warning":
+            log(f"{source}: {event['message']}")
+        elif event["type"] == "failed":
+            failure["error"] = event["error"]
+
+    try:
+        result = run_analysis(
+            text,
+            framework["prompt"],
+            analysis_schema=framework["schema"],
+            framework_name=framework["name"],
+            on_event=on_event,
+            **analysis_args
+        )
+    except Exception as e:
+        return {"source": source, "error": str(e)}
+    if not result:
+        return {"source": source, "error": failure.get("error", "Analysis failed")}
+    return {**result, "source": source}
+
+
+def run_batch(sources, framework, analysis_args, output, workers=4, reports_dir=None, log=print):
+    """
+    Analyze texts concurrently, writing each result as soon as it finishes
+
+    Lines are written in completion order from the calling thread, and
+    flushed so a long job can be followed with tail -f.
+
+    Args:
+        sources: Text file paths
+        framework: Result of load_framework
+        analysis_args: Extra keyword arguments for run_analysis
+        output: Writable text file for the JSONL lines
+        workers: Analyses in flight at once
+        reports_dir: Also write a markdown report per text here
+        log: Callable printing progress lines
+
+    Returns:
+        dict: texts, ok, failed, total_tokens and wall_s
+    """
+    summary = {"texts": len(sources), "ok": 0, "failed": 0, "total_tokens": 0}
+    log_lock = threading.Lock()
+
+    def locked_log(message):
+        with log_lock:
+            log(message)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(analyze_file, source, framework, analysis_args, locked_log): source
+            for source in sources
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+            if "error" in record:
+                summary["failed"] += 1
+                locked_log(f"[{done}/{len(sources)}] ❌ {record['source']}: {record['error']}")
+                continue
+
+            summary["ok"] += 1
+            metadata = record.get("metadata", {})
+            summary["total_tokens"] += metadata.get("total_tokens") or 0
+            if reports_dir:
+                with open(report_path(reports_dir, record["source"]), "w", encoding="utf-8") as handle:
+                    handle.write(create_markdown_report(record))
+            latency = metadata.get("latency_s")
+            details = f"{record['model']}" + (f", {latency:.1f} s" if latency is not None else "")
+            locked_log(f"[{done}/{len(sources)}] ✅ {record['source']} ({details})")
+
+    summary["wall_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+# =============================================================================
+# COMMAND LINE
+# =============================================================================
+
+def configure_backend(backend, api_key, time_scale=1.0):
+    """Select the model backend; returns the API key hash charged in the usage ledger"""
+    if backend == "fake":
+        # Simulated runs cost nothing and stay out of the ledger
+        set_backend(FakeGeminiBackend(time_scale=time_scale))
+        return None
+    if not api_key:
+        raise ValueError("Set GOOGLE_API_KEY or pass --api-key (or use --backend fake)")
+    get_backend().configure(api_key)
+    return hash_api_key(api_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a framework analysis over a corpus of texts")
+    parser.add_argument("framework", nargs="?", help=f"Built-in framework: {', '.join(FRAMEWORK_EXAMPLES)}")
+    parser.add_argument("inputs", nargs="+", help="Directories, glob patterns or text files")
+    parser.add_argument("--prompt-file", help="Custom framework prompt (instead of a built-in framework)")
+    parser.add_argument("--schema-file", help="JSON schema for structured output")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--reports", help="Also write a markdown report per text into this directory")
+    parser.add_argument("--resume", action="store_true", help="Skip texts already in the output and append")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--workers", type=int, default=4, help="Analyses in flight at once")
+    parser.add_argument("--fallback", action="store_true",
+                        help=f"Fall back along {' → '.join(FALLBACK_CASCADE)} when the model fails")
+    parser.add_argument("--schema-profile", choices=SCHEMA_PROFILES, default="Full")
+    parser.add_argument("--thinking-profile", choices=list(THINKING_PROFILES),
+                        help="Default: the framework's own profile")
+    parser.add_argument("--samples", type=int, default=1, help="Repeated samples per text (reliability)")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE_S, help="Seconds allowed per text")
+    parser.add_argument("--class-label", default="", help="Class label recorded in the usage ledger")
+    parser.add_argument("--backend", choices=BACKENDS, default="gemini")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Fake backend only: multiplier on simulated model latency")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    args = parser.parse_args()
+
+    # With --prompt-file, the first positional argument is an input, not a framework
+    inputs = args.inputs
+    if args.prompt_file and args.framework:
+        inputs = [args.framework] + inputs
+        args.framework = None
+    if not args.framework and not args.prompt_file:
+        parser.error("give a built-in framework name or --prompt-file")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.samples < 1:
+        parser.error("--samples must be at least 1")
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    try:
+        framework = load_framework(args.framework, args.prompt_file, args.schema_file)
+        key_hash = configure_backend(args.backend, args.api_key, args.time_scale)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    sources = find_texts(inputs)
+    skipped = completed_sources(args.output) if args.resume else set()
+    sources = [source for source in sources if source not in skipped]
+    if skipped:
+        log(f"⏭️ Skipping {len(skipped)} text(s) already in {args.output}")
+    if not sources:
+        log("No texts to analyze")
+        return 0
+    if args.reports:
+        os.makedirs(args.reports, exist_ok=True)
+
+    analysis_args = {
+        "model_name": args.model,
+        "schema_profile": args.schema_profile,
+        "thinking_profile": args.thinking_profile or framework["thinking_profile"],
+        "samples": args.samples,
+        "deadline_s": args.deadline,
+        "fallback_models": FALLBACK_CASCADE if args.fallback else None,
+        "usage_context": {"key_hash": key_hash, "session_id": None, "class_label": args.class_label} if key_hash else None,
+    }
+    log(f"🚀 Analyzing {len(sources)} text(s) with {args.model}, {args.workers} worker(s)")
+
+    if args.output == "-":
+        summary = run_batch(sources, framework, analysis_args, sys.stdout, args.workers, args.reports, log)
+    else:
+        with open(args.output, "a" if args.resume else "w", encoding="utf-8") as output:
+            summary = run_batch(sources, framework, analysis_args, output, args.workers, args.reports, log)
+
+    log(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+# benchmarks/benchmark_suite.py
+# Offline performance suite with a tracked baseline
+#
+# Runs against the fake Gemini backend (backends.py), so it needs no API key
+# and gives the same workload on every run. Measures end-to-end analysis
+# latency and throughput by concurrency, JSON parse and repair cost by
+# output size, markdown report generation, results rendering and app import
+# time. Results are written as flat JSON metrics and compared with
+# benchmarks/baseline.json; any regression beyond the tolerance exits with
+# status 1.
+#
+#     python benchmarks/benchmark_suite.py
+#     python benchmarks/benchmark_suite.py --only parse report --output results.json
+#     python benchmarks/benchmark_suite.py --update-baseline
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# Keep Streamlit quiet when the display functions run outside `streamlit run`
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+from backends import FakeGeminiBackend, set_backend
+from framework_data import FRAMEWORK_EXAMPLES
+from run_history import clear_history, percentile
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+SECTIONS = ["e2e", "parse", "report", "render", "import"]
+
+# Concurrency levels for the end-to-end section
+CONCURRENCY_LEVELS = [1, 4, 16]
+
+# Items per list for the parse, report and render sections
+ITEM_COUNTS = [5, 50, 500]
+
+# Changes smaller than this are noise, whatever the relative change
+MIN_REGRESSION_DELTA_S = 0.002
+
+# Slow cases stop repeating once they have used this many seconds
+MEASURE_BUDGET_S = 2.0
+
+E2E_MODEL = "gemini-2.5-flash"
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+def measure(function, repeats, budget_s=MEASURE_BUDGET_S):
+    """Median wall time of up to `repeats` calls (stops early past budget_s), in seconds"""
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+        if sum(durations) > budget_s:
+            break
+    return statistics.median(durations)
+
+
+def fake_analysis(framework, items, seed=0):
+    """Schema-conforming analysis of a built-in framework with `items` per list"""
+    example = FRAMEWORK_EXAMPLES[framework]
+    backend = FakeGeminiBackend(seed=seed, items_per_array=items)
+    rng = backend.request_rng()
+    return json.loads(backend.fake_output(example["schema"], example["example_text"], rng))
+
+
+def fake_result(framework, analysis):
+    """Result dictionary shaped like run_analysis output"""
+    return {
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "model": E2E_MODEL,
+        "text_length": len(FRAMEWORK_EXAMPLES[framework]["example_text"]),
+        "use_json": True,
+        "analysis": analysis,
+        "metadata": {"total_tokens": 12000, "latency_s": 8.5},
+    }
+
+# =============================================================================
+# SECTIONS
+# =============================================================================
+
+def bench_e2e(time_scale, quick):
+    """Latency percentiles and throughput of the analysis engine by concurrency"""
+    from analysis_engine import run_analysis
+
+    frameworks = list(FRAMEWORK_EXAMPLES)
+    results = {}
+
+    def run_jobs(count, workers):
+        def job(index):
+            example = FRAMEWORK_EXAMPLES[frameworks[index % len(frameworks)]]
+            started = time.perf_counter()
+            result = run_analysis(
+                text=example["example_text"],
+                framework_prompt=example["prompt"],
+                analysis_schema=example["schema"],
+                framework_name=frameworks[index % len(frameworks)],
+                model_name=E2E_MODEL,
+                fallback_models=None
+            )
+            if not result:
+                raise RuntimeError("Analysis failed on the fake backend")
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(job, range(count)))
+        return latencies, time.perf_counter() - started
+
+    # Engine overhead alone: no simulated waiting at all
+    set_backend(FakeGeminiBackend(seed=1, time_scale=0))
+    clear_history()
+    latencies, _ = run_jobs(10 if quick else 30, 1)
+    results["e2e.engine_overhead_p50_s"] = statistics.median(latencies)
+
+    for workers in CONCURRENCY_LEVELS:
+        set_backend(FakeGeminiBackend(seed=workers, time_scale=time_scale))
+        clear_history()
+        count = max(6, workers * (1 if quick else 2))
+        latencies, wall_s = run_jobs(count, workers)
+        results[f"e2e.c{workers}.latency_p50_s"] = statistics.median(latencies)
+        results[f"e2e.c{workers}.latency_p95_s"] = percentile(latencies, 0.95)
+        results[f"e2e.c{workers}.throughput_per_s"] = count / wall_s
+
+    clear_history()
+    return results
+
+
+def bench_parse(quick):
+    """json.loads and fix_json_string cost on valid and broken output by size"""
+    from analysis_engine import fix_json_string
+
+    results = {}
+    repeats = 3 if quick else 10
+    for items in ITEM_COUNTS:
+        text = json.dumps(fake_analysis("Metaphor & Anthropomorphism Analysis", items))
+        # Trailing commas, as the fake backend's malformed answers have
+        broken = text.replace('"}', '",}')
+        results[f"parse.json_loads.{items}_items_s"] = measure(lambda: json.loads(text), repeats)
+        results[f"parse.fix_json_string.{items}_items_s"] = measure(lambda: fix_json_string(broken), repeats)
+    return results
+
+
+def bench_report(quick):
+    """create_markdown_report cost for each framework, small and huge"""
+    from display_utils import create_markdown_report
+
+    results = {}
+    repeats = 3 if quick else 10
+    for framework in FRAMEWORK_EXAMPLES:
+        key = framework.split()[0].lower()
+        for items in (ITEM_COUNTS[0], ITEM_COUNTS[-1]):
+            result = fake_result(framework, fake_analysis(framework, items))
+            results[f"report.{key}.{items}_items_s"] = measure(lambda: create_markdown_report(result), repeats)
+    return results
+
+
+def bench_render(quick):
+    """display_*_results time by framework and item count (Streamlit bare mode)"""
+    from display_utils import display_framing_results, display_metaphor_results, display_rhetorical_results
+
+    renderers = {
+        "Metaphor & Anthropomorphism Analysis": display_metaphor_results,
+        "Political Framing Analysis": display_framing_results,
+        "Aristotelian Rhetorical Analysis": display_rhetorical_results,
+    }
+    results = {}
+    repeats = 1 if quick else 3
+    for framework, render in renderers.items():
+        key = framework.split()[0].lower()
+        for items in ITEM_COUNTS:
+            analysis = fake_analysis(framework, items)
+            results[f"render.{key}.{items}_items_s"] = measure(lambda: render(analysis), repeats)
+    return results
+
+
+def bench_import(quick):
+    """Time to import app.py, and the Streamlit-free engine, in a fresh interpreter"""
+    env = dict(os.environ, STREAMLIT_LOGGER_LEVEL="error")
+    results = {}
+    for module in ("app", "analysis_engine"):
+        script = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+        durations = []
+        for _ in range(2 if quick else 5):
+            output = subprocess.run(
+                [sys.executable, "-c", script], cwd=REPO_ROOT, env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+            durations.append(float(output.strip().splitlines()[-1]))
+        results[f"import.{module}_s"] = statistics.median(durations)
+    return results
+
+# =============================================================================
+# BASELINE
+# =============================================================================
+
+def higher_is_better(metric):
+    """Throughput metrics improve upwards; everything else is a duration"""
+    return metric.endswith("_per_s")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare metrics with a baseline
+
+    Args:
+        results: {metric: value} of this run
+        baseline: {metric: value} of the stored baseline
+        tolerance: Allowed relative slowdown, e.g. 0.5 for 50%
+
+    Returns:
+        list: One dict per shared metric with baseline, current, change and
+        whether it regressed
+    """
+    rows = []
+    for metric, value in sorted(results.items()):
+        reference = baseline.get(metric)
+        if not reference:
+            continue
+        change = (value - reference) / reference
+        if higher_is_better(metric):
+            regressed = change < -tolerance
+        else:
+            regressed = change > tolerance and value - reference > MIN_REGRESSION_DELTA_S
+        rows.append({
+            "metric": metric,
+            "baseline": reference,
+            "current": value,
+            "change": round(change, 3),
+            "regressed": regressed
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, help="Run only these sections")
+    parser.add_argument("--quick", action="store_true", help="Fewer repeats, for a fast local check")
+    parser.add_argument("--time-scale", type=float, default=0.05,
+                        help="Multiplier on simulated model latency in the e2e section")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown before failing")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Also write the results JSON to this file")
+    args = parser.parse_args()
+
+    sections = args.only or SECTIONS
+    results = {}
+    for section in sections:
+        started = time.perf_counter()
+        if section == "e2e":
+            results.update(bench_e2e(args.time_scale, args.quick))
+        elif section == "parse":
+            results.update(bench_parse(args.quick))
+        elif section == "report":
+            results.update(bench_report(args.quick))
+        elif section == "render":
+            results.update(bench_render(args.quick))
+        elif section == "import":
+            results.update(bench_import(args.quick))
+        print(f"{section}: {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+    results = {metric: round(value, 6) for metric, value in results.items()}
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time_scale": args.time_scale,
+        "quick": args.quick,
+        "metrics": results,
+    }
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as handle:
+                baseline = json.load(handle).get("metrics", {})
+        # Sections not run this time keep their stored values
+        report["metrics"] = {**baseline, **results}
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        report["comparison"] = compare(results, baseline.get("metrics", {}), args.tolerance)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+    regressions = [row for row in report.get("comparison", []) if row["regressed"]]
+    for row in regressions:
+        print(f"REGRESSION {row['metric']}: {row['baseline']} -> {row['current']} ({row['change']:+.0%})",
+              file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
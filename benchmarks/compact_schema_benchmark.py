@@ -0,0 +1,138 @@
+# benchmarks/compact_schema_benchmark.py
+# Measures response-token and latency savings of compact wire schemas
+#
+# Runs every built-in framework on its bundled example text twice per round,
+# once with the canonical schema and once with the compact short-key schema,
+# and prints a JSON summary. Needs a live API key:
+#
+#     GOOGLE_API_KEY=... python benchmarks/compact_schema_benchmark.py --rounds 3
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+from framework_data import FRAMEWORK_EXAMPLES
+from schema_utils import (
+    COMPACT_OUTPUT_INSTRUCTION,
+    expand_compact_keys,
+    get_compact_schema,
+    get_compiled_schema,
+    validate_analysis
+)
+
+GENERATION_CONFIG = {
+    "temperature": 0.8,
+    "top_p": 0.8,
+    "top_k": 10,
+    "max_output_tokens": 8192
+}
+
+
+def run_once(framework, model_name, compact):
+    """Run one analysis and return latency, token usage and schema validity"""
+    schema = framework["schema"]
+    prompt = framework["prompt"]
+    expansion = None
+
+    if compact:
+        schema, expansion = get_compact_schema(framework["schema"])
+        prompt = prompt + COMPACT_OUTPUT_INSTRUCTION
+
+    model = genai.GenerativeModel(
+        model_name=model_name,
+        generation_config={
+            **GENERATION_CONFIG,
+            "response_mime_type": "application/json",
+            "response_schema": schema
+        },
+        system_instruction=prompt
+    )
+
+    started = time.perf_counter()
+    response = model.generate_content(framework["example_text"])
+    latency = time.perf_counter() - started
+
+    usage = response.usage_metadata
+    record = {
+        "latency_s": round(latency, 3),
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "response_tokens": getattr(usage, "candidates_token_count", None),
+        "response_chars": len(response.text),
+        "valid": False
+    }
+
+    try:
+        analysis = json.loads(response.text)
+        if expansion:
+            analysis = expand_compact_keys(analysis, expansion)
+        record["valid"] = validate_analysis(analysis, get_compiled_schema(framework["schema"]))["valid"]
+    except json.JSONDecodeError:
+        pass
+
+    return record
+
+
+def summarize(records):
+    """Median latency and response tokens over a list of run records"""
+    tokens = [r["response_tokens"] for r in records if r["response_tokens"] is not None]
+    return {
+        "runs": len(records),
+        "median_latency_s": round(statistics.median(r["latency_s"] for r in records), 3),
+        "median_response_tokens": statistics.median(tokens) if tokens else None,
+        "valid_runs": sum(1 for r in records if r["valid"])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and compact wire schemas on the example texts")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", help="Optional path for the JSON summary")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        sys.exit("Set GOOGLE_API_KEY to run this benchmark.")
+    genai.configure(api_key=api_key)
+
+    summary = {"model": args.model, "rounds": args.rounds, "frameworks": {}}
+
+    for name, framework in FRAMEWORK_EXAMPLES.items():
+        full_runs, compact_runs = [], []
+        for round_index in range(args.rounds):
+            # Alternate the order so warm-up effects don't favour one mode
+            if round_index % 2:
+                compact_runs.append(run_once(framework, args.model, compact=True))
+                full_runs.append(run_once(framework, args.model, compact=False))
+            else:
+                full_runs.append(run_once(framework, args.model, compact=False))
+                compact_runs.append(run_once(framework, args.model, compact=True))
+
+        full, compact = summarize(full_runs), summarize(compact_runs)
+        entry = {"full": full, "compact": compact}
+
+        if full["median_response_tokens"] and compact["median_response_tokens"]:
+            entry["response_token_savings_pct"] = round(
+                100 * (1 - compact["median_response_tokens"] / full["median_response_tokens"]), 1
+            )
+        entry["latency_savings_pct"] = round(
+            100 * (1 - compact["median_latency_s"] / full["median_latency_s"]), 1
+        )
+        summary["frameworks"][name] = entry
+
+    output = json.dumps(summary, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# benchmarks/replay_traffic.py
+# Re-issues a captured analysis workload with its original timing
+#
+# Reads the capture log written with AFA_CAPTURE_PATH (see traffic_capture.py)
+# and replays every run at its recorded offset, divided by --speed, so bursts
+# from a workshop session arrive as bursty as they did in class. Texts are not
+# captured; each run gets its framework's example text resized to the
+# recorded length. Runs of custom frameworks are skipped.
+#
+#     python benchmarks/replay_traffic.py capture.jsonl --speed 10 --backend dry-run
+#     python benchmarks/replay_traffic.py capture.jsonl --speed 10 --backend fake
+#     GOOGLE_API_KEY=... python benchmarks/replay_traffic.py capture.jsonl --backend live
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framework_data import FRAMEWORK_EXAMPLES
+from run_history import percentile
+from traffic_capture import load_capture
+
+BACKENDS = ["dry-run", "fake", "live"]
+
+
+def synthetic_text(framework, length):
+    """The framework's example text, repeated or cut to the recorded length"""
+    example = FRAMEWORK_EXAMPLES[framework]["example_text"]
+    repeats = length // len(example) + 1
+    return ("\n\n".join([example] * repeats))[:max(length, 1)]
+
+
+def build_jobs(records):
+    """
+    Turn capture records into replay jobs
+
+    Returns:
+        tuple: (jobs with "offset_s" and engine "args", number of skipped records)
+    """
+    jobs = []
+    skipped = 0
+    start = records[0]["timestamp"] if records else 0
+    for record in records:
+        framework = record.get("framework")
+        if framework not in FRAMEWORK_EXAMPLES:
+            skipped += 1
+            continue
+        config = record.get("config", {})
+        example = FRAMEWORK_EXAMPLES[framework]
+        jobs.append({
+            "offset_s": record["timestamp"] - start,
+            "captured_latency_s": record.get("timings", {}).get("latency_s"),
+            "args": {
+                "text": synthetic_text(framework, record.get("text_length", 1000)),
+                "framework_prompt": example["prompt"],
+                "analysis_schema": example["schema"] if config.get("has_schema", True) else None,
+                "framework_name": framework,
+                "model_name": config.get("requested_model", record.get("model")),
+                "generation_config": config.get("generation_config"),
+                "compact_output": config.get("compact_output", False),
+                "schema_profile": config.get("schema_profile", "Full"),
+                "thinking_profile": config.get("thinking_profile", "default"),
+                "samples": config.get("samples", 1),
+                "hedge": config.get("hedge", False),
+                "hedge_percentile": config.get("hedge_percentile", 0.9),
+                "hedge_faster_model": config.get("hedge_faster_model", False),
+                "fallback_models": config.get("fallback_models"),
+                "deadline_s": config.get("deadline_s")
+            }
+        })
+    return jobs, skipped
+
+
+def get_runner(backend, time_scale=1.0):
+    """Callable running one job's engine arguments and returning a result or None"""
+    if backend == "dry-run":
+        return lambda args: {"metadata": {"latency_s": 0.0}}
+
+    from backends import FakeGeminiBackend, get_backend, set_backend
+    if backend == "fake":
+        set_backend(FakeGeminiBackend(time_scale=time_scale))
+    else:
+        get_backend().configure(os.environ["GOOGLE_API_KEY"])
+
+    from analysis_engine import run_analysis
+    return lambda args: run_analysis(**args)
+
+
+def replay(jobs, runner, speed=1.0, workers=32):
+    """
+    Issue jobs at their recorded offsets divided by speed
+
+    Returns:
+        list: Per-job outcome, latency and schedule lag (how late it was sent)
+    """
+    outcomes = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run(job, scheduled_s):
+        sent_s = time.perf_counter() - started
+        call_started = time.perf_counter()
+        try:
+            result = runner(job["args"])
+            outcome = "ok" if result else "error"
+        except Exception:
+            outcome = "error"
+        with lock:
+            outcomes.append({
+                "outcome": outcome,
+                "latency_s": time.perf_counter() - call_started,
+                "lag_s": sent_s - scheduled_s,
+                "captured_latency_s": job["captured_latency_s"],
+            })
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            scheduled_s = job["offset_s"] / speed
+            delay = scheduled_s - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, job, scheduled_s)
+
+    return outcomes
+
+
+def summarize(outcomes, skipped, wall_s, speed, backend):
+    """Summary statistics of a replay"""
+    latencies = [outcome["latency_s"] for outcome in outcomes if outcome["outcome"] == "ok"]
+    captured = [outcome["captured_latency_s"] for outcome in outcomes if outcome["captured_latency_s"]]
+    return {
+        "backend": backend,
+        "speed": speed,
+        "requests": len(outcomes),
+        "skipped": skipped,
+        "ok": len(latencies),
+        "errors": len(outcomes) - len(latencies),
+        "wall_s": round(wall_s, 2),
+        "latency_p50_s": round(statistics.median(latencies), 2) if latencies else None,
+        "latency_p95_s": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "captured_latency_p95_s": round(percentile(captured, 0.95), 2) if captured else None,
+        "max_schedule_lag_s": round(max((outcome["lag_s"] for outcome in outcomes), default=0.0), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured analysis workload")
+    parser.add_argument("capture", help="Capture log path (AFA_CAPTURE_PATH used while recording)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, e.g. 1 or 10")
+    parser.add_argument("--backend", choices=BACKENDS, default="dry-run")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Fake backend only: multiplier on simulated model latency")
+    parser.add_argument("--workers", type=int, default=32, help="Most runs in flight at once")
+    parser.add_argument("--limit", type=int, help="Replay only the first N runs")
+    parser.add_argument("--output", help="Also write the summary JSON to this file")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)[:args.limit]
+    jobs, skipped = build_jobs(records)
+    runner = get_runner(args.backend, args.time_scale)
+
+    started = time.perf_counter()
+    outcomes = replay(jobs, runner, speed=args.speed, workers=args.workers)
+    summary = summarize(outcomes, skipped, time.perf_counter() - started, args.speed, args.backend)
+
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(summary, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -757,20 +757,23 @@ FRAMEWORK_EXAMPLES = {
         "schema": METAPHOR_ANALYSIS_SCHEMA,
         "example_text": METAPHOR_EXAMPLE_TEXT,
         "description": "Analyzes metaphorical language in AI discourse using cognitive linguistics",
-        "discipline": "Digital Humanities / AI Literacy"
+        "discipline": "Digital Humanities / AI Literacy",
+        "thinking_profile": "low"
     },
     "Political Framing Analysis": {
         "prompt": FRAMING_FRAMEWORK_PROMPT,
         "schema": FRAMING_ANALYSIS_SCHEMA,
         "example_text": FRAMING_EXAMPLE_TEXT,
         "description": "Examines political discourse using Entman's framing functions and Lakoff's frame semantics",
-        "discipline": "Political Science / Communication Studies"
+        "discipline": "Political Science / Communication Studies",
+        "thinking_profile": "low"
     },
     "Aristotelian Rhetorical Analysis": {
         "prompt": RHETORICAL_FRAMEWORK_PROMPT,
         "schema": RHETORICAL_ANALYSIS_SCHEMA,
         "example_text": RHETORICAL_EXAMPLE_TEXT,
         "description": "Comprehensive analysis of ethos, pathos, and logos appeals in persuasive discourse",
-        "discipline": "Rhetoric / Communication Studies"
+        "discipline": "Rhetoric / Communication Studies",
+        "thinking_profile": "default"
     }
 }
\ No newline at end of file
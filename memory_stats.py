@@ -0,0 +1,314 @@
+# memory_stats.py
+# Memory instrumentation: session state size, cached results and process RSS
+#
+# Each session reports the deep size of its st.session_state (and of the
+# analysis results it holds) on rerun; a daemon thread samples process RSS.
+# Set AFA_TRACEMALLOC=1 to also trace Python allocations with tracemalloc,
+# which adds the traced heap and its top allocation sites (at some CPU and
+# memory cost). Everything is exported as gauges through metrics.py.
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+from metrics import gauge
+
+TRACEMALLOC_ENABLED = os.environ.get("AFA_TRACEMALLOC", "").lower() in ("1", "true", "yes")
+
+# Stack frames kept per traced allocation (more frames cost more memory)
+TRACEMALLOC_FRAMES = int(os.environ.get("AFA_TRACEMALLOC_FRAMES", "1"))
+
+# RSS samples: one every RSS_SAMPLE_INTERVAL_S, RSS_HISTORY kept (one hour)
+RSS_SAMPLE_INTERVAL_S = 15
+RSS_HISTORY = 240
+
+# A session is re-measured at most this often, and forgotten when idle this long
+SESSION_SAMPLE_INTERVAL_S = 5
+SESSION_TTL_S = 3600
+
+# Session state keys that hold analysis results
+RESULT_KEYS = ["analysis_results", "comparison_results", "deep_analysis_job"]
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_rss_samples = deque(maxlen=RSS_HISTORY)
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+def deep_size(obj):
+    """
+    Approximate bytes held by an object and everything it references
+
+    Follows containers and instance attributes; shared objects are counted
+    once. Modules, classes and functions are not followed.
+
+    Args:
+        obj: Any object, e.g. a session state value
+
+    Returns:
+        int: Size in bytes
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, type(sys), type(deep_size))):
+            continue
+        seen.add(id(item))
+        try:
+            total += sys.getsizeof(item)
+        except TypeError:
+            continue
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return total
+
+
+def process_rss_bytes():
+    """
+    Resident set size of this process
+
+    Returns:
+        int: Current RSS from /proc on Linux, else the peak RSS from
+        getrusage (None if neither is available)
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (AttributeError, ValueError):
+        return None
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def start_tracing():
+    """Start tracemalloc if AFA_TRACEMALLOC is set (returns True while tracing)"""
+    if TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    return tracemalloc.is_tracing()
+
+
+def traced_memory():
+    """(current, peak) bytes traced by tracemalloc, or None when not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()
+
+
+def top_allocations(limit=10):
+    """
+    Source lines holding the most traced memory
+
+    Returns:
+        list: Dicts with location, size_bytes and blocks (empty when not tracing)
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ])
+    rows = []
+    for statistic in snapshot.statistics("lineno")[:limit]:
+        frame = statistic.traceback[0]
+        rows.append({
+            "location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            "size_bytes": statistic.size,
+            "blocks": statistic.count,
+        })
+    return rows
+
+# =============================================================================
+# SESSIONS AND RSS HISTORY
+# =============================================================================
+
+def raw_response_bytes(value):
+    """
+    Size of the raw model responses held in a stored result
+
+    Counts the result's own raw_response and those of its samples. A dict of
+    results per model (comparison_results) counts each model's result.
+
+    Args:
+        value: Session state value (result, {model: result} or anything else)
+
+    Returns:
+        int: Bytes of raw response strings
+    """
+    if not isinstance(value, dict):
+        return 0
+    if "raw_response" not in value and "samples" not in value:
+        return sum(raw_response_bytes(result) for result in value.values() if isinstance(result, dict))
+
+    samples = value.get("samples") if isinstance(value.get("samples"), list) else []
+    texts = [value.get("raw_response")] + [sample.get("raw_response") for sample in samples if isinstance(sample, dict)]
+    # The first sample shares its text with the result; count each string once
+    unique = {id(text): text for text in texts if isinstance(text, str)}
+    return sum(sys.getsizeof(text) for text in unique.values())
+
+
+def record_session(session_id, state, force=False):
+    """
+    Measure one session's state (at most every SESSION_SAMPLE_INTERVAL_S)
+
+    Args:
+        session_id: Streamlit session id
+        state: {key: value} copy of the session state
+        force: Measure even if measured recently
+    """
+    now = time.time()
+    with _sessions_lock:
+        previous = _sessions.get(session_id)
+    if previous and not force and now - previous["measured"] < SESSION_SAMPLE_INTERVAL_S:
+        with _sessions_lock:
+            previous["seen"] = now
+        return
+
+    sizes = {key: deep_size(value) for key, value in state.items()}
+    raw_bytes = sum(raw_response_bytes(state.get(key)) for key in RESULT_KEYS)
+
+    entry = {
+        "session_id": session_id,
+        "state_bytes": sum(sizes.values()),
+        "results_bytes": sum(sizes.get(key, 0) for key in RESULT_KEYS),
+        "raw_response_bytes": raw_bytes,
+        "largest_keys": sorted(sizes.items(), key=lambda item: item[1], reverse=True)[:5],
+        "measured": now,
+        "seen": now,
+    }
+    with _sessions_lock:
+        _sessions[session_id] = entry
+        for stale in [key for key, value in _sessions.items() if now - value["seen"] > SESSION_TTL_S]:
+            del _sessions[stale]
+    _update_gauges()
+
+
+def session_summaries():
+    """Measured sessions, largest first"""
+    with _sessions_lock:
+        sessions = [dict(entry) for entry in _sessions.values()]
+    return sorted(sessions, key=lambda entry: entry["state_bytes"], reverse=True)
+
+
+def sample_rss():
+    """Append one (timestamp, RSS bytes) sample to the history"""
+    rss = process_rss_bytes()
+    if rss is not None:
+        _rss_samples.append((time.time(), rss))
+    traced = traced_memory()
+    if traced:
+        TRACED_MEMORY.set(traced[0], kind="current")
+        TRACED_MEMORY.set(traced[1], kind="peak")
+    return rss
+
+
+def rss_history():
+    """RSS samples as (timestamp, bytes), oldest first"""
+    return list(_rss_samples)
+
+
+def start_rss_sampler(interval_s=RSS_SAMPLE_INTERVAL_S):
+    """Sample RSS from a daemon thread every interval_s seconds"""
+    def loop():
+        while True:
+            sample_rss()
+            time.sleep(interval_s)
+
+    thread = threading.Thread(target=loop, daemon=True, name="rss-sampler")
+    thread.start()
+    return thread
+
+
+def memory_summary(projected_sessions=100):
+    """
+    Process-wide memory figures for the admin view
+
+    The projection assumes each extra session holds as much as the 95th
+    percentile of the sessions measured so far, on top of the current RSS
+    without session state.
+
+    Args:
+        projected_sessions: Session count to project RSS for
+
+    Returns:
+        dict: sessions, state_bytes, results_bytes, raw_response_bytes,
+        largest_session_bytes, p95_session_bytes, rss_bytes, traced and
+        projected_rss_bytes for projected_sessions
+    """
+    sessions = session_summaries()
+    sizes = sorted(entry["state_bytes"] for entry in sessions)
+    state_bytes = sum(sizes)
+    rss = process_rss_bytes()
+    p95 = sizes[min(len(sizes) - 1, int(0.95 * len(sizes)))] if sizes else 0
+
+    projected = None
+    if rss is not None:
+        projected = max(rss - state_bytes, 0) + projected_sessions * p95
+    return {
+        "sessions": len(sessions),
+        "state_bytes": state_bytes,
+        "results_bytes": sum(entry["results_bytes"] for entry in sessions),
+        "raw_response_bytes": sum(entry["raw_response_bytes"] for entry in sessions),
+        "largest_session_bytes": sizes[-1] if sizes else 0,
+        "p95_session_bytes": p95,
+        "rss_bytes": rss,
+        "traced": traced_memory(),
+        "projected_sessions": projected_sessions,
+        "projected_rss_bytes": projected,
+    }
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+PROCESS_RSS = gauge(
+    "afa_process_resident_memory_bytes", "Resident memory of the app process", function=process_rss_bytes
+)
+ACTIVE_SESSIONS = gauge(
+    "afa_sessions_active", "Sessions seen within the session TTL"
+)
+SESSION_MEMORY = gauge(
+    "afa_session_memory_bytes", "Session state memory summed over sessions, by part", ("part",)
+)
+LARGEST_SESSION = gauge(
+    "afa_session_memory_max_bytes", "Session state memory of the largest session"
+)
+TRACED_MEMORY = gauge(
+    "afa_tracemalloc_bytes", "Python heap traced by tracemalloc (AFA_TRACEMALLOC=1)", ("kind",)
+)
+
+
+def _update_gauges():
+    """Refresh the session gauges after a measurement"""
+    sessions = session_summaries()
+    ACTIVE_SESSIONS.set(len(sessions))
+    SESSION_MEMORY.set(sum(entry["state_bytes"] for entry in sessions), part="state")
+    SESSION_MEMORY.set(sum(entry["results_bytes"] for entry in sessions), part="results")
+    SESSION_MEMORY.set(sum(entry["raw_response_bytes"] for entry in sessions), part="raw_response")
+    LARGEST_SESSION.set(max((entry["state_bytes"] for entry in sessions), default=0))
@@ -0,0 +1,341 @@
+# metrics.py
+# In-process metrics registry exported in Prometheus text format
+#
+# Counters, gauges and log-linear ("HDR-style") histograms labelled by model,
+# framework and outcome. Histograms keep fine-grained buckets internally, so
+# in-app percentiles are accurate to a few percent, and export a fixed set of
+# power-of-two boundaries so Prometheus' histogram_quantile works across
+# scrapes. Set AFA_METRICS_PORT to serve /metrics alongside Streamlit.
+
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port and interface for the /metrics endpoint (0 disables the server)
+METRICS_PORT = int(os.environ.get("AFA_METRICS_PORT", "9464"))
+METRICS_HOST = os.environ.get("AFA_METRICS_HOST", "127.0.0.1")
+
+# Linear sub-buckets per power of two; 16 gives about 6% relative precision
+SUB_BUCKETS = 16
+
+_registry = []
+_registry_lock = threading.Lock()
+
+# =============================================================================
+# METRIC TYPES
+# =============================================================================
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    """Render {name="value",...} for a label set"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    """Prometheus number formatting (integers without a trailing .0)"""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Add to the counter for one label set"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Current value for one label set"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self):
+        """Lines in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Log-linear histogram with labels
+
+    Values are counted in SUB_BUCKETS linear buckets per power of two above
+    min_value. Exported boundaries are the powers of two from min_value up
+    to min_value * 2**max_exponent.
+    """
+
+    def __init__(self, name, help_text, labels=(), min_value=0.001, max_exponent=20):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.min_value = min_value
+        self.max_exponent = max_exponent
+        self.export_bounds = [min_value * 2 ** exponent for exponent in range(max_exponent + 1)]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, value):
+        """Internal bucket index of a value (0 holds everything <= min_value)"""
+        if value <= self.min_value:
+            return 0
+        scaled = value / self.min_value
+        exponent = min(int(math.log2(scaled)), self.max_exponent)
+        sub_bucket = min(int((scaled / 2 ** exponent - 1) * SUB_BUCKETS), SUB_BUCKETS - 1)
+        return 1 + exponent * SUB_BUCKETS + sub_bucket
+
+    def _upper_edge(self, index):
+        """Largest value counted in an internal bucket"""
+        if index == 0:
+            return self.min_value
+        exponent, sub_bucket = divmod(index - 1, SUB_BUCKETS)
+        return self.min_value * 2 ** exponent * (1 + (sub_bucket + 1) / SUB_BUCKETS)
+
+    def observe(self, value, **labels):
+        """Record one value for a label set"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = self._bucket(value)
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": {}, "count": 0, "sum": 0.0})
+            series["buckets"][index] = series["buckets"].get(index, 0) + 1
+            series["count"] += 1
+            series["sum"] += value
+
+    def percentile(self, fraction, **labels):
+        """
+        Approximate percentile for one label set (upper edge of its bucket)
+
+        Returns:
+            float: The percentile, or None without observations
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if not series or not series["count"]:
+                return None
+            rank = fraction * series["count"]
+            seen = 0
+            for index in sorted(series["buckets"]):
+                seen += series["buckets"][index]
+                if seen >= rank:
+                    return self._upper_edge(index)
+        return None
+
+    def render(self):
+        """Lines in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                ordered = sorted(series["buckets"].items())
+                position = 0
+                cumulative = 0
+                for bound in self.export_bounds + [math.inf]:
+                    while position < len(ordered) and self._upper_edge(ordered[position][0]) <= bound * (1 + 1e-9):
+                        cumulative += ordered[position][1]
+                        position += 1
+                    if bound == math.inf:
+                        cumulative = series["count"]
+                    le = f'le="{_format_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                label_text = _label_text(self.labels, key)
+                lines.append(f"{self.name}_sum{label_text} {_format_number(round(series['sum'], 6))}")
+                lines.append(f"{self.name}_count{label_text} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """
+    Value that can go up and down, with labels
+
+    A gauge created with a function reads its (unlabelled) value from it at
+    every scrape, e.g. process memory.
+    """
+
+    def __init__(self, name, help_text, labels=(), function=None):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        """Set the gauge for one label set"""
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        """Current value for one label set (None if never set)"""
+        if self.function:
+            return self.function()
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return self._values.get(key)
+
+    def render(self):
+        """Lines in Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if self.function:
+            value = self.function()
+            if value is not None:
+                lines.append(f"{self.name} {_format_number(value)}")
+            return lines
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {_format_number(value)}")
+        return lines
+
+
+def counter(name, help_text, labels=()):
+    """Create and register a counter"""
+    metric = Counter(name, help_text, labels)
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def histogram(name, help_text, labels=(), min_value=0.001, max_exponent=20):
+    """Create and register a histogram"""
+    metric = Histogram(name, help_text, labels, min_value, max_exponent)
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def gauge(name, help_text, labels=(), function=None):
+    """Create and register a gauge"""
+    metric = Gauge(name, help_text, labels, function)
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def render_metrics():
+    """All registered metrics in Prometheus text format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# =============================================================================
+# ANALYSIS METRICS
+# =============================================================================
+
+ANALYSIS_REQUESTS = counter(
+    "afa_analysis_requests_total", "Analysis runs by outcome", ("model", "framework", "outcome")
+)
+ANALYSIS_LATENCY = histogram(
+    "afa_analysis_latency_seconds", "End-to-end analysis latency", ("model", "framework", "outcome"),
+    min_value=1 / 64, max_exponent=16
+)
+TIME_TO_FIRST_TOKEN = histogram(
+    "afa_time_to_first_token_seconds", "Time to the first streamed chunk", ("model",),
+    min_value=1 / 64, max_exponent=16
+)
+ANALYSIS_TOKENS = counter(
+    "afa_tokens_total", "Tokens used by analysis runs", ("model", "framework", "kind")
+)
+MODEL_ERRORS = counter(
+    "afa_model_errors_total", "Failed model calls by reason (quota, overload, timeout, other)", ("model", "reason")
+)
+JSON_REPAIRS = counter(
+    "afa_json_repairs_total", "Responses that needed JSON repair, by result", ("framework", "outcome")
+)
+
+
+def observe_analysis(model, framework, outcome, latency_s, metadata=None):
+    """
+    Record one finished (or failed) analysis run
+
+    Args:
+        model: Model that answered (or was asked, for a failure)
+        framework: Framework name
+        outcome: "ok" or "error"
+        latency_s: Seconds the run took
+        metadata: result["metadata"] of a successful run
+    """
+    framework = framework or "custom"
+    ANALYSIS_REQUESTS.inc(model=model, framework=framework, outcome=outcome)
+    ANALYSIS_LATENCY.observe(latency_s, model=model, framework=framework, outcome=outcome)
+    if not metadata:
+        return
+
+    if metadata.get("ttft_s") is not None:
+        TIME_TO_FIRST_TOKEN.observe(metadata["ttft_s"], model=model)
+    for kind, key in (("prompt", "prompt_tokens"), ("response", "response_tokens"), ("thoughts", "thoughts_tokens")):
+        if metadata.get(key):
+            ANALYSIS_TOKENS.inc(metadata[key], model=model, framework=framework, kind=kind)
+
+    # Models that failed before a fallback answered
+    for attempt in (metadata.get("fallback") or {}).get("attempts", []):
+        MODEL_ERRORS.inc(model=attempt["model"], reason=attempt["reason"])
+
+# =============================================================================
+# HTTP ENDPOINT
+# =============================================================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the Streamlit log
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serve /metrics from a daemon thread
+
+    Args:
+        port: TCP port (0 disables the endpoint)
+        host: Interface to bind; local only by default
+
+    Returns:
+        ThreadingHTTPServer: The running server, or None if disabled or the
+        port is taken (e.g. by another Streamlit process)
+    """
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
@@ -0,0 +1,298 @@
+# model_router.py
+# Picks a Gemini model from input size, expected output size and latency history
+
+import statistics
+
+from run_history import get_runs
+
+# =============================================================================
+# MODEL PROFILES
+# =============================================================================
+
+# Static latency model per routable model: a fixed start-up cost (including
+# typical thinking time), prompt processing speed and output speed. Recorded
+# runs correct these figures for the conditions the app actually sees.
+# Prices are USD per million tokens (paid tier; thinking is billed as output);
+# max_output_tokens is the model's hard output limit. Thinking budgets must lie
+# in the min/max range; only some models can turn thinking off entirely.
+MODEL_PROFILES = {
+    "gemini-2.5-pro": {
+        "rank": 3,
+        "base_latency_s": 12.0,
+        "prompt_tokens_per_s": 5000,
+        "output_tokens_per_s": 90,
+        # Pro only pays off on longer texts; short ones go to flash
+        "min_input_tokens": 3000,
+        "input_price_per_m": 1.25,
+        "output_price_per_m": 10.00,
+        "max_output_tokens": 65536,
+        "min_thinking_budget": 128,
+        "max_thinking_budget": 32768,
+        "thinking_can_be_off": False,
+    },
+    "gemini-2.5-flash": {
+        "rank": 2,
+        "base_latency_s": 4.0,
+        "prompt_tokens_per_s": 10000,
+        "output_tokens_per_s": 180,
+        "min_input_tokens": 0,
+        "input_price_per_m": 0.30,
+        "output_price_per_m": 2.50,
+        "max_output_tokens": 65536,
+        "min_thinking_budget": 1,
+        "max_thinking_budget": 24576,
+        "thinking_can_be_off": True,
+    },
+    "gemini-2.5-flash-lite": {
+        "rank": 1,
+        "base_latency_s": 1.0,
+        "prompt_tokens_per_s": 20000,
+        "output_tokens_per_s": 250,
+        "min_input_tokens": 0,
+        "input_price_per_m": 0.10,
+        "output_price_per_m": 0.40,
+        "max_output_tokens": 65536,
+        "min_thinking_budget": 512,
+        "max_thinking_budget": 24576,
+        "thinking_can_be_off": True,
+    },
+}
+
+# Most capable first
+ROUTABLE_MODELS = sorted(MODEL_PROFILES, key=lambda name: -MODEL_PROFILES[name]["rank"])
+
+# Thinking tokens allowed per profile; None leaves the model's own default
+THINKING_PROFILES = {
+    "off": 0,
+    "low": 1024,
+    "default": None,
+    "high": 8192,
+}
+
+# Number of recent runs per model used to correct the static profile
+HISTORY_WINDOW = 20
+
+# Characters-per-token ratio for English prose until runs calibrate it
+CHARS_PER_TOKEN = 4.0
+
+# Recent runs used to calibrate the characters-per-token ratio
+CALIBRATION_WINDOW = 100
+
+# Output assumptions when no run history exists yet
+FREEFORM_OUTPUT_TOKENS = 1500
+TOKENS_PER_STRING_FIELD = 60
+TOKENS_PER_LIST_ENTRY = 15
+TOKENS_PER_KEY = 5
+DEFAULT_ARRAY_ITEMS = 5
+
+# =============================================================================
+# ESTIMATES
+# =============================================================================
+
+def chars_per_token():
+    """
+    Characters per prompt token, calibrated against recorded usage metadata
+
+    Returns:
+        tuple: (ratio, number of runs it was calibrated on)
+    """
+    ratios = [
+        run["prompt_chars"] / run["prompt_tokens"]
+        for run in get_runs(limit=CALIBRATION_WINDOW)
+        if run.get("prompt_chars") and run.get("prompt_tokens")
+    ]
+    if not ratios:
+        return CHARS_PER_TOKEN, 0
+    return statistics.median(ratios), len(ratios)
+
+
+def estimate_tokens(text, ratio=None):
+    """
+    Fast local token estimate for a piece of text
+
+    Args:
+        text: Text to estimate
+        ratio: Characters per token (defaults to the calibrated ratio)
+
+    Returns:
+        int: Estimated tokens
+    """
+    if not text:
+        return 0
+    if ratio is None:
+        ratio, _ = chars_per_token()
+    return int(len(text) / ratio) + 1
+
+
+def schema_output_tokens(schema):
+    """
+    Estimate the response size of a schema-constrained answer
+
+    Args:
+        schema: JSON schema dictionary (Lite schemas use their max_items caps)
+
+    Returns:
+        int: Estimated output tokens
+    """
+    schema_type = schema.get("type")
+
+    if schema_type == "object":
+        return sum(
+            TOKENS_PER_KEY + schema_output_tokens(field_schema)
+            for field_schema in schema.get("properties", {}).values()
+        )
+
+    if schema_type == "array":
+        items = schema.get("max_items", DEFAULT_ARRAY_ITEMS)
+        item_schema = schema.get("items", {})
+        if item_schema.get("type") in ("object", "array"):
+            return items * schema_output_tokens(item_schema)
+        return items * TOKENS_PER_LIST_ENTRY
+
+    return TOKENS_PER_STRING_FIELD
+
+
+def expected_output_tokens(schema, framework=None, schema_profile="Full"):
+    """
+    Expected response tokens, from this framework's history when available
+
+    Args:
+        schema: JSON schema dictionary, or None for freeform output
+        framework: Framework name used to look up past runs
+        schema_profile: Only learn from runs that used this profile
+
+    Returns:
+        int: Expected output tokens
+    """
+    if framework:
+        observed = [
+            run["response_tokens"] for run in get_runs(framework=framework)
+            if run.get("response_tokens") and run.get("schema_profile", "Full") in (schema_profile, None)
+        ][-HISTORY_WINDOW:]
+        if observed:
+            return int(statistics.median(observed))
+
+    if schema:
+        return schema_output_tokens(schema)
+    return FREEFORM_OUTPUT_TOKENS
+
+
+def _profile_latency(model_name, input_tokens, output_tokens):
+    """Latency predicted by the static profile alone"""
+    profile = MODEL_PROFILES[model_name]
+    return (
+        profile["base_latency_s"]
+        + input_tokens / profile["prompt_tokens_per_s"]
+        + output_tokens / profile["output_tokens_per_s"]
+    )
+
+
+def history_correction(model_name):
+    """
+    Ratio of observed to predicted latency over this model's recent runs
+
+    Returns:
+        float: Correction factor (1.0 without history), clamped to [0.25, 4]
+    """
+    ratios = []
+    for run in get_runs(model=model_name, limit=HISTORY_WINDOW):
+        if run.get("latency_s") and run.get("prompt_tokens") and run.get("response_tokens"):
+            predicted = _profile_latency(model_name, run["prompt_tokens"], run["response_tokens"])
+            ratios.append(run["latency_s"] / predicted)
+
+    if not ratios:
+        return 1.0
+    return min(4.0, max(0.25, statistics.median(ratios)))
+
+
+def predict_latency(model_name, input_tokens, output_tokens):
+    """Predicted seconds for one analysis on a model"""
+    return _profile_latency(model_name, input_tokens, output_tokens) * history_correction(model_name)
+
+
+def thinking_budget(model_name, thinking_profile):
+    """
+    thinking_budget for a profile, fitted to what the model accepts
+
+    Args:
+        model_name: Gemini model
+        thinking_profile: Key of THINKING_PROFILES
+
+    Returns:
+        int: Thinking tokens, or None to leave the model's default
+    """
+    budget = THINKING_PROFILES.get(thinking_profile)
+    profile = MODEL_PROFILES.get(model_name)
+    if budget is None or not profile:
+        return None
+    if budget == 0 and profile["thinking_can_be_off"]:
+        return 0
+    return min(profile["max_thinking_budget"], max(profile["min_thinking_budget"], budget))
+
+
+def estimate_cost(model_name, input_tokens, output_tokens):
+    """Estimated USD cost of one request (None for models without a price)"""
+    profile = MODEL_PROFILES.get(model_name)
+    if not profile:
+        return None
+    return (
+        input_tokens * profile["input_price_per_m"]
+        + output_tokens * profile["output_price_per_m"]
+    ) / 1_000_000
+
+# =============================================================================
+# ROUTING
+# =============================================================================
+
+def route_model(text, framework_prompt, schema=None, latency_target_s=45, framework=None, schema_profile="Full"):
+    """
+    Pick the most capable model expected to finish within the latency target
+
+    Models whose minimum input size isn't met are skipped. If no model fits
+    the target, the fastest predicted model is used.
+
+    Args:
+        text: Text to analyze
+        framework_prompt: Framework prompt (sent as system instruction)
+        schema: Schema that will be sent, or None for freeform output
+        latency_target_s: Desired upper bound on the analysis time
+        framework: Framework name, for output-size history
+        schema_profile: Profile of the schema being sent ("Full" or "Lite")
+
+    Returns:
+        dict: Routing decision with "model", "predicted_latency_s", "reason"
+              and the per-model "candidates"
+    """
+    input_tokens = estimate_tokens(framework_prompt) + estimate_tokens(text)
+    output_tokens = expected_output_tokens(schema, framework, schema_profile)
+
+    candidates = []
+    for model_name in ROUTABLE_MODELS:
+        candidates.append({
+            "model": model_name,
+            "predicted_latency_s": round(predict_latency(model_name, input_tokens, output_tokens), 1),
+            "eligible": input_tokens >= MODEL_PROFILES[model_name]["min_input_tokens"],
+        })
+
+    chosen = next(
+        (
+            candidate for candidate in candidates
+            if candidate["eligible"] and candidate["predicted_latency_s"] <= latency_target_s
+        ),
+        None
+    )
+    if chosen:
+        reason = f"most capable model predicted within {latency_target_s:.0f} s"
+    else:
+        chosen = min(candidates, key=lambda candidate: candidate["predicted_latency_s"])
+        reason = f"no model predicted within {latency_target_s:.0f} s; using the fastest"
+
+    return {
+        "model": chosen["model"],
+        "predicted_latency_s": chosen["predicted_latency_s"],
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_target_s": latency_target_s,
+        "reason": reason,
+        "candidates": candidates,
+    }
@@ -0,0 +1,205 @@
+# preflight.py
+# Plans an analysis before it runs: token, latency and cost forecasts per model,
+# and the output token budget learned from past runs
+
+import json
+
+from model_router import (
+    HISTORY_WINDOW,
+    MODEL_PROFILES,
+    ROUTABLE_MODELS,
+    chars_per_token,
+    estimate_cost,
+    estimate_tokens,
+    expected_output_tokens,
+    predict_latency
+)
+from run_history import get_runs, percentile
+
+# Share of max_output_tokens above which a run is flagged as likely truncated
+TRUNCATION_WARNING_SHARE = 0.9
+
+# Output budget when there is no history, and the limit for unknown models
+DEFAULT_MAX_OUTPUT_TOKENS = 8192
+
+# Upper bounds (characters) of the input-size buckets budgets are learned in
+INPUT_SIZE_BUCKETS = [5000, 15000, 40000]
+
+# Budget = this percentile of past response sizes, plus headroom
+OUTPUT_BUDGET_PERCENTILE = 0.95
+OUTPUT_BUDGET_HEADROOM = 1.25
+MIN_OUTPUT_BUDGET = 1024
+
+# Past runs needed in a bucket before its percentile is trusted
+MIN_BUDGET_SAMPLES = 5
+
+# =============================================================================
+# OUTPUT BUDGET
+# =============================================================================
+
+def size_bucket(text_length):
+    """Index of the input-size bucket a text of this length falls in"""
+    for index, upper in enumerate(INPUT_SIZE_BUCKETS):
+        if text_length <= upper:
+            return index
+    return len(INPUT_SIZE_BUCKETS)
+
+
+def model_output_limit(model_name):
+    """Hard output token limit of a model"""
+    return MODEL_PROFILES.get(model_name, {}).get("max_output_tokens", DEFAULT_MAX_OUTPUT_TOKENS)
+
+
+def _output_tokens(run):
+    """Response plus thinking tokens of a recorded run"""
+    return run["response_tokens"] + (run.get("thoughts_tokens") or 0)
+
+
+def output_token_budget(framework, model_name, text_length, schema_profile="Full"):
+    """
+    max_output_tokens for a run, learned from similar past runs
+
+    Uses a high percentile of the response sizes recorded for this framework
+    and model on texts of a similar size, plus headroom. Falls back to the
+    same framework on any model, then to the default budget.
+
+    Args:
+        framework: Framework name
+        model_name: Model the run will use
+        text_length: Characters in the text to analyze
+        schema_profile: Only learn from runs that used this profile
+
+    Returns:
+        tuple: (max_output_tokens, budget_info)
+    """
+    bucket = size_bucket(text_length)
+    similar = [
+        run for run in get_runs(framework=framework)
+        if run.get("response_tokens")
+        and run.get("schema_profile", "Full") in (schema_profile, None)
+        and size_bucket(run.get("text_length", 0)) == bucket
+    ] if framework else []
+
+    # Thinking tokens count against max_output_tokens too
+    observed = [_output_tokens(run) for run in similar if run.get("model") == model_name][-HISTORY_WINDOW:]
+    source = "history"
+    if len(observed) < MIN_BUDGET_SAMPLES:
+        observed = [_output_tokens(run) for run in similar][-HISTORY_WINDOW:]
+        source = "framework history"
+    if len(observed) < MIN_BUDGET_SAMPLES:
+        observed = []
+        source = "default"
+
+    limit = model_output_limit(model_name)
+    if observed:
+        budget = int(percentile(observed, OUTPUT_BUDGET_PERCENTILE) * OUTPUT_BUDGET_HEADROOM)
+        budget = min(limit, max(MIN_OUTPUT_BUDGET, budget))
+    else:
+        budget = min(limit, DEFAULT_MAX_OUTPUT_TOKENS)
+
+    return budget, {
+        "max_output_tokens": budget,
+        "source": source,
+        "samples": len(observed),
+        "size_bucket": bucket,
+    }
+
+
+def raised_output_budget(model_name, current):
+    """
+    Larger budget for a retry after a truncated response
+
+    Returns:
+        int: Doubled budget within the model limit, or None if already at the limit
+    """
+    limit = model_output_limit(model_name)
+    if current >= limit:
+        return None
+    return min(limit, current * 2)
+
+# =============================================================================
+# PLANNING
+# =============================================================================
+
+
+def output_token_forecast(schema, framework=None, schema_profile="Full"):
+    """
+    Typical and high (p90) response tokens for a framework/schema
+
+    Args:
+        schema: Schema that will be sent, or None for freeform output
+        framework: Framework name used to look up past runs
+        schema_profile: Profile of the schema being sent
+
+    Returns:
+        dict: "expected" and "p90" output tokens and the "samples" behind them
+    """
+    expected = expected_output_tokens(schema, framework, schema_profile)
+    observed = []
+    if framework:
+        observed = [
+            run["response_tokens"] for run in get_runs(framework=framework)
+            if run.get("response_tokens") and run.get("schema_profile", "Full") in (schema_profile, None)
+        ][-HISTORY_WINDOW:]
+
+    # Without history, assume the high end is half again the schema estimate
+    high = percentile(observed, 0.9) if observed else expected * 1.5
+    return {"expected": expected, "p90": int(high), "samples": len(observed)}
+
+
+def plan_analysis(text, framework_prompt, schema=None, framework=None, schema_profile="Full",
+                  max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS, models=None):
+    """
+    Forecast tokens, latency and cost of an analysis before running it
+
+    Args:
+        text: Text to analyze
+        framework_prompt: Framework prompt (sent as system instruction)
+        schema: Schema that will be sent, or None for freeform output
+        framework: Framework name, for history lookups
+        schema_profile: Profile of the schema being sent
+        max_output_tokens: Output budget the run will use
+        models: Models to forecast (defaults to all routable models)
+
+    Returns:
+        dict: Plan with "input_tokens", "output_tokens", "calibration",
+              per-model "models" forecasts and "warnings"
+    """
+    ratio, calibration_runs = chars_per_token()
+    schema_text = json.dumps(schema) if schema else ""
+    input_tokens = (
+        estimate_tokens(framework_prompt, ratio)
+        + estimate_tokens(text, ratio)
+        + estimate_tokens(schema_text, ratio)
+    )
+    output = output_token_forecast(schema, framework, schema_profile)
+
+    forecasts = []
+    for model_name in models or ROUTABLE_MODELS:
+        forecasts.append({
+            "model": model_name,
+            "predicted_latency_s": round(predict_latency(model_name, input_tokens, output["expected"]), 1),
+            "cost_usd": estimate_cost(model_name, input_tokens, output["expected"]),
+        })
+
+    warnings = []
+    if output["p90"] >= max_output_tokens * TRUNCATION_WARNING_SHARE:
+        warnings.append(
+            f"Responses for this setup reach about {output['p90']:,} tokens, close to the "
+            f"{max_output_tokens:,}-token output limit. The answer may be cut off; "
+            "consider the Lite profile or a shorter text."
+        )
+
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output["expected"],
+        "output_tokens_p90": output["p90"],
+        "max_output_tokens": max_output_tokens,
+        "calibration": {
+            "chars_per_token": round(ratio, 2),
+            "calibration_runs": calibration_runs,
+            "output_samples": output["samples"],
+        },
+        "models": forecasts,
+        "warnings": warnings,
+    }
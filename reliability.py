@@ -0,0 +1,235 @@
+# reliability.py
+# Run-to-run agreement between repeated analyses of the same text
+#
+# Quotes are compared as sets (Jaccard overlap); labels are compared per quote
+# with Krippendorff's alpha for nominal data, treating each sample as a coder
+# and each quoted passage as a unit. Both are computed on NumPy matrices so
+# dozens of samples stay cheap.
+
+import re
+
+import numpy as np
+
+# Labels compared across samples, with their display names
+LABEL_FIELDS = {
+    "brownType": "Explanation type (brownType)",
+    "frame_label": "Frame label",
+    "appeal": "Appeal classification (ethos/pathos/logos)",
+}
+
+# Krippendorff's conventional cut-offs
+ALPHA_RELIABLE = 0.800
+ALPHA_TENTATIVE = 0.667
+
+# =============================================================================
+# EXTRACTION
+# =============================================================================
+
+def normalize_quote(quote):
+    """Lower-case a quote and drop punctuation, quote marks and extra spaces"""
+    words = re.findall(r"[\w']+", str(quote).lower())
+    return " ".join(word.strip("'") for word in words)
+
+
+def _normalize_label(label):
+    """Compare labels case- and spacing-insensitively"""
+    return " ".join(str(label).lower().split())
+
+
+def _objects(value):
+    """The dict entries of a list; anything else the model returned is skipped"""
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def quoted_labels(analysis):
+    """
+    Quotes chosen by one analysis, with the labels attached to them
+
+    Entries that don't have the schema's shape (a string where an object
+    belongs, a missing list) are skipped rather than failing the report.
+
+    Args:
+        analysis: Parsed structured analysis (metaphor, framing or rhetorical)
+
+    Returns:
+        tuple: (set of normalized quotes, {label field: {quote: label}})
+    """
+    quotes = set()
+    labels = {}
+    if not isinstance(analysis, dict):
+        return quotes, labels
+
+    def add(quote, field=None, label=None):
+        key = normalize_quote(quote)
+        if not key:
+            return
+        quotes.add(key)
+        if field and label:
+            labels.setdefault(field, {})[key] = _normalize_label(label)
+
+    if 'metaphorAudit' in analysis:
+        for item in _objects(analysis.get('metaphorAudit')):
+            add(item.get('quote', ''))
+        for item in _objects(analysis.get('explanationAudit')):
+            add(item.get('quote', ''), 'brownType', item.get('brownType'))
+
+    elif 'frames' in analysis:
+        for frame in _objects(analysis.get('frames')):
+            exemplar_quotes = frame.get('exemplar_quotes')
+            for quote in exemplar_quotes if isinstance(exemplar_quotes, list) else []:
+                add(quote, 'frame_label', frame.get('frame_label'))
+
+    elif 'ethos_analysis' in analysis:
+        for appeal in ('ethos', 'pathos', 'logos'):
+            section = analysis.get(f'{appeal}_analysis')
+            for item in _objects(section.get('examples') if isinstance(section, dict) else None):
+                add(item.get('quote', ''), 'appeal', appeal)
+
+    return quotes, labels
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+def jaccard_matrix(sets):
+    """
+    Pairwise Jaccard similarity between sets
+
+    Args:
+        sets: List of sets of hashable items
+
+    Returns:
+        numpy.ndarray: Square matrix; NaN where both sets are empty
+    """
+    vocabulary = {item: index for index, item in enumerate(set().union(*sets))}
+    membership = np.zeros((len(sets), len(vocabulary)), dtype=np.float64)
+    for row, items in enumerate(sets):
+        membership[row, [vocabulary[item] for item in items]] = 1.0
+
+    intersections = membership @ membership.T
+    sizes = membership.sum(axis=1)
+    unions = sizes[:, None] + sizes[None, :] - intersections
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(unions > 0, intersections / unions, np.nan)
+
+
+def krippendorff_alpha(codes):
+    """
+    Krippendorff's alpha for nominal data
+
+    Args:
+        codes: Integer matrix (coders x units); -1 marks a missing value
+
+    Returns:
+        float: Alpha, or None when it is undefined (fewer than two pairable
+               values, or every value in the same category)
+    """
+    codes = np.asarray(codes)
+    if codes.size == 0:
+        return None
+    n_values = codes.max() + 1
+    if n_values <= 0:
+        return None
+
+    # Values-by-unit counts; units coded by fewer than two coders can't be paired
+    counts = np.zeros((codes.shape[1], n_values), dtype=np.float64)
+    coder_idx, unit_idx = np.nonzero(codes >= 0)
+    np.add.at(counts, (unit_idx, codes[coder_idx, unit_idx]), 1.0)
+    pairable = counts.sum(axis=1)
+    counts = counts[pairable >= 2]
+    pairable = pairable[pairable >= 2]
+    if not len(pairable):
+        return None
+
+    # Coincidence matrix
+    weighted = counts / (pairable - 1)[:, None]
+    coincidences = counts.T @ weighted - np.diag(weighted.sum(axis=0))
+    totals = coincidences.sum(axis=0)
+    n = totals.sum()
+
+    expected = n * n - (totals * totals).sum()
+    if expected <= 0:
+        return None
+    observed = coincidences.sum() - np.trace(coincidences)
+    return float(1.0 - (n - 1) * observed / expected)
+
+
+def _label_codes(label_maps):
+    """Turn per-sample {unit: label} maps into a coders x units code matrix"""
+    units = sorted(set().union(*label_maps))
+    values = sorted({label for label_map in label_maps for label in label_map.values()})
+    unit_index = {unit: index for index, unit in enumerate(units)}
+    value_index = {value: index for index, value in enumerate(values)}
+
+    codes = np.full((len(label_maps), len(units)), -1, dtype=np.int64)
+    for row, label_map in enumerate(label_maps):
+        for unit, label in label_map.items():
+            codes[row, unit_index[unit]] = value_index[label]
+    return codes, len(values)
+
+
+def describe_alpha(alpha):
+    """Plain-language reading of an alpha value"""
+    if alpha is None:
+        return "not enough variation to measure"
+    if alpha >= ALPHA_RELIABLE:
+        return "reliable"
+    if alpha >= ALPHA_TENTATIVE:
+        return "tentative"
+    return "unreliable"
+
+# =============================================================================
+# REPORT
+# =============================================================================
+
+def reliability_report(analyses):
+    """
+    Agreement statistics over repeated analyses of one text
+
+    Args:
+        analyses: Parsed analyses of the same text and framework; freeform
+            (non-dict) analyses are skipped
+
+    Returns:
+        dict: "samples", "quote_overlap" (mean/min pairwise Jaccard) and
+              per-field "labels" (alpha, units, categories), or None with
+              fewer than two structured analyses
+    """
+    structured = [analysis for analysis in analyses if isinstance(analysis, dict)]
+    if len(structured) < 2:
+        return None
+
+    extracted = [quoted_labels(analysis) for analysis in structured]
+    quote_sets = [quotes for quotes, _ in extracted]
+
+    similarity = jaccard_matrix(quote_sets)
+    pairs = similarity[np.triu_indices(len(quote_sets), k=1)]
+    pairs = pairs[~np.isnan(pairs)]
+
+    report = {
+        "samples": len(structured),
+        "quote_overlap": {
+            "mean_jaccard": round(float(pairs.mean()), 3) if len(pairs) else None,
+            "min_jaccard": round(float(pairs.min()), 3) if len(pairs) else None,
+            "distinct_quotes": len(set().union(*quote_sets)),
+        },
+        "labels": {},
+    }
+
+    for field, name in LABEL_FIELDS.items():
+        label_maps = [labels.get(field, {}) for _, labels in extracted]
+        if not any(label_maps):
+            continue
+        codes, categories = _label_codes(label_maps)
+        alpha = krippendorff_alpha(codes)
+        report["labels"][field] = {
+            "name": name,
+            "alpha": round(alpha, 3) if alpha is not None else None,
+            "reading": describe_alpha(alpha),
+            "units": int(((codes >= 0).sum(axis=0) >= 2).sum()),
+            "categories": categories,
+        }
+
+    return report
@@ -0,0 +1,608 @@
+# report_utils.py
+# Markdown report generation for analysis results (no Streamlit dependency)
+
+from datetime import datetime
+
+def create_markdown_report(result):
+    """
+    Generate a comprehensive markdown report from analysis results
+    
+    Args:
+        result: The analysis result dictionary
+        
+    Returns:
+        str: Formatted markdown report matching web display exactly
+    """
+    
+    analysis = result['analysis']
+    timestamp_formatted = datetime.strptime(result['timestamp'], '%Y%m%d_%H%M%S').strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Start building the report
+    markdown = f"""# AI Framework Analysis Report
+
+**Generated:** {timestamp_formatted}  
+**Model:** {result['model']}  
+**Text Length:** {result['text_length']:,} characters  
+**Output Format:** {'Structured' if result.get('use_json') else 'Text'}  
+"""
+    
+    if result.get('metadata', {}).get('schema_profile') == "Lite":
+        markdown += "**Profile:** Lite (required fields only)  \n"
+    
+    fallback = result.get('metadata', {}).get('fallback')
+    if fallback and fallback.get('fell_back'):
+        reasons = ", ".join(f"{attempt['model']} ({attempt['reason']})" for attempt in fallback['attempts'])
+        markdown += f"**Fallback:** Requested {fallback['requested_model']}; fell back after {reasons}  \n"
+    
+    if result.get('metadata', {}).get('sample'):
+        markdown += f"**Sample:** {result['metadata']['sample']}  \n"
+    
+    if result.get('metadata', {}).get('tier') == "quick":
+        markdown += "**Tier:** Quick pass (preliminary result)  \n"
+    elif result.get('metadata', {}).get('tier') == "deep":
+        markdown += "**Tier:** Full analysis  \n"
+    
+    if result.get('metadata', {}).get('total_tokens'):
+        markdown += f"**Tokens Used:** {result['metadata']['total_tokens']:,}  \n"
+    
+    markdown += "\n---\n\n"
+    
+    # Check analysis type and format accordingly
+    if isinstance(analysis, dict):
+        # Check for different framework types
+        if 'metaphorAudit' in analysis:
+            markdown += "## 🔬 Metaphor Analysis Results\n\n"
+            markdown += _format_metaphor_analysis_markdown(analysis)
+            
+        elif 'frames' in analysis:
+            markdown += "## 🎯 Political Framing Analysis Results\n\n"
+            markdown += _format_framing_analysis_markdown(analysis)
+            
+        elif 'ethos_analysis' in analysis:
+            markdown += "## 🎭 Rhetorical Analysis Results\n\n"
+            markdown += _format_rhetorical_analysis_markdown(analysis)
+            
+        else:
+            # Generic structured analysis
+            markdown += "## Analysis Results\n\n"
+            markdown += _format_generic_analysis_markdown(analysis)
+    
+    else:
+        # Freeform text analysis
+        markdown += "## Analysis Results\n\n"
+        markdown += str(analysis) + "\n\n"
+    
+    # Add metadata section
+    markdown += "\n---\n\n## Analysis Metadata\n\n"
+    markdown += f"- **Model Used:** {result['model']}\n"
+    markdown += f"- **Generated:** {timestamp_formatted}\n"
+    markdown += f"- **Text Length:** {result['text_length']:,} characters\n"
+    
+    if result.get('metadata', {}).get('total_tokens'):
+        markdown += f"- **Total Tokens:** {result['metadata']['total_tokens']:,}\n"
+    
+    thinking = result.get('metadata', {}).get('thinking')
+    if thinking:
+        markdown += f"- **Thinking:** {thinking['profile']}"
+        if thinking.get('thoughts_tokens'):
+            markdown += f" ({thinking['thoughts_tokens']:,} thinking tokens)"
+        markdown += "\n"
+    
+    if result.get('metadata', {}).get('latency_s') is not None:
+        markdown += f"- **Response Time:** {result['metadata']['latency_s']:.1f} s\n"
+    
+    validation = result.get('metadata', {}).get('validation')
+    if validation:
+        if validation.get('valid'):
+            markdown += "- **Schema Check:** Passed\n"
+        else:
+            markdown += f"- **Schema Check:** {validation['error_count']} issue(s)\n"
+            for issue in validation.get('errors', []):
+                markdown += f"  - `{issue['path']}`: {issue['error']}\n"
+    
+    reliability = result.get('metadata', {}).get('reliability')
+    if reliability:
+        markdown += f"\n### Run-to-Run Reliability ({reliability['samples']} samples)\n\n"
+        overlap = reliability['quote_overlap']
+        if overlap['mean_jaccard'] is not None:
+            markdown += f"- **Quote Overlap (mean Jaccard):** {overlap['mean_jaccard']:.2f} (lowest pair {overlap['min_jaccard']:.2f})\n"
+        for label in reliability['labels'].values():
+            alpha = f"{label['alpha']:.2f}" if label['alpha'] is not None else "n/a"
+            markdown += f"- **{label['name']}:** Krippendorff's α = {alpha} ({label['reading']})\n"
+    
+    markdown += f"\n*Generated by AI Framework Analysis Tool*\n"
+    
+    return markdown
+
+
+def _format_metaphor_analysis_markdown(analysis):
+    """
+    Format metaphor analysis for comprehensive markdown report
+    
+    Args:
+        analysis: Dictionary containing metaphor analysis results
+        
+    Returns:
+        str: Formatted markdown content
+    """
+    markdown = ""
+    
+    # Task 1: Metaphor Audit
+    markdown += "### Task 1: Metaphor & Anthropomorphism Audit\n\n"
+    metaphor_audit = analysis.get('metaphorAudit', [])
+    
+    if metaphor_audit:
+        markdown += f"**Found {len(metaphor_audit)} metaphorical patterns:**\n\n"
+        
+        for i, item in enumerate(metaphor_audit, 1):
+            markdown += f"#### {i}. {item.get('title', 'Untitled Pattern')}\n\n"
+            markdown += f"**Quote:** \"{item.get('quote', 'N/A')}\"\n\n"
+            markdown += f"**Frame:** {item.get('frame', 'N/A')}\n\n"
+            markdown += f"**Projection:** {item.get('projection', 'N/A')}\n\n"
+            markdown += f"**Acknowledgment:** {item.get('acknowledgment', 'N/A')}\n\n"
+            markdown += f"**Implications:** {item.get('implications', 'N/A')}\n\n"
+            if i < len(metaphor_audit):
+                markdown += "---\n\n"
+    else:
+        markdown += "*No metaphorical patterns identified in this analysis.*\n\n"
+    
+    # Task 2: Source-Target Mapping
+    markdown += "### Task 2: Source-Target Mapping Analysis\n\n"
+    source_target = analysis.get('sourceTargetMapping', [])
+    
+    if source_target:
+        markdown += f"**Found {len(source_target)} detailed mappings:**\n\n"
+        
+        for i, item in enumerate(source_target, 1):
+            markdown += f"#### Mapping {i}\n\n"
+            markdown += f"**Quote:** \"{item.get('quote', 'N/A')}\"\n\n"
+            markdown += f"**Source Domain:** {item.get('sourceDomain', 'N/A')}\n\n"
+            markdown += f"**Target Domain:** {item.get('targetDomain', 'N/A')}\n\n"
+            markdown += f"**Mapping Process:** {item.get('mapping', 'N/A')}\n\n"
+            markdown += f"**What It Conceals:** {item.get('conceals', 'N/A')}\n\n"
+            if i < len(source_target):
+                markdown += "---\n\n"
+    else:
+        markdown += "*No detailed source-target mappings provided.*\n\n"
+    
+    # Task 3: Explanation Audit
+    markdown += "### Task 3: Explanation Audit (Brown's Typology)\n\n"
+    explanation_audit = analysis.get('explanationAudit', [])
+    
+    if explanation_audit:
+        markdown += f"**Found {len(explanation_audit)} explanatory passages:**\n\n"
+        
+        for i, item in enumerate(explanation_audit, 1):
+            markdown += f"#### Explanation {i}\n\n"
+            markdown += f"**Quote:** \"{item.get('quote', 'N/A')}\"\n\n"
+            markdown += f"**Brown's Type:** `{item.get('brownType', 'N/A')}`\n\n"
+            markdown += f"**Justification:** {item.get('justification', 'N/A')}\n\n"
+            markdown += f"**Implications:** {item.get('implications', 'N/A')}\n\n"
+            
+            if item.get('chainedFrom'):
+                markdown += f"**Chained From:** {item.get('chainedFrom')}\n\n"
+            
+            if i < len(explanation_audit):
+                markdown += "---\n\n"
+    else:
+        markdown += "*No explanatory passages analyzed.*\n\n"
+    
+    # Critical Observations
+    markdown += "### Critical Observations\n\n"
+    obs = analysis.get('criticalObservations', {})
+    
+    if obs and any(obs.values()):
+        markdown += "**Agency Slippage:** " + obs.get('agencySlippage', 'Not analyzed') + "\n\n"
+        markdown += "**Metaphor-Driven Trust:** " + obs.get('metaphorDrivenTrust', 'Not analyzed') + "\n\n"
+        markdown += "**Obscured Mechanics:** " + obs.get('obscuredMechanics', 'Not analyzed') + "\n\n"
+        markdown += "**Context Sensitivity:** " + obs.get('contextSensitivity', 'Not analyzed') + "\n\n"
+    else:
+        markdown += "*No critical observations provided.*\n\n"
+    
+    # Conclusion
+    markdown += "### Conclusion\n\n"
+    conclusion = analysis.get('conclusion', 'No conclusion provided.')
+    if conclusion and conclusion != 'No conclusion provided.':
+        markdown += conclusion + "\n\n"
+    else:
+        markdown += "*No conclusion provided in this analysis.*\n\n"
+    
+    return markdown
+
+
+def _format_framing_analysis_markdown(analysis):
+    """
+    Format framing analysis for comprehensive markdown report
+    
+    Args:
+        analysis: Dictionary containing framing analysis results
+        
+    Returns:
+        str: Formatted markdown content
+    """
+    markdown = ""
+    
+    frames = analysis.get('frames', [])
+    text_id = analysis.get('text_id', 'N/A')
+    
+    # Overview section
+    if text_id != 'N/A':
+        markdown += f"**Text ID:** {text_id}\n\n"
+    
+    markdown += f"**Frames Identified:** {len(frames)}\n\n"
+    
+    if frames:
+        markdown += "### Individual Frame Analysis\n\n"
+        
+        for i, frame in enumerate(frames, 1):
+            frame_label = frame.get('frame_label', f'Frame {i}')
+            markdown += f"## Frame {i}: {frame_label}\n\n"
+            
+            # Exemplar Quotes Section
+            quotes = frame.get('exemplar_quotes', [])
+            if quotes:
+                markdown += "**📝 Key Quotes:**\n\n"
+                for j, quote in enumerate(quotes, 1):
+                    markdown += f"{j}. \"{quote}\"\n\n"
+            
+            # Entman's Functions
+            functions = frame.get('functions', {})
+            if functions:
+                markdown += "**🔧 Entman's Framing Functions:**\n\n"
+                markdown += f"- **Problem Definition:** {functions.get('problem_definition', 'Not specified')}\n"
+                markdown += f"- **Causal Diagnosis:** {functions.get('causal_diagnosis', 'Not specified')}\n"
+                markdown += f"- **Moral Evaluation:** {functions.get('moral_evaluation', 'Not specified')}\n"
+                markdown += f"- **Treatment Recommendation:** {functions.get('treatment_recommendation', 'Not specified')}\n\n"
+            
+            # Lexical Cues
+            lexical_cues = frame.get('lexical_cues', {})
+            if lexical_cues:
+                markdown += "**🏷️ Lexical & Rhetorical Cues:**\n\n"
+                
+                keywords = lexical_cues.get('keywords', [])
+                if keywords:
+                    markdown += "**Keywords:** "
+                    markdown += ", ".join([f"`{keyword}`" for keyword in keywords]) + "\n\n"
+                
+                metaphors = lexical_cues.get('metaphors', [])
+                if metaphors:
+                    markdown += "**Metaphors:** "
+                    markdown += ", ".join([f"*{metaphor}*" for metaphor in metaphors]) + "\n\n"
+                
+                bridging = lexical_cues.get('bridging_language', [])
+                if bridging:
+                    markdown += "**Bridging Language:** "
+                    markdown += ", ".join([f"**{bridge}**" for bridge in bridging]) + "\n\n"
+            
+            # Role Assignment
+            role_assignment = frame.get('role_assignment', {})
+            if role_assignment and any(role_assignment.values()):
+                markdown += "**👥 Role Assignment:**\n\n"
+                
+                beneficiaries = role_assignment.get('beneficiaries', [])
+                if beneficiaries:
+                    markdown += "**Beneficiaries:**\n"
+                    for beneficiary in beneficiaries:
+                        markdown += f"- ✅ {beneficiary}\n"
+                    markdown += "\n"
+                
+                cost_bearers = role_assignment.get('cost_bearers', [])
+                if cost_bearers:
+                    markdown += "**Cost Bearers:**\n"
+                    for bearer in cost_bearers:
+                        markdown += f"- ❌ {bearer}\n"
+                    markdown += "\n"
+                
+                agency = role_assignment.get('attributed_agency', [])
+                if agency:
+                    markdown += "**Attributed Agency:**\n"
+                    for agent in agency:
+                        markdown += f"- ⚡ {agent}\n"
+                    markdown += "\n"
+            
+            # Reasoning Effects
+            reasoning = frame.get('reasoning_effects', {})
+            if reasoning:
+                markdown += "**🧠 Reasoning Effects:**\n\n"
+                
+                inferences = reasoning.get('invited_inferences', 'Not specified')
+                markdown += f"**Invited Inferences:** {inferences}\n\n"
+                
+                conceals = reasoning.get('conceals_or_downplays', 'Not specified')
+                if conceals != 'Not specified':
+                    markdown += f"**Conceals/Downplays:** {conceals}\n\n"
+            
+            # Counterframe Linkage
+            counterframe = frame.get('counterframe_linkage', {})
+            if counterframe and any(counterframe.values()):
+                markdown += "**⚔️ Counterframe Analysis:**\n\n"
+                
+                contests = counterframe.get('contests', 'Not specified')
+                if contests != 'Not specified':
+                    markdown += f"**Contests:** {contests}\n\n"
+                
+                mechanism = counterframe.get('mechanism', 'Not specified')
+                if mechanism != 'Not specified':
+                    markdown += f"**Mechanism:** {mechanism}\n\n"
+            
+            # Add divider between frames (except for last one)
+            if i < len(frames):
+                markdown += "---\n\n"
+    
+    else:
+        markdown += "*No frames identified in this analysis.*\n\n"
+    
+    # Synthesis Section
+    synthesis = analysis.get('synthesis', {})
+    if synthesis:
+        markdown += "### 🔄 Synthesis & Analysis\n\n"
+        
+        # Dominant frames
+        dominant_frames = synthesis.get('dominant_frames', [])
+        if dominant_frames:
+            markdown += "**🏆 Dominant Frames:**\n\n"
+            for i, frame in enumerate(dominant_frames, 1):
+                markdown += f"{i}. **{frame}**\n"
+            markdown += "\n"
+        
+        # Comparative insight
+        comparative = synthesis.get('comparative_insight', 'Not provided')
+        if comparative != 'Not provided':
+            markdown += f"**🔍 Comparative Analysis:** {comparative}\n\n"
+        
+        # Agenda setting effects
+        agenda_effects = synthesis.get('agenda_setting_effects', 'Not provided')
+        if agenda_effects != 'Not provided':
+            markdown += f"**📺 Agenda-Setting Effects:** {agenda_effects}\n\n"
+        
+        # Implications
+        implications = synthesis.get('implications_for_public_understanding', 'Not provided')
+        if implications != 'Not provided':
+            markdown += f"**🎯 Implications for Public Understanding:** {implications}\n\n"
+    
+    # Errors section (if any)
+    errors = analysis.get('errors', [])
+    if errors:
+        markdown += "### ⚠️ Analysis Notes\n\n"
+        for error in errors:
+            markdown += f"- {error}\n"
+        markdown += "\n"
+    
+    return markdown
+
+
+def _format_rhetorical_analysis_markdown(analysis):
+    """
+    Format rhetorical analysis for comprehensive markdown report
+    
+    Args:
+        analysis: Dictionary containing rhetorical analysis results
+        
+    Returns:
+        str: Formatted markdown content
+    """
+    markdown = ""
+    
+    # Text Metadata
+    metadata = analysis.get('text_metadata', {})
+    if metadata:
+        markdown += "### 📋 Rhetorical Situation\n\n"
+        markdown += f"**Rhetorical Situation:** {metadata.get('rhetorical_situation', 'Not specified')}\n\n"
+        markdown += f"**Primary Audience:** {metadata.get('primary_audience', 'Not specified')}\n\n"
+        
+        speaker_context = metadata.get('speaker_context', 'Not specified')
+        if speaker_context != 'Not specified':
+            markdown += f"**Speaker Context:** {speaker_context}\n\n"
+        
+        markdown += f"**Overall Purpose:** {metadata.get('overall_purpose', 'Not specified')}\n\n"
+    
+    # Ethos Analysis
+    ethos_analysis = analysis.get('ethos_analysis', {})
+    if ethos_analysis:
+        markdown += "### 👑 Ethos Analysis (Credibility & Authority)\n\n"
+        examples = ethos_analysis.get('examples', [])
+        
+        if examples:
+            markdown += f"**Found {len(examples)} ethos appeals:**\n\n"
+            
+            for i, example in enumerate(examples, 1):
+                markdown += f"#### Example {i}\n\n"
+                
+                quote = example.get('quote', 'No quote provided')
+                markdown += f"**Quote:** \"{quote}\"\n\n"
+                
+                markdown += f"**Ethos Type:** `{example.get('ethos_type', 'Not specified')}`\n\n"
+                markdown += f"**Construction Method:** {example.get('construction_method', 'Not specified')}\n\n"
+                
+                audience_targeting = example.get('audience_targeting', 'Not specified')
+                if audience_targeting != 'Not specified':
+                    markdown += f"**Audience Targeting:** {audience_targeting}\n\n"
+                
+                markdown += f"**Effectiveness Assessment:** {example.get('effectiveness_assessment', 'Not specified')}\n\n"
+                
+                cultural_assumptions = example.get('cultural_assumptions', 'Not specified')
+                if cultural_assumptions != 'Not specified':
+                    markdown += f"**Cultural Assumptions:** {cultural_assumptions}\n\n"
+                
+                if i < len(examples):
+                    markdown += "---\n\n"
+        
+        # Overall strategy
+        overall_strategy = ethos_analysis.get('overall_ethos_strategy', 'Not provided')
+        if overall_strategy != 'Not provided':
+            markdown += f"**🎯 Overall Ethos Strategy:** {overall_strategy}\n\n"
+    
+    # Pathos Analysis
+    pathos_analysis = analysis.get('pathos_analysis', {})
+    if pathos_analysis:
+        markdown += "### ❤️ Pathos Analysis (Emotional Engagement)\n\n"
+        examples = pathos_analysis.get('examples', [])
+        
+        if examples:
+            markdown += f"**Found {len(examples)} pathos appeals:**\n\n"
+            
+            for i, example in enumerate(examples, 1):
+                markdown += f"#### Example {i}\n\n"
+                
+                quote = example.get('quote', 'No quote provided')
+                markdown += f"**Quote:** \"{quote}\"\n\n"
+                
+                markdown += f"**Emotion Type:** `{example.get('emotion_type', 'Not specified')}`\n\n"
+                markdown += f"**Trigger Mechanism:** {example.get('trigger_mechanism', 'Not specified')}\n\n"
+                
+                intensity_level = example.get('intensity_level', 'Not specified')
+                if intensity_level != 'Not specified':
+                    markdown += f"**Intensity Level:** {intensity_level}\n\n"
+                
+                audience_resonance = example.get('audience_resonance', 'Not specified')
+                if audience_resonance != 'Not specified':
+                    markdown += f"**Audience Resonance:** {audience_resonance}\n\n"
+                
+                markdown += f"**Strategic Function:** {example.get('strategic_function', 'Not specified')}\n\n"
+                
+                potential_risks = example.get('potential_risks', 'Not specified')
+                if potential_risks != 'Not specified':
+                    markdown += f"**Potential Risks:** {potential_risks}\n\n"
+                
+                if i < len(examples):
+                    markdown += "---\n\n"
+        
+        # Emotional arc
+        emotional_arc = pathos_analysis.get('emotional_arc', 'Not provided')
+        if emotional_arc != 'Not provided':
+            markdown += f"**📈 Emotional Arc:** {emotional_arc}\n\n"
+    
+    # Logos Analysis
+    logos_analysis = analysis.get('logos_analysis', {})
+    if logos_analysis:
+        markdown += "### 🧠 Logos Analysis (Logical Reasoning)\n\n"
+        examples = logos_analysis.get('examples', [])
+        
+        if examples:
+            markdown += f"**Found {len(examples)} logos appeals:**\n\n"
+            
+            for i, example in enumerate(examples, 1):
+                markdown += f"#### Example {i}\n\n"
+                
+                quote = example.get('quote', 'No quote provided')
+                markdown += f"**Quote:** \"{quote}\"\n\n"
+                
+                markdown += f"**Reasoning Type:** `{example.get('reasoning_type', 'Not specified')}`\n\n"
+                
+                evidence_base = example.get('evidence_base', 'Not specified')
+                if evidence_base != 'Not specified':
+                    markdown += f"**Evidence Base:** {evidence_base}\n\n"
+                
+                markdown += f"**Logical Structure:** {example.get('logical_structure', 'Not specified')}\n\n"
+                
+                assumption_analysis = example.get('assumption_analysis', 'Not specified')
+                if assumption_analysis != 'Not specified':
+                    markdown += f"**Assumption Analysis:** {assumption_analysis}\n\n"
+                
+                markdown += f"**Strength Assessment:** {example.get('strength_assessment', 'Not specified')}\n\n"
+                
+                vulnerability = example.get('counterargument_vulnerability', 'Not specified')
+                if vulnerability != 'Not specified':
+                    markdown += f"**Counterargument Vulnerability:** {vulnerability}\n\n"
+                
+                if i < len(examples):
+                    markdown += "---\n\n"
+        
+        # Logical coherence
+        logical_coherence = logos_analysis.get('logical_coherence', 'Not provided')
+        if logical_coherence != 'Not provided':
+            markdown += f"**⚖️ Logical Coherence:** {logical_coherence}\n\n"
+    
+    # Appeal Integration
+    integration = analysis.get('appeal_integration', {})
+    if integration:
+        markdown += "### 🔗 Appeal Integration Analysis\n\n"
+        
+        reinforcement = integration.get('reinforcement_patterns', 'Not specified')
+        if reinforcement != 'Not specified':
+            markdown += f"**🤝 Reinforcement Patterns:** {reinforcement}\n\n"
+        
+        cultural_factors = integration.get('cultural_factors', 'Not specified')
+        if cultural_factors != 'Not specified':
+            markdown += f"**🌍 Cultural Factors:** {cultural_factors}\n\n"
+        
+        tensions = integration.get('appeal_tensions', 'Not specified')
+        if tensions != 'Not specified':
+            markdown += f"**⚡ Appeal Tensions:** {tensions}\n\n"
+        
+        situation_fit = integration.get('rhetorical_situation_fit', 'Not specified')
+        if situation_fit != 'Not specified':
+            markdown += f"**🎯 Rhetorical Situation Fit:** {situation_fit}\n\n"
+    
+    # Effectiveness Evaluation
+    effectiveness = analysis.get('effectiveness_evaluation', {})
+    if effectiveness:
+        markdown += "### 📊 Effectiveness Evaluation\n\n"
+        
+        strengths = effectiveness.get('persuasive_strengths', 'Not specified')
+        if strengths != 'Not specified':
+            markdown += f"**💪 Persuasive Strengths:** {strengths}\n\n"
+        
+        audience_effectiveness = effectiveness.get('audience_effectiveness', 'Not specified')
+        if audience_effectiveness != 'Not specified':
+            markdown += f"**🎯 Audience Effectiveness:** {audience_effectiveness}\n\n"
+        
+        weaknesses = effectiveness.get('potential_weaknesses', 'Not specified')
+        if weaknesses != 'Not specified':
+            markdown += f"**⚠️ Potential Weaknesses:** {weaknesses}\n\n"
+        
+        ethical_considerations = effectiveness.get('ethical_considerations', 'Not specified')
+        if ethical_considerations != 'Not specified':
+            markdown += f"**⚖️ Ethical Considerations:** {ethical_considerations}\n\n"
+    
+    # Critical Synthesis
+    synthesis = analysis.get('critical_synthesis', 'No synthesis provided.')
+    if synthesis != 'No synthesis provided.':
+        markdown += "### 🎯 Critical Synthesis\n\n"
+        markdown += synthesis + "\n\n"
+    
+    return markdown
+
+
+def _format_generic_analysis_markdown(analysis):
+    """
+    Format generic structured analysis for comprehensive markdown report
+    
+    Args:
+        analysis: Dictionary containing generic analysis results
+        
+    Returns:
+        str: Formatted markdown content
+    """
+    markdown = ""
+    
+    for section_name, section_content in analysis.items():
+        section_title = section_name.replace('_', ' ').title()
+        markdown += f"### {section_title}\n\n"
+        
+        if isinstance(section_content, list):
+            if not section_content:
+                markdown += "*No items found*\n\n"
+            else:
+                for i, item in enumerate(section_content, 1):
+                    if isinstance(item, dict):
+                        markdown += f"#### Item {i}\n\n"
+                        for field_name, field_value in item.items():
+                            field_title = field_name.replace('_', ' ').title()
+                            markdown += f"**{field_title}:** {field_value}\n\n"
+                        if i < len(section_content):
+                            markdown += "---\n\n"
+                    else:
+                        markdown += f"- {item}\n"
+                if not all(isinstance(item, dict) for item in section_content):
+                    markdown += "\n"
+        
+        elif isinstance(section_content, dict):
+            for sub_name, sub_content in section_content.items():
+                sub_title = sub_name.replace('_', ' ').title()
+                markdown += f"**{sub_title}:** {sub_content}\n\n"
+        
+        else:
+            markdown += f"{section_content}\n\n"
+    
+    return markdown
\ No newline at end of file
@@ -0,0 +1,119 @@
+# rerun_profiler.py
+# Opt-in cProfile instrumentation of Streamlit reruns (developer mode)
+#
+# Every widget interaction reruns the whole script. With AFA_PROFILE_RERUNS=1
+# each rerun of main() is profiled and app.py shows the wall time, the top
+# functions by cumulative time and the history across reruns in a sidebar
+# panel, so slow reruns show up before they reach a classroom.
+
+import cProfile
+import marshal
+import os
+import pstats
+import time
+
+PROFILE_RERUNS = os.environ.get("AFA_PROFILE_RERUNS", "").lower() in ("1", "true", "yes")
+
+# Reruns kept per session
+PROFILE_HISTORY = 50
+
+# Functions listed per rerun
+TOP_FUNCTIONS = 25
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _function_label(key):
+    """Readable name for a pstats key (file, line, function)"""
+    file_name, line, function = key
+    if file_name == "~":
+        return function
+    if file_name.startswith(REPO_DIR):
+        file_name = os.path.relpath(file_name, REPO_DIR)
+    else:
+        file_name = os.path.basename(file_name)
+    return f"{file_name}:{line} {function}"
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS, app_only=False):
+    """
+    Functions with the most cumulative time in a profile
+
+    Args:
+        stats: pstats.Stats of one rerun
+        limit: Number of rows
+        app_only: Keep only functions defined in this repository
+
+    Returns:
+        list: Dicts with function, calls, own_s and cumulative_s
+    """
+    rows = []
+    for key, (_primitive_calls, calls, own_time, cumulative_time, _callers) in stats.stats.items():
+        if app_only and not key[0].startswith(REPO_DIR):
+            continue
+        rows.append({
+            "function": _function_label(key),
+            "calls": calls,
+            "own_s": round(own_time, 4),
+            "cumulative_s": round(cumulative_time, 4),
+        })
+    rows.sort(key=lambda row: row["cumulative_s"], reverse=True)
+    return rows[:limit]
+
+
+def profile_call(function, label=None):
+    """
+    Run a function under cProfile
+
+    The profile is returned even when the function ends the rerun early with
+    st.rerun() or st.stop(); the exception is then re-raised by the caller
+    via profile["error"].
+
+    Args:
+        function: Callable without arguments, e.g. main
+        label: Short description stored with the profile (e.g. the step)
+
+    Returns:
+        dict: label, started (epoch seconds), wall_s, functions (top by
+        cumulative time), app_functions (top from this repository), raw
+        (marshalled pstats data for snakeviz and friends) and error
+    """
+    profiler = cProfile.Profile()
+    started = time.time()
+    wall_started = time.perf_counter()
+    error = None
+    profiler.enable()
+    try:
+        function()
+    except BaseException as exception:
+        error = exception
+    finally:
+        profiler.disable()
+    wall_s = time.perf_counter() - wall_started
+
+    stats = pstats.Stats(profiler)
+    return {
+        "label": label,
+        "started": started,
+        "wall_s": round(wall_s, 4),
+        "functions": top_functions(stats),
+        "app_functions": top_functions(stats, app_only=True),
+        "raw": marshal.dumps(stats.stats),
+        "error": error,
+    }
+
+
+def add_profile(history, profile):
+    """
+    Append a profile to a session's history, keeping the last PROFILE_HISTORY
+
+    Only the newest profile keeps its raw pstats data.
+
+    Args:
+        history: List kept in session state
+        profile: Result of profile_call (its exception is not stored)
+    """
+    for previous in history:
+        previous.pop("raw", None)
+    history.append({key: value for key, value in profile.items() if key != "error"})
+    del history[:-PROFILE_HISTORY]
@@ -0,0 +1,423 @@
+# resilience.py
+# Tail-latency and failure handling around Gemini requests
+
+import queue
+import threading
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+from model_router import MODEL_PROFILES, ROUTABLE_MODELS
+from run_history import get_runs, percentile
+
+# =============================================================================
+# DEADLINES
+# =============================================================================
+
+# Total time budget for one analysis job
+DEFAULT_DEADLINE_S = 180
+
+# Smallest timeout handed to a Gemini call; below this a call can't succeed
+MIN_CALL_TIMEOUT_S = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """The job's time budget is spent"""
+
+
+class Deadline:
+    """
+    Total time budget for one analysis job
+
+    Every Gemini call gets the remaining budget as its request timeout, and
+    waits, retries and fallbacks stop once the budget is spent. Calls are
+    recorded for the timing breakdown in the result metadata.
+    """
+
+    def __init__(self, budget_s=DEFAULT_DEADLINE_S):
+        self.budget_s = budget_s
+        self.started = time.perf_counter()
+        self.calls = []
+
+    def elapsed(self):
+        """Seconds since the job started"""
+        return time.perf_counter() - self.started
+
+    def remaining(self):
+        """Seconds left, or None for an unbounded job"""
+        if self.budget_s is None:
+            return None
+        return max(0.0, self.budget_s - self.elapsed())
+
+    def expired(self):
+        """True once the budget is spent"""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def call_timeout(self, label):
+        """
+        Timeout for the next Gemini call
+
+        Args:
+            label: Name of the call, used in the error message
+
+        Returns:
+            float: Seconds (None for an unbounded job)
+
+        Raises:
+            DeadlineExceeded: Too little time left to make the call
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining < MIN_CALL_TIMEOUT_S:
+            raise DeadlineExceeded(f"Time budget of {self.budget_s:g} s spent before {label}")
+        return remaining
+
+    def record_call(self, label, timeout_s, started, outcome):
+        """Note one call for the timing breakdown"""
+        self.calls.append({
+            "call": label,
+            "timeout_s": round(timeout_s, 2) if timeout_s is not None else None,
+            "start_s": round(started - self.started, 2),
+            "elapsed_s": round(time.perf_counter() - started, 2),
+            "outcome": outcome,
+        })
+
+    def summary(self):
+        """Budget breakdown for result["metadata"]["timings"]"""
+        remaining = self.remaining()
+        return {
+            "budget_s": self.budget_s,
+            "spent_s": round(self.elapsed(), 2),
+            "remaining_s": round(remaining, 2) if remaining is not None else None,
+            "calls": list(self.calls),
+        }
+
+# =============================================================================
+# REQUEST HEDGING
+# =============================================================================
+
+# Percentiles offered for the hedge trigger
+HEDGE_PERCENTILES = [0.5, 0.75, 0.9, 0.95]
+
+# Hedges allowed per request on average, plus a burst of one. Caps extra spend.
+HEDGE_MAX_FRACTION = 0.1
+
+# Recent time-to-first-token samples needed before trusting the percentile
+MIN_HEDGE_SAMPLES = 5
+
+# Never hedge sooner than this, whatever the history says
+MIN_HEDGE_DELAY_S = 2.0
+
+_hedge_lock = threading.Lock()
+_hedge_stats = {"requests": 0, "hedges": 0}
+
+
+class RequestCancelled(Exception):
+    """Raised inside a request that lost a hedge race"""
+
+
+def hedge_delay_s(model_name, hedge_percentile=0.9):
+    """
+    Time to wait for a first token before sending a hedge request
+
+    Uses the given percentile of this model's recent time-to-first-token.
+    Without enough history, falls back to twice the profile's start-up time.
+
+    Args:
+        model_name: Model of the primary request
+        hedge_percentile: Percentile of recent first-token times, e.g. 0.9
+
+    Returns:
+        float: Delay in seconds
+    """
+    samples = [run["ttft_s"] for run in get_runs(model=model_name, limit=50) if run.get("ttft_s")]
+    if len(samples) >= MIN_HEDGE_SAMPLES:
+        delay = percentile(samples, hedge_percentile)
+    else:
+        delay = MODEL_PROFILES.get(model_name, {}).get("base_latency_s", 5.0) * 2
+    return max(MIN_HEDGE_DELAY_S, delay)
+
+
+def faster_model(model_name):
+    """The next faster routable model, or the same model if none is faster"""
+    if model_name not in ROUTABLE_MODELS:
+        return model_name
+    index = ROUTABLE_MODELS.index(model_name)
+    return ROUTABLE_MODELS[min(index + 1, len(ROUTABLE_MODELS) - 1)]
+
+
+def hedge_rate():
+    """Share of requests so far that sent a hedge"""
+    with _hedge_lock:
+        if not _hedge_stats["requests"]:
+            return 0.0
+        return _hedge_stats["hedges"] / _hedge_stats["requests"]
+
+
+def _claim_hedge():
+    """Take one hedge from the spend budget; False if the budget is used up"""
+    with _hedge_lock:
+        allowed = HEDGE_MAX_FRACTION * _hedge_stats["requests"] + 1
+        if _hedge_stats["hedges"] + 1 > allowed:
+            return False
+        _hedge_stats["hedges"] += 1
+        return True
+
+
+def run_hedged(request, model_name, hedge_after_s=None, hedge_model=None, deadline=None):
+    """
+    Run a request, duplicating it if no first token arrives in time
+
+    The request callable receives (model_name, cancel_event, first_token_event).
+    It must set first_token_event when the first chunk arrives and should
+    raise RequestCancelled once cancel_event is set. The first attempt to
+    finish successfully wins and the other is cancelled.
+
+    Args:
+        request: Callable performing one attempt and returning its response
+        model_name: Model for the primary attempt
+        hedge_after_s: Seconds to wait for a first token; None disables hedging
+        hedge_model: Model for the hedge attempt (defaults to model_name)
+        deadline: Optional Deadline; waiting stops when it runs out
+
+    Returns:
+        tuple: (response, winning_model, hedge_info)
+
+    Raises:
+        DeadlineExceeded: No attempt finished within the deadline
+    """
+    results = queue.Queue()
+    attempts = []
+
+    def launch(attempt_model, role):
+        cancel_event = threading.Event()
+        first_token_event = threading.Event()
+
+        def worker():
+            try:
+                response = request(attempt_model, cancel_event, first_token_event)
+                results.put((role, attempt_model, response, None))
+            except Exception as error:
+                results.put((role, attempt_model, None, error))
+            finally:
+                # A finished attempt counts as progress for the hedge timer
+                first_token_event.set()
+
+        attempts.append({"role": role, "cancel": cancel_event, "first_token": first_token_event})
+        threading.Thread(target=worker, daemon=True, name=f"gemini-{role}").start()
+
+    with _hedge_lock:
+        _hedge_stats["requests"] += 1
+
+    launch(model_name, "primary")
+
+    hedged = False
+    if hedge_after_s is not None:
+        remaining = deadline.remaining() if deadline else None
+        wait_s = hedge_after_s if remaining is None else min(hedge_after_s, remaining)
+        if not attempts[0]["first_token"].wait(wait_s) and not (deadline and deadline.expired()):
+            if _claim_hedge():
+                launch(hedge_model or model_name, "hedge")
+                hedged = True
+
+    errors = []
+    for _ in attempts:
+        try:
+            role, attempt_model, response, error = results.get(
+                timeout=deadline.remaining() if deadline else None
+            )
+        except queue.Empty:
+            for attempt in attempts:
+                attempt["cancel"].set()
+            raise DeadlineExceeded(f"No response from {model_name} within the {deadline.budget_s:g} s budget")
+        if error is None:
+            for attempt in attempts:
+                attempt["cancel"].set()
+            return response, attempt_model, {
+                "enabled": hedge_after_s is not None,
+                "hedged": hedged,
+                "hedge_after_s": round(hedge_after_s, 2) if hedge_after_s is not None else None,
+                "winner": role,
+                "hedge_rate": round(hedge_rate(), 3),
+            }
+        errors.append(error)
+
+    raise errors[0]
+
+
+def chunk_texts(chunk):
+    """
+    The text each candidate received in a streamed chunk
+
+    chunk.text only works for a single candidate, so the parts of every
+    candidate are read instead (requests with candidate_count > 1).
+
+    Args:
+        chunk: Streamed response chunk
+
+    Returns:
+        list: (candidate index, text) per candidate in the chunk
+    """
+    texts = []
+    for position, candidate in enumerate(getattr(chunk, "candidates", None) or []):
+        parts = getattr(getattr(candidate, "content", None), "parts", None) or []
+        text = "".join(getattr(part, "text", "") or "" for part in parts)
+        texts.append((getattr(candidate, "index", position), text))
+    return texts
+
+
+def stream_request(model, contents, cancel_event, first_token_event, timings=None, on_chunk=None, **kwargs):
+    """
+    Stream one generate_content call, honouring hedge cancellation
+
+    Args:
+        model: google.generativeai GenerativeModel
+        contents: Prompt contents
+        cancel_event: Set when another attempt has won
+        first_token_event: Set here when the first chunk arrives
+        timings: Optional Timings; gets request_send, time_to_first_token
+            and generation spans for a completed attempt
+        on_chunk: Optional callback receiving (text, candidate index) for
+            each candidate's share of a chunk
+        **kwargs: Extra generate_content arguments
+
+    Returns:
+        tuple: (fully consumed streaming response, seconds to first chunk)
+    """
+    started = time.perf_counter()
+    first_chunk = None
+    response = model.generate_content(contents, stream=True, **kwargs)
+    sent = time.perf_counter()
+    for chunk in response:
+        if first_chunk is None:
+            first_chunk = time.perf_counter()
+            first_token_event.set()
+        if cancel_event.is_set():
+            raise RequestCancelled()
+        if on_chunk:
+            for candidate, chunk_text in chunk_texts(chunk):
+                if chunk_text:
+                    on_chunk(chunk_text, candidate)
+    finished = time.perf_counter()
+
+    if timings is not None:
+        model_name = getattr(model, "model_name", None)
+        timings.record("request_send", started, sent, model=model_name)
+        if first_chunk is not None:
+            timings.record("time_to_first_token", started, first_chunk, model=model_name)
+            timings.record("generation", first_chunk, finished, model=model_name)
+    return response, (first_chunk - started if first_chunk is not None else None)
+
+
+# =============================================================================
+# FALLBACK CASCADE
+# =============================================================================
+
+# Default order to degrade through, most capable first
+FALLBACK_CASCADE = ["gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.5-flash-lite"]
+class FallbackExhausted(Exception):
+    """Every model in the cascade failed (or the deadline ran out)"""
+
+    def __init__(self, attempts):
+        self.attempts = attempts
+        summary = ", ".join(f"{attempt['model']} ({attempt['reason']})" for attempt in attempts)
+        super().__init__(f"All models failed: {summary}. Last error: {attempts[-1]['error']}")
+
+
+def classify_error(error):
+    """
+    Name the reason an error is worth retrying on another model
+
+    Args:
+        error: Exception raised by a Gemini request
+
+    Returns:
+        str: "overload", "quota" or "timeout", or None if a fallback won't help
+    """
+    if isinstance(error, google_exceptions.ResourceExhausted):
+        return "quota"
+    if isinstance(error, (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError)):
+        return "overload"
+    if isinstance(error, (google_exceptions.DeadlineExceeded, TimeoutError)):
+        return "timeout"
+
+    # Transport errors don't always map to the typed exceptions above
+    message = str(error).lower()
+    if "429" in message or "quota" in message or "rate limit" in message:
+        return "quota"
+    if "503" in message or "overloaded" in message or "unavailable" in message:
+        return "overload"
+    if "timed out" in message or "timeout" in message or "deadline" in message:
+        return "timeout"
+    return None
+
+
+def rejected_option(error, option):
+    """
+    Whether a request was refused as invalid because of a generation option
+
+    Only 400 errors naming the option count, so safety blocks, quota errors
+    and the like are never mistaken for an unsupported option.
+
+    Args:
+        error: Exception raised by a Gemini request
+        option: Word the API's message uses for the option, e.g. "candidate"
+
+    Returns:
+        bool: True if retrying without the option may succeed
+    """
+    return isinstance(error, google_exceptions.BadRequest) and option in str(error).lower()
+
+
+def cascade_for(model_name, fallback_models):
+    """The requested model followed by the fallbacks that aren't it"""
+    return [model_name] + [model for model in fallback_models if model != model_name]
+
+
+def run_with_fallback(attempt, models, deadline=None):
+    """
+    Try each model in turn until one succeeds
+
+    Moves to the next model only on overload, timeout or quota errors and
+    only while time is left within the total deadline. Other errors (bad
+    API key, invalid schema) are raised straight away.
+
+    Args:
+        attempt: Callable taking a model name and returning its result
+        models: Models to try, in order
+        deadline: Optional Deadline shared by all attempts
+
+    Returns:
+        tuple: (result, model_used, fallback_info)
+    """
+    attempts = []
+
+    for index, model_name in enumerate(models):
+        attempt_started = time.perf_counter()
+        try:
+            result = attempt(model_name)
+        except RequestCancelled:
+            raise
+        except Exception as error:
+            reason = classify_error(error)
+            if reason is None:
+                raise
+            attempts.append({
+                "model": model_name,
+                "reason": reason,
+                "error": str(error)[:300],
+                "elapsed_s": round(time.perf_counter() - attempt_started, 2),
+            })
+            remaining = deadline.remaining() if deadline is not None else None
+            out_of_time = remaining is not None and remaining < MIN_CALL_TIMEOUT_S
+            if out_of_time or index == len(models) - 1:
+                raise FallbackExhausted(attempts) from error
+            continue
+
+        return result, model_name, {
+            "requested_model": models[0],
+            "fell_back": bool(attempts),
+            "attempts": attempts,
+        }
+
+    raise ValueError("No models to try")
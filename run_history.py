@@ -0,0 +1,101 @@
+# run_history.py
+# Process-wide record of completed analysis runs (latency and token usage)
+#
+# The router and planners learn from this history. Records are kept in memory
+# for the lifetime of the server process, shared by all sessions. Set
+# AFA_RUN_HISTORY to a file path to also append them to a JSONL file that is
+# reloaded on startup.
+
+import json
+import os
+import threading
+from collections import deque
+
+# Records kept in memory (oldest are dropped first)
+MAX_RECORDS = 2000
+
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+_history_path = os.environ.get("AFA_RUN_HISTORY")
+
+
+def _load_history():
+    """Reload persisted records from AFA_RUN_HISTORY, if configured"""
+    if not _history_path or not os.path.exists(_history_path):
+        return
+    with open(_history_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                _records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+
+_load_history()
+
+
+def record_run(record):
+    """
+    Add a completed run to the history
+
+    Args:
+        record: dict with at least "model" and "latency_s"; usually also
+            "framework", "text_length", "prompt_chars", "prompt_tokens" and
+            "response_tokens"
+    """
+    with _lock:
+        _records.append(record)
+        if _history_path:
+            try:
+                with open(_history_path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError:
+                # Persistence is best effort; the in-memory history still works
+                pass
+
+
+def get_runs(model=None, framework=None, limit=None):
+    """
+    Return recorded runs, newest last, optionally filtered
+
+    Args:
+        model: Only runs on this model
+        framework: Only runs of this framework
+        limit: Only the most recent N matching runs
+
+    Returns:
+        list: Matching run records
+    """
+    with _lock:
+        runs = [
+            run for run in _records
+            if (model is None or run.get("model") == model)
+            and (framework is None or run.get("framework") == framework)
+        ]
+    return runs[-limit:] if limit else runs
+
+
+def clear_history():
+    """Forget all in-memory records (the JSONL file is left untouched)"""
+    with _lock:
+        _records.clear()
+
+
+def percentile(values, fraction):
+    """
+    Linear-interpolated percentile of a list of numbers
+
+    Args:
+        values: Numbers (need not be sorted)
+        fraction: Percentile as a fraction, e.g. 0.95
+
+    Returns:
+        float: The percentile, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
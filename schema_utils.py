@@ -0,0 +1,469 @@
+# schema_utils.py
+# Compiles the framework JSON schemas into fast response validators
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from framework_data import FRAMEWORK_EXAMPLES
+
+# =============================================================================
+# TYPE CHECKS
+# =============================================================================
+
+# One precomputed check per JSON schema type. bool is a subclass of int in
+# Python, so the numeric checks exclude it explicitly.
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+}
+
+# Upper bound on errors stored in result metadata
+MAX_REPORTED_ERRORS = 20
+
+# =============================================================================
+# SCHEMA COMPILATION
+# =============================================================================
+
+def compile_schema(schema):
+    """
+    Compile a JSON schema into flat validation tables
+
+    The schema is walked once here. Validation afterwards only runs through
+    the precomputed tables, one per object path, in parent-before-child order.
+    Array elements are addressed with a "*" path segment.
+
+    Args:
+        schema: JSON schema dictionary (the same format sent to Gemini)
+
+    Returns:
+        dict: Compiled validator with "tables", "root_type" and "item_validators"
+    """
+
+    tables = []
+    item_validators = {}
+
+    def add_object(path, object_schema):
+        fields = []
+        required = set(object_schema.get("required", []))
+        child_objects = []
+
+        for key, field_schema in object_schema.get("properties", {}).items():
+            field_type = field_schema.get("type", "string")
+            field_path = path + (key,)
+            item_schema = field_schema.get("items", {}) if field_type == "array" else {}
+            item_type = item_schema.get("type") if item_schema else None
+
+            fields.append((
+                key,
+                _TYPE_CHECKS.get(field_type, _TYPE_CHECKS["string"]),
+                field_type,
+                key in required,
+                _TYPE_CHECKS.get(item_type) if item_type not in (None, "object") else None,
+                item_type,
+                field_path,
+                field_type == "object" or item_type == "object",
+            ))
+
+            if field_type == "object":
+                child_objects.append((field_path, field_schema))
+            elif item_type == "object":
+                item_path = field_path + ("*",)
+                child_objects.append((item_path, item_schema))
+                item_validators[_format_path(field_path)] = compile_schema(item_schema)
+
+        tables.append((path, tuple(fields)))
+        for child_path, child_schema in child_objects:
+            add_object(child_path, child_schema)
+
+    root_type = schema.get("type", "object")
+    if root_type == "object":
+        add_object((), schema)
+
+    return {
+        "tables": tuple(tables),
+        "root_type": root_type,
+        "item_validators": item_validators,
+    }
+
+
+def _format_path(path):
+    """Render a path tuple as a readable string such as frames[2].functions"""
+    rendered = ""
+    for segment in path:
+        if segment == "*":
+            rendered += "[*]"
+        elif rendered:
+            rendered += "." + segment
+        else:
+            rendered = segment
+    return rendered
+
+
+# Schemas derived per distinct schema are cached by content, so an edited
+# custom schema gets fresh tables and an unchanged one reuses them. Each cache
+# keeps only the SCHEMA_CACHE_SIZE most recently used schemas.
+SCHEMA_CACHE_SIZE = 32
+
+_cache_lock = threading.Lock()
+
+
+def _cached(cache, schema, build):
+    """
+    Look up a schema's derived form in an LRU cache, building it on a miss
+
+    Args:
+        cache: OrderedDict of canonical schema JSON -> derived form
+        schema: JSON schema dictionary
+        build: Callable deriving the form from the schema
+
+    Returns:
+        The cached or freshly built form
+    """
+    key = json.dumps(schema, sort_keys=True)
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    value = build(schema)
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > SCHEMA_CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+
+_COMPILED_CACHE = OrderedDict()
+
+
+def get_compiled_schema(schema):
+    """
+    Return the compiled validator for a schema, compiling it on first use
+
+    Args:
+        schema: JSON schema dictionary
+
+    Returns:
+        dict: Compiled validator from compile_schema()
+    """
+    return _cached(_COMPILED_CACHE, schema, compile_schema)
+
+
+# Compile the built-in framework schemas once at startup
+COMPILED_FRAMEWORK_SCHEMAS = {
+    name: get_compiled_schema(framework["schema"])
+    for name, framework in FRAMEWORK_EXAMPLES.items()
+}
+
+# =============================================================================
+# VALIDATION
+# =============================================================================
+
+def validate_analysis(analysis, compiled):
+    """
+    Validate a parsed analysis against a compiled schema
+
+    Args:
+        analysis: Parsed JSON response (usually a dict)
+        compiled: Compiled validator from compile_schema()
+
+    Returns:
+        dict: Validation summary with "valid", "error_count", "errors" and "elapsed_ms"
+    """
+    started = time.perf_counter()
+    errors = []
+
+    if not _TYPE_CHECKS.get(compiled["root_type"], _TYPE_CHECKS["object"])(analysis):
+        errors.append({"path": "$", "error": f"expected {compiled['root_type']}"})
+    else:
+        # Concrete instances found so far for each object path
+        instances = {(): [("", analysis)]}
+
+        for path, fields in compiled["tables"]:
+            for prefix, obj in instances.get(path, ()):
+                _check_object(obj, prefix, fields, instances, errors)
+
+    return {
+        "valid": not errors,
+        "error_count": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def validate_item(compiled, array_path, item):
+    """
+    Validate a single array element, e.g. one streamed metaphorAudit entry
+
+    Args:
+        compiled: Compiled validator of the full schema
+        array_path: Path of the array, e.g. "metaphorAudit" or "frames"
+        item: The element to validate
+
+    Returns:
+        dict: Validation summary (same shape as validate_analysis)
+    """
+    item_validator = compiled["item_validators"].get(array_path)
+    if item_validator is None:
+        return {
+            "valid": False,
+            "error_count": 1,
+            "errors": [{"path": array_path, "error": "no item schema for this path"}],
+            "elapsed_ms": 0.0,
+        }
+    return validate_analysis(item, item_validator)
+
+
+def _check_object(obj, prefix, fields, instances, errors):
+    """Run one compiled table against one concrete object"""
+    for key, check, type_name, required, item_check, item_type, field_path, has_children in fields:
+        location = f"{prefix}.{key}" if prefix else key
+
+        if key not in obj:
+            if required:
+                errors.append({"path": location, "error": "missing required field"})
+            continue
+
+        value = obj[key]
+        if not check(value):
+            errors.append({"path": location, "error": f"expected {type_name}, got {type(value).__name__}"})
+            continue
+
+        if type_name == "array":
+            if item_check is not None:
+                for index, element in enumerate(value):
+                    if not item_check(element):
+                        errors.append({
+                            "path": f"{location}[{index}]",
+                            "error": f"expected {item_type}, got {type(element).__name__}"
+                        })
+            elif has_children:
+                bucket = instances.setdefault(field_path + ("*",), [])
+                for index, element in enumerate(value):
+                    if isinstance(element, dict):
+                        bucket.append((f"{location}[{index}]", element))
+                    else:
+                        errors.append({
+                            "path": f"{location}[{index}]",
+                            "error": f"expected object, got {type(element).__name__}"
+                        })
+        elif has_children:
+            instances.setdefault(field_path, []).append((location, value))
+
+# =============================================================================
+# COMPACT WIRE SCHEMAS
+# =============================================================================
+
+# Appended to the framework prompt when compact output is requested
+COMPACT_OUTPUT_INSTRUCTION = """
+
+**Output keys:** Respond using the short keys defined in the response schema. Each key's description gives the full field name it stands for; follow the framework instructions for that field."""
+
+
+def _short_key(name, taken):
+    """Derive a short alias from a field name, unique among its siblings"""
+    words = [word for word in re.split(r"_|(?<=[a-z])(?=[A-Z])", name) if word]
+    candidate = "".join(word[0] for word in words).lower() or name[:1]
+
+    # Lengthen with the remaining letters of the last word, then number it
+    tail = words[-1][1:].lower() if words else ""
+    for letter in tail:
+        if candidate not in taken:
+            break
+        candidate += letter
+
+    base, counter = candidate, 2
+    while candidate in taken:
+        candidate = f"{base}{counter}"
+        counter += 1
+    return candidate
+
+
+def build_compact_schema(schema):
+    """
+    Derive a short-key variant of a schema and the table to expand it again
+
+    Every property is renamed to a short alias (effectiveness_assessment -> ea,
+    metaphorDrivenTrust -> mdt) and keeps its canonical name as description so
+    the model still knows what to put there.
+
+    Args:
+        schema: JSON schema dictionary with canonical keys
+
+    Returns:
+        tuple: (compact_schema, expansion) where expansion maps each alias to
+               (canonical_name, child_expansion)
+    """
+    schema_type = schema.get("type")
+
+    if schema_type == "array":
+        item_schema, expansion = build_compact_schema(schema.get("items", {}))
+        compact = {key: value for key, value in schema.items() if key != "items"}
+        compact["items"] = item_schema
+        return compact, expansion
+
+    if schema_type != "object":
+        return dict(schema), None
+
+    properties = {}
+    expansion = {}
+    aliases = {}
+    for name, field_schema in schema.get("properties", {}).items():
+        alias = _short_key(name, aliases.values())
+        aliases[name] = alias
+        field_compact, field_expansion = build_compact_schema(field_schema)
+        field_compact["description"] = name
+        properties[alias] = field_compact
+        expansion[alias] = (name, field_expansion)
+
+    compact = {key: value for key, value in schema.items() if key not in ("properties", "required")}
+    compact["properties"] = properties
+    if "required" in schema:
+        compact["required"] = [aliases[name] for name in schema["required"] if name in aliases]
+    return compact, expansion
+
+
+def expand_compact_keys(data, expansion):
+    """
+    Rename compact aliases in a parsed response back to canonical keys
+
+    Args:
+        data: Parsed JSON response produced against a compact schema
+        expansion: Expansion table from build_compact_schema()
+
+    Returns:
+        Data with canonical keys; unknown keys are kept as they are
+    """
+    if not expansion:
+        return data
+
+    if isinstance(data, list):
+        return [expand_compact_keys(element, expansion) for element in data]
+
+    if isinstance(data, dict):
+        expanded = {}
+        for key, value in data.items():
+            canonical, child_expansion = expansion.get(key, (key, None))
+            expanded[canonical] = expand_compact_keys(value, child_expansion)
+        return expanded
+
+    return data
+
+
+_COMPACT_CACHE = OrderedDict()
+
+
+def get_compact_schema(schema):
+    """
+    Return (compact_schema, expansion) for a schema, building it on first use
+
+    Args:
+        schema: JSON schema dictionary with canonical keys
+
+    Returns:
+        tuple: Result of build_compact_schema()
+    """
+    return _cached(_COMPACT_CACHE, schema, build_compact_schema)
+
+
+# Derive the compact variants of the built-in schemas once at startup
+COMPACT_FRAMEWORK_SCHEMAS = {
+    name: get_compact_schema(framework["schema"])
+    for name, framework in FRAMEWORK_EXAMPLES.items()
+}
+
+# =============================================================================
+# SCHEMA PROFILES (FULL / LITE)
+# =============================================================================
+
+SCHEMA_PROFILES = ["Full", "Lite"]
+
+# Maximum number of elements per array in the Lite profile
+LITE_MAX_ITEMS = 3
+
+# Appended to the framework prompt when the Lite profile is selected
+LITE_OUTPUT_INSTRUCTION = """
+
+**Quick pass:** This is a fast formative reading. Fill in only the fields in the response schema, keep each field to one or two sentences, and report at most {max_items} of the clearest examples per list."""
+
+
+def build_lite_schema(schema, max_items=LITE_MAX_ITEMS):
+    """
+    Derive a Lite profile of a schema: required properties only, capped arrays
+
+    Objects that are left with no properties are dropped entirely (and removed
+    from their parent's required list), since Gemini rejects empty objects.
+
+    Args:
+        schema: JSON schema dictionary
+        max_items: Maximum length for every array
+
+    Returns:
+        dict: Lite JSON schema, or None if nothing required is left
+    """
+    schema_type = schema.get("type")
+
+    if schema_type == "array":
+        item_schema = build_lite_schema(schema.get("items", {}), max_items)
+        if item_schema is None:
+            return None
+        lite = {key: value for key, value in schema.items() if key != "items"}
+        lite["items"] = item_schema
+        lite["max_items"] = max_items
+        return lite
+
+    if schema_type != "object":
+        return dict(schema)
+
+    required = schema.get("required", [])
+    properties = {}
+    for name, field_schema in schema.get("properties", {}).items():
+        if name not in required:
+            continue
+        field_lite = build_lite_schema(field_schema, max_items)
+        if field_lite is not None:
+            properties[name] = field_lite
+
+    if not properties:
+        return None
+
+    lite = {key: value for key, value in schema.items() if key not in ("properties", "required")}
+    lite["properties"] = properties
+    lite["required"] = [name for name in required if name in properties]
+    return lite
+
+
+_LITE_CACHE = OrderedDict()
+
+
+def get_schema_profile(schema, profile="Full"):
+    """
+    Return the schema and extra prompt instruction for a profile
+
+    Args:
+        schema: Full JSON schema dictionary (or None for freeform frameworks)
+        profile: "Full" or "Lite"
+
+    Returns:
+        tuple: (schema_to_send, prompt_suffix)
+    """
+    if not schema or profile != "Lite":
+        return schema, ""
+
+    lite = _cached(_LITE_CACHE, schema, lambda full: build_lite_schema(full) or full)
+    return lite, LITE_OUTPUT_INSTRUCTION.format(max_items=LITE_MAX_ITEMS)
+
+
+# Derive the Lite profiles of the built-in schemas once at startup
+LITE_FRAMEWORK_SCHEMAS = {
+    name: get_schema_profile(framework["schema"], "Lite")[0]
+    for name, framework in FRAMEWORK_EXAMPLES.items()
+}
@@ -0,0 +1,25 @@
+# conftest.py
+# Shared test setup: repository modules on the path and an offline backend
+#
+# The app's modules live at the repository root, so it is put on sys.path
+# for plain `pytest` runs too. Every test gets a FakeGeminiBackend without
+# simulated delays; nothing here calls the Gemini API.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeGeminiBackend, get_backend, set_backend  # noqa: E402
+
+
+@pytest.fixture
+def fake_backend():
+    """Install an instant FakeGeminiBackend for one test, restoring the previous backend after"""
+    previous = get_backend()
+    backend = FakeGeminiBackend(seed=1, time_scale=0)
+    set_backend(backend)
+    yield backend
+    set_backend(previous)
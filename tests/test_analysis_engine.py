@@ -0,0 +1,163 @@
+# test_analysis_engine.py
+# Regression tests for run_analysis: repeated samples and the fallback cascade
+
+from google.api_core import exceptions as google_exceptions
+
+from analysis_engine import run_analysis
+from backends import FakeGeminiBackend, set_backend
+from framework_data import FRAMEWORK_EXAMPLES
+from resilience import FALLBACK_CASCADE, FallbackExhausted, run_with_fallback
+
+FRAMEWORK = "Political Framing Analysis"
+
+
+def analyze(**kwargs):
+    framework = FRAMEWORK_EXAMPLES[FRAMEWORK]
+    events = []
+    result = run_analysis(
+        framework["example_text"],
+        framework["prompt"],
+        analysis_schema=framework["schema"],
+        framework_name=FRAMEWORK,
+        on_event=events.append,
+        **kwargs
+    )
+    return result, events
+
+
+class FailingModelsBackend(FakeGeminiBackend):
+    """Fake backend whose listed models always answer 503"""
+
+    def __init__(self, failing, **kwargs):
+        super().__init__(**kwargs)
+        self.failing = set(failing)
+        self.requested = []
+
+    def create_model(self, model_name, generation_config=None, system_instruction=None):
+        model = super().create_model(model_name, generation_config, system_instruction)
+        backend = self
+        generate_content = model.generate_content
+
+        def failing_generate_content(contents, **kwargs):
+            backend.requested.append(model_name)
+            if model_name in backend.failing:
+                raise google_exceptions.ServiceUnavailable("503 The model is overloaded.")
+            return generate_content(contents, **kwargs)
+
+        model.generate_content = failing_generate_content
+        return model
+
+class SingleCandidateBackend(FakeGeminiBackend):
+    """Fake backend whose models reject candidate_count > 1, as some Gemini models do"""
+
+    def create_model(self, model_name, generation_config=None, system_instruction=None):
+        if (generation_config or {}).get("candidate_count", 1) > 1:
+            model = super().create_model(model_name, generation_config, system_instruction)
+
+            def reject(contents, **kwargs):
+                raise google_exceptions.InvalidArgument("Multiple candidates is not enabled for this model")
+
+            model.generate_content = reject
+            return model
+        return super().create_model(model_name, generation_config, system_instruction)
+
+# =============================================================================
+# SAMPLES
+# =============================================================================
+
+def test_samples_are_returned_as_candidates(fake_backend):
+    result, events = analyze(samples=3)
+
+    assert len(result["samples"]) == 3
+    assert all(sample["use_json"] for sample in result["samples"])
+    sampling = result["metadata"]["sampling"]
+    assert (sampling["method"], sampling["requests"], sampling["received"]) == ("candidate_count", 1, 3)
+    assert result["metadata"]["reliability"]["samples"] == 3
+
+
+def test_samples_fall_back_to_parallel_requests():
+    backend = SingleCandidateBackend(time_scale=0)
+    set_backend(backend)
+    try:
+        result, _events = analyze(samples=3)
+    finally:
+        set_backend(FakeGeminiBackend(time_scale=0))
+
+    assert len(result["samples"]) == 3
+    assert result["metadata"]["sampling"]["method"] == "parallel"
+
+
+def test_sample_chunks_carry_their_candidate(fake_backend):
+    _result, events = analyze(samples=3)
+
+    chunks = [event for event in events if event["type"] == "chunk"]
+    assert {event["candidate"] for event in chunks} == {0, 1, 2}
+    # received_chars counts each candidate's own text
+    for candidate in range(3):
+        counts = [event["received_chars"] for event in chunks if event["candidate"] == candidate]
+        assert counts == sorted(counts)
+
+
+def test_single_sample_has_no_samples_list(fake_backend):
+    result, _events = analyze()
+
+    assert "samples" not in result
+    assert result["analysis"]
+
+# =============================================================================
+# FALLBACK CASCADE
+# =============================================================================
+
+def test_falls_back_to_the_next_model():
+    backend = FailingModelsBackend({"gemini-2.5-pro"}, time_scale=0)
+    set_backend(backend)
+    try:
+        result, _events = analyze(model_name="gemini-2.5-pro", fallback_models=FALLBACK_CASCADE)
+    finally:
+        set_backend(FakeGeminiBackend(time_scale=0))
+
+    assert result["model"] == "gemini-2.5-flash"
+    fallback = result["metadata"]["fallback"]
+    assert fallback["fell_back"]
+    assert [attempt["model"] for attempt in fallback["attempts"]] == ["gemini-2.5-pro"]
+    assert fallback["attempts"][0]["reason"] == "overload"
+
+
+def test_failure_when_every_model_fails():
+    backend = FailingModelsBackend(FALLBACK_CASCADE, time_scale=0)
+    set_backend(backend)
+    try:
+        result, events = analyze(model_name="gemini-2.5-pro", fallback_models=FALLBACK_CASCADE)
+    finally:
+        set_backend(FakeGeminiBackend(time_scale=0))
+
+    assert result is None
+    assert any(event["type"] == "failed" for event in events)
+    assert set(backend.requested) == set(FALLBACK_CASCADE)
+
+
+def test_cascade_stops_on_errors_a_fallback_cannot_fix():
+    tried = []
+
+    def attempt(model_name):
+        tried.append(model_name)
+        raise google_exceptions.PermissionDenied("API key not valid")
+
+    try:
+        run_with_fallback(attempt, FALLBACK_CASCADE)
+    except google_exceptions.PermissionDenied:
+        pass
+    assert tried == FALLBACK_CASCADE[:1]
+
+
+def test_cascade_reports_every_attempt():
+    def attempt(model_name):
+        raise google_exceptions.ResourceExhausted("429 quota")
+
+    try:
+        run_with_fallback(attempt, FALLBACK_CASCADE)
+    except FallbackExhausted as e:
+        assert [entry["model"] for entry in e.attempts] == FALLBACK_CASCADE
+        assert {entry["reason"] for entry in e.attempts} == {"quota"}
+    else:
+        raise AssertionError("FallbackExhausted not raised")
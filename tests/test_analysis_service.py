@@ -0,0 +1,92 @@
+# test_analysis_service.py
+# Regression tests for the service's streamed item parsing and job settings
+
+import json
+import random
+
+import pytest
+
+from analysis_service import PartialItems, parse_job_request
+from backends import FakeGeminiBackend
+from framework_data import FRAMEWORK_EXAMPLES
+
+
+def expected_items(analysis):
+    """(section, index, item) for every object in a top-level or one-object-down array"""
+    items = []
+
+    def collect(section, value):
+        if isinstance(value, list):
+            items.extend((section, index, item) for index, item in enumerate(value) if isinstance(item, dict))
+
+    for key, value in analysis.items():
+        collect(key, value)
+        if isinstance(value, dict):
+            for child_key, child_value in value.items():
+                collect(f"{key}.{child_key}", child_value)
+    return items
+
+
+def fake_response(schema):
+    framework = next(example for example in FRAMEWORK_EXAMPLES.values() if example["schema"] is schema)
+    return FakeGeminiBackend().fake_output(schema, framework["example_text"], random.Random(3))
+
+# =============================================================================
+# PARTIAL ITEMS
+# =============================================================================
+
+@pytest.mark.parametrize("framework", list(FRAMEWORK_EXAMPLES))
+@pytest.mark.parametrize("chunk_chars", [1, 7, 400])
+def test_items_of_every_framework_schema(framework, chunk_chars):
+    text = fake_response(FRAMEWORK_EXAMPLES[framework]["schema"])
+    parser = PartialItems()
+
+    found = []
+    for start in range(0, len(text), chunk_chars):
+        found.extend(parser.feed(text[start:start + chunk_chars]))
+
+    expected = expected_items(json.loads(text))
+    assert expected
+    assert sorted(found, key=repr) == sorted(expected, key=repr)
+
+
+def test_rhetorical_items_are_named_by_their_path():
+    text = fake_response(FRAMEWORK_EXAMPLES["Aristotelian Rhetorical Analysis"]["schema"])
+
+    sections = {section for section, _index, _item in PartialItems().feed(text)}
+
+    assert {"ethos_analysis.examples", "pathos_analysis.examples", "logos_analysis.examples"} <= sections
+
+
+def test_arrays_inside_items_are_not_items():
+    text = json.dumps({"frames": [{"frame_label": "a", "details": [{"x": 1}]}], "summary": {"a": {"b": [{"y": 2}]}}})
+
+    found = PartialItems().feed(text)
+
+    assert found == [("frames", 0, {"frame_label": "a", "details": [{"x": 1}]})]
+
+
+def test_braces_inside_strings_are_ignored():
+    text = json.dumps({"frames": [{"quote": "a } tricky ] \\\" {quote"}, {"quote": "b"}]})
+
+    found = PartialItems().feed(text)
+
+    assert [item["quote"] for _section, _index, item in found] == ["a } tricky ] \\\" {quote", "b"]
+
+
+def test_top_level_array_items():
+    found = PartialItems().feed(json.dumps([{"a": 1}, {"a": 2}]))
+
+    assert found == [(None, 0, {"a": 1}), (None, 1, {"a": 2})]
+
+# =============================================================================
+# JOB SETTINGS
+# =============================================================================
+
+def test_samples_must_be_a_count():
+    body = {"text": "Some text.", "framework": "Political Framing Analysis"}
+
+    assert parse_job_request({**body, "samples": 2})["samples"] == 2
+    for samples in (True, 0, "2", 1.5):
+        with pytest.raises(ValueError):
+            parse_job_request({**body, "samples": samples})
@@ -0,0 +1,88 @@
+# test_usage_ledger.py
+# Regression tests for the SQLite usage ledger: writes, summaries and quotas
+
+import pytest
+
+import usage_ledger
+from analysis_engine import run_analysis
+from framework_data import FRAMEWORK_EXAMPLES
+from usage_ledger import hash_api_key, quota_projection, record_usage, usage_summary
+
+METADATA = {"prompt_tokens": 1000, "response_tokens": 400, "thoughts_tokens": 100, "total_tokens": 1500}
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / "usage_ledger.db")
+
+
+def test_round_trip(ledger_path):
+    key = hash_api_key("test-key")
+    record_usage(key, "session-1", "HIST 101", "Political Framing Analysis", "gemini-2.5-flash", METADATA,
+                 path=ledger_path)
+    record_usage(key, "session-1", "", None, "gemini-2.5-pro", METADATA, path=ledger_path)
+    record_usage(hash_api_key("other-key"), None, "HIST 101", None, "gemini-2.5-flash", METADATA, path=ledger_path)
+
+    by_class = {row["class_label"]: row for row in usage_summary("class_label", key_hash=key, path=ledger_path)}
+    assert by_class["HIST 101"]["requests"] == 1
+    assert by_class[usage_ledger.NO_CLASS]["requests"] == 1
+    assert by_class["HIST 101"]["total_tokens"] == 1500
+
+    by_framework = {row["framework"]: row["requests"] for row in usage_summary("framework", path=ledger_path)}
+    assert by_framework == {"Political Framing Analysis": 1, "Custom": 2}
+
+    by_day = usage_summary("day", path=ledger_path)
+    assert len(by_day) == 1 and by_day[0]["requests"] == 3
+
+
+def test_cost_uses_the_output_rate_for_thinking(ledger_path):
+    cost = record_usage("k", None, "", None, "gemini-2.5-flash", METADATA, path=ledger_path)
+
+    assert cost == pytest.approx((1000 * 0.30 + 500 * 2.50) / 1e6)
+    assert usage_summary("model", path=ledger_path)[0]["cost_usd"] == round(cost, 4)
+
+
+def test_quota_projection(ledger_path):
+    key = hash_api_key("test-key")
+    cost = record_usage(key, None, "", None, "gemini-2.5-flash", METADATA, path=ledger_path)
+
+    projection = quota_projection(key, daily_token_quota=10000, monthly_budget_usd=5.0, path=ledger_path)
+
+    assert projection["tokens_today"] == 1500
+    assert projection["tokens_remaining_today"] == 8500
+    assert projection["cost_this_month"] == round(cost, 4)
+    assert projection["budget_remaining_usd"] == round(5.0 - cost, 4)
+    assert quota_projection(hash_api_key("other-key"), path=ledger_path)["tokens_today"] == 0
+
+
+def test_disabled_ledger_records_nothing(monkeypatch, tmp_path):
+    monkeypatch.setattr(usage_ledger, "LEDGER_PATH", "")
+
+    assert record_usage("k", None, "", None, "gemini-2.5-flash", METADATA) is not None
+    assert usage_summary("day") == []
+    assert not list(tmp_path.iterdir())
+
+
+def test_unreadable_ledger_is_best_effort(tmp_path):
+    path = str(tmp_path / "missing" / "usage_ledger.db")
+
+    record_usage("k", None, "", None, "gemini-2.5-flash", METADATA, path=path)
+    assert usage_summary("day", path=path) == []
+
+
+def test_analysis_is_recorded(fake_backend, monkeypatch, ledger_path):
+    monkeypatch.setattr(usage_ledger, "LEDGER_PATH", ledger_path)
+    framework = FRAMEWORK_EXAMPLES["Political Framing Analysis"]
+    key = hash_api_key("test-key")
+
+    result = run_analysis(
+        framework["example_text"],
+        framework["prompt"],
+        analysis_schema=framework["schema"],
+        framework_name="Political Framing Analysis",
+        usage_context={"key_hash": key, "session_id": "session-1", "class_label": "HIST 101"}
+    )
+
+    rows = usage_summary("framework", key_hash=key)
+    assert [row["framework"] for row in rows] == ["Political Framing Analysis"]
+    assert rows[0]["total_tokens"] == result["metadata"]["total_tokens"]
@@ -0,0 +1,65 @@
+# timings.py
+# Lightweight stage timing spans for analysis runs
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Timings:
+    """
+    Stage timings of one analysis run
+
+    Spans may be recorded from any thread (hedged requests run in their own).
+    The optional on_span callback is called with ("start" or "end", name) for
+    spans opened on the thread that created the object, so a Streamlit script
+    can update its progress bar without touching the UI from worker threads.
+    """
+
+    def __init__(self, on_span=None):
+        self.started = time.perf_counter()
+        self.on_span = on_span
+        self.spans = []
+        self._lock = threading.Lock()
+        self._owner = threading.get_ident()
+
+    def _notify(self, event, name):
+        if self.on_span and threading.get_ident() == self._owner:
+            self.on_span(event, name)
+
+    def record(self, name, started, ended=None, **attributes):
+        """
+        Add a span measured by the caller
+
+        Args:
+            name: Stage name
+            started: time.perf_counter() value at the start
+            ended: time.perf_counter() value at the end (defaults to now)
+            **attributes: Extra fields, e.g. model="gemini-2.5-flash"
+        """
+        if ended is None:
+            ended = time.perf_counter()
+        span = {
+            "name": name,
+            "start_s": round(started - self.started, 3),
+            "duration_s": round(ended - started, 3),
+            **attributes
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as one span (recorded even if it raises)"""
+        self._notify("start", name)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, **attributes)
+            self._notify("end", name)
+
+    def to_list(self):
+        """Spans in start order, for result["metadata"]["timings"]["spans"]"""
+        with self._lock:
+            return sorted(self.spans, key=lambda span: span["start_s"])
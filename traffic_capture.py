@@ -0,0 +1,127 @@
+# traffic_capture.py
+# Opt-in recorder of analysis requests for load-test replay
+#
+# Set AFA_CAPTURE_PATH to a file path to append one JSON line per analysis
+# run (ok or failed). Texts are never stored, only their SHA-256 hash and
+# length. Files rotate at AFA_CAPTURE_MAX_BYTES (default 10 MB), keeping
+# AFA_CAPTURE_BACKUPS old files (path.1 is the most recent).
+# benchmarks/replay_traffic.py re-issues a captured workload.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+CAPTURE_PATH = os.environ.get("AFA_CAPTURE_PATH")
+CAPTURE_MAX_BYTES = int(os.environ.get("AFA_CAPTURE_MAX_BYTES", str(10 * 1024 * 1024)))
+CAPTURE_BACKUPS = int(os.environ.get("AFA_CAPTURE_BACKUPS", "5"))
+
+# Version of the record layout, for the replay tool
+CAPTURE_FORMAT = 1
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def _capture_logger():
+    """Logger writing bare JSON lines to the rotating capture file"""
+    global _logger
+    # Worker threads may log their first run at the same time
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("afa.traffic_capture")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                handler = RotatingFileHandler(
+                    CAPTURE_PATH, maxBytes=CAPTURE_MAX_BYTES, backupCount=CAPTURE_BACKUPS, encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            _logger = logger
+    return _logger
+
+
+def capture_enabled():
+    """True when AFA_CAPTURE_PATH is set"""
+    return bool(CAPTURE_PATH)
+
+
+def capture_request(text, framework, model, outcome, config, metadata=None, error_reason=None):
+    """
+    Append one analysis run to the capture log (no-op unless enabled)
+
+    Args:
+        text: Analyzed text (only its hash and length are kept)
+        framework: Framework name
+        model: Model that answered, or was asked for a failed run
+        outcome: "ok" or "error"
+        config: Request settings needed to replay the run (generation config,
+            schema profile, compact output, thinking, samples, hedging,
+            fallbacks, deadline, requested model)
+        metadata: result["metadata"] of a successful run
+        error_reason: Short reason for a failed run
+    """
+    if not capture_enabled():
+        return
+
+    metadata = metadata or {}
+    record = {
+        "format": CAPTURE_FORMAT,
+        "timestamp": time.time(),
+        "framework": framework,
+        "text_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "text_length": len(text),
+        "model": model,
+        "config": config,
+        "outcome": outcome,
+        "error_reason": error_reason,
+        "timings": {
+            "latency_s": metadata.get("latency_s"),
+            "ttft_s": metadata.get("ttft_s"),
+            "spans": (metadata.get("timings") or {}).get("spans", []),
+        },
+        "usage": {
+            "prompt_tokens": metadata.get("prompt_tokens"),
+            "response_tokens": metadata.get("response_tokens"),
+            "thoughts_tokens": metadata.get("thoughts_tokens"),
+            "total_tokens": metadata.get("total_tokens"),
+        },
+    }
+    try:
+        _capture_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+    except OSError:
+        # Capture is best effort; never fail an analysis over it
+        pass
+
+
+def load_capture(path):
+    """
+    Read a capture log and its rotated backups, oldest first
+
+    Args:
+        path: The AFA_CAPTURE_PATH used while recording
+
+    Returns:
+        list: Records sorted by timestamp
+    """
+    files = [path]
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+
+    records = []
+    for file_path in reversed(files):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return sorted(records, key=lambda record: record.get("timestamp", 0))
@@ -0,0 +1,272 @@
+# usage_ledger.py
+# Persistent token and cost ledger shared by all sessions (SQLite)
+#
+# Every successful analysis appends one row: who ran it (API key hash,
+# session, class label), what (framework, model) and its token usage, priced
+# with the per-model rates in model_router.MODEL_PROFILES. API keys are never
+# stored, only a salted SHA-256 prefix. The ledger is off unless
+# AFA_LEDGER_PATH names its file (e.g. /var/lib/afa/usage_ledger.db).
+# Writes and reads are best effort: a missing or read-only ledger never
+# stops an analysis or a page from rendering. AFA_DAILY_TOKEN_QUOTA and
+# AFA_MONTHLY_BUDGET_USD set the default limits used for quota projections.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from model_router import estimate_cost
+
+LEDGER_PATH = os.environ.get("AFA_LEDGER_PATH", "")
+
+DAILY_TOKEN_QUOTA = int(os.environ["AFA_DAILY_TOKEN_QUOTA"]) if os.environ.get("AFA_DAILY_TOKEN_QUOTA") else None
+MONTHLY_BUDGET_USD = float(os.environ["AFA_MONTHLY_BUDGET_USD"]) if os.environ.get("AFA_MONTHLY_BUDGET_USD") else None
+
+# Columns usage can be grouped by, with the label used in views
+GROUPINGS = {
+    "day": "Day",
+    "class_label": "Class",
+    "framework": "Framework",
+    "model": "Model",
+    "key_hash": "API Key",
+    "session_id": "Session",
+}
+
+# Label for runs without a class
+NO_CLASS = "(no class)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    key_hash TEXT NOT NULL,
+    session_id TEXT,
+    class_label TEXT NOT NULL,
+    framework TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    response_tokens INTEGER NOT NULL,
+    thoughts_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    cost_usd REAL
+);
+CREATE INDEX IF NOT EXISTS usage_key_day ON usage (key_hash, day);
+CREATE INDEX IF NOT EXISTS usage_day ON usage (day);
+"""
+
+_lock = threading.Lock()
+_initialized = set()
+
+
+def ledger_enabled():
+    """True when AFA_LEDGER_PATH names a ledger file"""
+    return bool(LEDGER_PATH)
+
+
+def _connect(path=None):
+    """Open the ledger, creating its table on first use"""
+    path = path or LEDGER_PATH
+    connection = sqlite3.connect(path, timeout=10)
+    connection.row_factory = sqlite3.Row
+    if path not in _initialized:
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+        except sqlite3.Error:
+            connection.close()
+            raise
+        _initialized.add(path)
+    return connection
+
+
+def hash_api_key(api_key):
+    """Stable, non-reversible identifier of an API key (16 hex characters)"""
+    return hashlib.sha256(f"afa-ledger:{api_key}".encode("utf-8")).hexdigest()[:16]
+
+
+def record_usage(key_hash, session_id, class_label, framework, model, metadata, path=None):
+    """
+    Append one analysis run to the ledger
+
+    Thinking tokens are billed at the output rate, as Gemini does.
+
+    Args:
+        key_hash: hash_api_key() of the key that paid for the run
+        session_id: Streamlit session id (None outside the app)
+        class_label: Class or section the run belongs to ("" for none)
+        framework: Framework name (None for custom frameworks)
+        model: Model that answered
+        metadata: result["metadata"] with prompt/response/thoughts/total tokens
+        path: Ledger file (defaults to AFA_LEDGER_PATH)
+
+    Returns:
+        float: Cost in USD (None for models without a price)
+    """
+    prompt = metadata.get("prompt_tokens") or 0
+    response = metadata.get("response_tokens") or 0
+    thoughts = metadata.get("thoughts_tokens") or 0
+    total = metadata.get("total_tokens") or prompt + response + thoughts
+    cost = estimate_cost(model, prompt, response + thoughts)
+    if not ledger_enabled() and path is None:
+        return cost
+
+    now = time.time()
+    row = (
+        now, datetime.fromtimestamp(now).strftime("%Y-%m-%d"), key_hash, session_id,
+        class_label.strip() if class_label and class_label.strip() else NO_CLASS,
+        framework or "Custom", model, prompt, response, thoughts, total, cost
+    )
+    try:
+        with _lock:
+            connection = _connect(path)
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT INTO usage (timestamp, day, key_hash, session_id, class_label, framework, model, "
+                        "prompt_tokens, response_tokens, thoughts_tokens, total_tokens, cost_usd) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        row
+                    )
+            finally:
+                connection.close()
+    except sqlite3.Error:
+        # Bookkeeping is best effort; never fail an analysis over it
+        pass
+    return cost
+
+
+def usage_summary(group_by="day", days=30, key_hash=None, path=None):
+    """
+    Usage aggregated by one column
+
+    Args:
+        group_by: A key of GROUPINGS
+        days: Look back this many days, including today
+        key_hash: Only count runs paid with this key
+        path: Ledger file (defaults to AFA_LEDGER_PATH)
+
+    Returns:
+        list: Dicts with the group value, requests, token sums and cost_usd,
+        most expensive first (by day: newest first); empty if the ledger
+        can't be read
+    """
+    if group_by not in GROUPINGS:
+        raise ValueError(f"Cannot group usage by {group_by!r}")
+    if not ledger_enabled() and path is None:
+        return []
+
+    since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    query = (
+        f"SELECT {group_by} AS grouping, COUNT(*) AS requests, SUM(prompt_tokens) AS prompt_tokens, "
+        "SUM(response_tokens) AS response_tokens, SUM(thoughts_tokens) AS thoughts_tokens, "
+        "SUM(total_tokens) AS total_tokens, SUM(cost_usd) AS cost_usd FROM usage WHERE day >= ?"
+    )
+    parameters = [since]
+    if key_hash:
+        query += " AND key_hash = ?"
+        parameters.append(key_hash)
+    query += f" GROUP BY {group_by} ORDER BY " + ("grouping DESC" if group_by == "day" else "cost_usd DESC")
+
+    try:
+        with _lock:
+            connection = _connect(path)
+            try:
+                rows = connection.execute(query, parameters).fetchall()
+            finally:
+                connection.close()
+    except sqlite3.Error:
+        return []
+    return [
+        {
+            group_by: row["grouping"],
+            "requests": row["requests"],
+            "prompt_tokens": row["prompt_tokens"],
+            "response_tokens": row["response_tokens"],
+            "thoughts_tokens": row["thoughts_tokens"],
+            "total_tokens": row["total_tokens"],
+            "cost_usd": round(row["cost_usd"] or 0.0, 4),
+        }
+        for row in rows
+    ]
+
+
+def quota_projection(key_hash, daily_token_quota=DAILY_TOKEN_QUOTA, monthly_budget_usd=MONTHLY_BUDGET_USD,
+                     path=None, now=None):
+    """
+    Quota left today and budget left this month for one key, at the current pace
+
+    Today's pace is tokens per hour since midnight; the month's pace is the
+    average daily cost so far.
+
+    Args:
+        key_hash: hash_api_key() of the key
+        daily_token_quota: Tokens allowed per day (None: no daily quota)
+        monthly_budget_usd: Spending limit per calendar month (None: no budget)
+        path: Ledger file (defaults to AFA_LEDGER_PATH)
+        now: datetime to project from (defaults to now)
+
+    Returns:
+        dict: tokens_today, projected_tokens_today, tokens_remaining_today,
+        cost_this_month, projected_cost_this_month, budget_remaining_usd and
+        budget_exhausted_on (date string, if the pace runs out this month);
+        None if the ledger can't be read
+    """
+    now = now or datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    month_start = now.strftime("%Y-%m-01")
+    projection = {
+        "daily_token_quota": daily_token_quota,
+        "monthly_budget_usd": monthly_budget_usd,
+        "tokens_today": 0,
+        "projected_tokens_today": 0,
+        "tokens_remaining_today": None,
+        "cost_this_month": 0.0,
+        "projected_cost_this_month": 0.0,
+        "budget_remaining_usd": None,
+        "budget_exhausted_on": None,
+    }
+    if not ledger_enabled() and path is None:
+        return projection
+
+    try:
+        with _lock:
+            connection = _connect(path)
+            try:
+                tokens_today = connection.execute(
+                    "SELECT COALESCE(SUM(total_tokens), 0) FROM usage WHERE key_hash = ? AND day = ?",
+                    (key_hash, today)
+                ).fetchone()[0]
+                cost_this_month = connection.execute(
+                    "SELECT COALESCE(SUM(cost_usd), 0) FROM usage WHERE key_hash = ? AND day >= ? AND day <= ?",
+                    (key_hash, month_start, today)
+                ).fetchone()[0]
+            finally:
+                connection.close()
+    except sqlite3.Error:
+        return None
+
+    hours_elapsed = max(now.hour + now.minute / 60, 1.0)
+    projected_today = tokens_today * 24 / hours_elapsed
+    next_month = (now.replace(day=28) + timedelta(days=4)).replace(day=1)
+    days_in_month = (next_month - now.replace(day=1)).days
+    daily_cost = cost_this_month / now.day
+    projected_month = daily_cost * days_in_month
+
+    projection.update({
+        "tokens_today": tokens_today,
+        "projected_tokens_today": round(projected_today),
+        "cost_this_month": round(cost_this_month, 4),
+        "projected_cost_this_month": round(projected_month, 4),
+    })
+    if daily_token_quota is not None:
+        projection["tokens_remaining_today"] = max(daily_token_quota - tokens_today, 0)
+    if monthly_budget_usd is not None:
+        remaining = max(monthly_budget_usd - cost_this_month, 0.0)
+        projection["budget_remaining_usd"] = round(remaining, 4)
+        if daily_cost > 0 and projected_month > monthly_budget_usd:
+            exhausted = now + timedelta(days=remaining / daily_cost)
+            projection["budget_exhausted_on"] = exhausted.strftime("%Y-%m-%d")
+    return projection